@@ -4,9 +4,12 @@ import pandas as pd
 con = duckdb.connect()
 # Dateipfad
 import os
+import warehouse
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(SCRIPT_DIR, '..', 'Data', 'deutsche_bahn_data', 'monthly_processed_data', 'data-2024-10.parquet')
-result = con.execute(f"SELECT COUNT(*) FROM '{DATA_PATH}'").fetchone()
+# Aus dem DuckDB-Warehouse lesen, falls der Monat ingestiert ist (sonst Parquet)
+SOURCE = warehouse.source_for(DATA_PATH, con)
+result = con.execute(f"SELECT COUNT(*) FROM {SOURCE}").fetchone()
 print(f"Dataset Preview {result[0]:,} rows.")
 
 #Erste Transformation:
@@ -19,7 +22,7 @@ result = con.execute(f"""
         ROUND(MAX(delay_in_min),2) as max_delay,
         ROUND(MIN(delay_in_min),2) as min_delay,
         SUM(CASE WHEN is_canceled THEN 1 ELSE 0 END) as total_canceled
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
  """).fetchdf()
 print(result)
 
@@ -32,7 +35,7 @@ result = con.execute(f"""
         COUNT(*) as total_fahrten,
         ROUND(AVG(delay_in_min),2) as avg_delay,
         ROUND(SUM(CASE WHEN is_canceled THEN 1 ELSE 0 END) *100.0 / COUNT(*),2) as canceled_rate
-        FROM '{DATA_PATH}'
+        FROM {SOURCE}
         WHERE train_type IS NOT NULL AND delay_in_min IS NOT NULL
         GROUP BY train_type
         ORDER BY avg_delay DESC
@@ -61,7 +64,7 @@ result = con.execute(f"""
         COUNT(*) as fahrten,
         ROUND(AVG(delay_in_min), 2) as avg_delay
 
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     WHERE train_type IN ('ICE', 'IC', 'RE')
         AND delay_in_min IS NOT NULL
 
@@ -80,7 +83,7 @@ result = con.execute(f"""
         Station_name,
         COUNT(*) as total_fahrten,
         ROUND(AVG(delay_in_min),2) as avg_delay,
-        FROM '{DATA_PATH}'
+        FROM {SOURCE}
         WHERE delay_in_min IS NOT NULL
         GROUP BY Station_name
         Having COUNT(*) > 5000
@@ -112,7 +115,7 @@ result = con.execute(f"""
             2
         ) AS canceled_rate
 
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     WHERE delay_in_min IS NOT NULL
     GROUP BY zeitfenster
     ORDER BY avg_delay DESC
@@ -132,7 +135,7 @@ result = con.execute(f"""
         COUNT(*) as total_fahrten,
         ROUND(AVG(delay_in_min),2) as avg_delay,
         ROUND(SUM(CASE WHEN is_canceled THEN 1 ELSE 0 END) *100.0 / COUNT(*),2) as canceled_rate
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     WHERE delay_in_min IS NOT NULL
     GROUP BY day_type
 """).fetchdf()
@@ -149,7 +152,7 @@ result = con.execute(f"""
             DATE(time) AS datum,
             strftime(time, '%w') AS weekday_num,  -- 0=Sonntag
             ROUND(AVG(delay_in_min), 2) AS avg_delay
-        FROM '{DATA_PATH}'
+        FROM {SOURCE}
         WHERE delay_in_min IS NOT NULL
         GROUP BY datum, weekday_num
     ),
@@ -8,56 +8,67 @@
 from __future__ import annotations
 
 import streamlit as st
-import duckdb
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import os
-import tempfile
-from huggingface_hub import hf_hub_download, list_repo_files
-from contextlib import contextmanager
-from typing import Any
+
+import approximate
+import data_mirror
+import delay_sketch
+import month_catalog
+import panel_engine
+import prefetch
+import query_metrics
+import result_cache
+import rollup
+import station_index
+import warehouse
+from data_mirror import HF_REPO_ID
+from db_connection import execute_query_arrow
+from panel_engine import (
+    PUENKTLICH_THRESHOLD_MIN,
+    VERSPAETET_THRESHOLD_MIN,
+    WOCHENTAGE_KURZ,
+)
 
 # ============================================================
 # KONSTANTEN & KONFIGURATION
 # ============================================================
 
-# HuggingFace Dataset
-HF_REPO_ID = "piebro/deutsche-bahn-data"
-HF_REPO_TYPE = "dataset"
+# Analyse-Modi (Monatsauswahl)
+MODE_EINZELMONAT = "Einzelner Monat"
+MODE_ZEITRAUM = "Zeitraum (von–bis)"
 
-# Schwellenwerte (zentral definiert)
-PUENKTLICH_THRESHOLD_MIN: int = 5
-VERSPAETET_THRESHOLD_MIN: int = 15
+# Vorauswahl im Zeitraum-Modus: die letzten N Monate (ein Quartal)
+DEFAULT_RANGE_MONTHS: int = 3
 
-# Wochentag-Mapping (DuckDB DAYOFWEEK: 0=Sonntag)
-WOCHENTAGE: dict[int, str] = {
-    0: "Sonntag",
-    1: "Montag",
-    2: "Dienstag",
-    3: "Mittwoch",
-    4: "Donnerstag",
-    5: "Freitag",
-    6: "Samstag",
-}
+# Standard-Zugtypen für Filter
+DEFAULT_TRAIN_TYPES: list[str] = ["ICE", "IC", "RE", "RB", "S"]
 
-WOCHENTAGE_KURZ: dict[int, str] = {
-    0: "So",
-    1: "Mo",
-    2: "Di",
-    3: "Mi",
-    4: "Do",
-    5: "Fr",
-    6: "Sa",
+# Obergrenze für Einträge pro Query-Funktion im Speicher (älteste fliegen raus).
+# Die Caches hängen am Stand bzw. am Inhalt der Dateien und laufen nicht ab;
+# nach neuen Ständen fragt der Monats-Katalog im Hintergrund.
+CACHE_MAX_ENTRIES: int = 256
+
+# Bahnhofs-Rangliste: Zeilen pro Seite und Vorgabe für das Mindestvolumen
+STATION_PAGE_SIZE: int = 25
+STATION_MIN_FAHRTEN_DEFAULT: int = 1000
+
+# Sortierung der Rangliste: Anzeigename → (Spalte, absteigend = schlechteste zuerst)
+STATION_SORT_OPTIONS: dict[str, tuple[str, bool]] = {
+    "Ø Verspätung": ("avg_delay", True),
+    f"p{station_index.STATION_PERCENTILE} Verspätung": (f"p{station_index.STATION_PERCENTILE}_delay", True),
+    "Pünktlichkeit": ("puenktlich_pct", False),
+    "Ausfallquote": ("canceled_pct", True),
+    "Anzahl Halte": ("fahrten", True),
 }
 
-# Zeitfenster für Rush Hour Analyse
-RUSH_HOUR_MORGEN: tuple[int, int] = (7, 9)
-RUSH_HOUR_ABEND: tuple[int, int] = (16, 19)
-
-# Standard-Zugtypen für Filter
-DEFAULT_TRAIN_TYPES: list[str] = ["ICE", "IC", "RE", "RB", "S"]
+# So lange wartet der erste Seitenaufbau auf die exakten Panels, danach
+# werden Schätzwerte aus der Stichprobe gezeigt
+APPROX_BUDGET_SECONDS: float = float(os.environ.get("DB_APPROX_BUDGET_MS", "200")) / 1000
 
-# Cache TTL (Time To Live) in Sekunden
-CACHE_TTL_SECONDS: int = 3600  # 1 Stunde
+# Wie oft geprüft wird, ob die exakten Panels inzwischen fertig sind
+APPROX_REFRESH_SECONDS: float = 1.0
 
 # ============================================================
 # SEITEN-KONFIGURATION
@@ -74,46 +85,56 @@ st.set_page_config(
 # HUGGINGFACE DATEN-MANAGEMENT
 # ============================================================
 
-@st.cache_data(ttl=86400)  # 24 Stunden cachen
+@st.cache_resource
+def get_catalog() -> month_catalog.MonthCatalog:
+    """Prozessweiter Monats-Katalog (lokal gespeicherter Stand des Datasets)."""
+    return month_catalog.MonthCatalog()
+
+
+catalog = get_catalog()
+
+
+def expected_checksum(month: str) -> str | None:
+    """SHA-256, den die lokale Kopie eines Monats im bekannten Stand haben muss."""
+    return catalog.checksum(month)
+
+
 def get_available_months() -> list[str]:
-    """Holt alle verfügbaren Monate vom HuggingFace Dataset."""
-    try:
-        files = list_repo_files(HF_REPO_ID, repo_type=HF_REPO_TYPE)
-        # Filter nur monthly_processed_data parquet files
-        parquet_files = [
-            f for f in files
-            if f.startswith("monthly_processed_data/data-") and f.endswith(".parquet")
-        ]
-        # Extrahiere Monatsnamen (z.B. "2024-10")
-        months = []
-        for f in parquet_files:
-            # Format: monthly_processed_data/data-2024-10.parquet
-            month = f.replace("monthly_processed_data/data-", "").replace(".parquet", "")
-            months.append(month)
-
-        # Sortiere absteigend (neueste zuerst)
-        months.sort(reverse=True)
-        return months
-    except Exception as e:
-        st.error(f"Fehler beim Laden der verfügbaren Monate: {e}")
-        return []
-
-
-@st.cache_data(ttl=86400, show_spinner="Lade Daten von HuggingFace...")
-def download_month_data(month: str) -> str:
     """
-    Lädt die Parquet-Datei für einen bestimmten Monat von HuggingFace.
-    Gibt den lokalen Pfad zur heruntergeladenen Datei zurück.
+    Alle verfügbaren Monate, neueste zuerst.
+
+    Kommt aus dem lokalen Katalog (Abgleich mit HuggingFace im Hintergrund),
+    ohne Katalog aus dem Mirror. Nur beim allerersten Start ohne lokale
+    Daten wird direkt auf HuggingFace gewartet.
+    """
+    catalog.refresh_async()
+    months = catalog.months() or list(data_mirror.get_mirror().entries())
+    if not months:
+        try:
+            catalog.refresh()
+            months = catalog.months()
+        except Exception as e:
+            st.error(f"Fehler beim Laden der verfügbaren Monate: {e}")
+            return []
+    return sorted(months, reverse=True)
+
+
+def download_month_data(month: str, keep: tuple[str, ...] = ()) -> str:
     """
-    filename = f"monthly_processed_data/data-{month}.parquet"
+    Gibt den lokalen Pfad zur Parquet-Datei eines Monats zurück.
 
-    local_path = hf_hub_download(
-        repo_id=HF_REPO_ID,
-        filename=filename,
-        repo_type=HF_REPO_TYPE
-    )
+    Die Datei kommt aus dem lokalen Mirror (siehe data_mirror.py). Nur
+    Monate, die noch nie (oder vor einer Eviction) genutzt wurden oder
+    deren Datei auf HuggingFace ersetzt wurde, werden neu geladen.
+    `keep` schützt Monate vor der Eviction.
+    """
+    mirror = data_mirror.get_mirror()
+    sha256 = expected_checksum(month)
+    if mirror.contains(month, sha256):
+        return mirror.fetch(month, keep=keep, sha256=sha256)
 
-    return local_path
+    with st.spinner(f"Lade {format_month_label(month)} von HuggingFace..."):
+        return mirror.fetch(month, keep=keep, sha256=sha256, revision=catalog.revision())
 
 
 def format_month_label(month: str) -> str:
@@ -130,36 +151,6 @@ def format_month_label(month: str) -> str:
         return month
 
 
-# ============================================================
-# DATENBANK-CONNECTION (Thread-Safe)
-# ============================================================
-
-@contextmanager
-def get_db_connection():
-    """Context Manager für sichere DuckDB-Verbindung."""
-    conn = duckdb.connect()
-    try:
-        yield conn
-    finally:
-        conn.close()
-
-
-def execute_query(query: str, params: list[Any] | None = None) -> pd.DataFrame:
-    """Führt eine Query sicher aus mit optionalen Parametern."""
-    with get_db_connection() as conn:
-        if params:
-            return conn.execute(query, params).fetchdf()
-        return conn.execute(query).fetchdf()
-
-
-def execute_query_single(query: str, params: list[Any] | None = None) -> tuple | None:
-    """Führt eine Query aus und gibt eine einzelne Zeile zurück."""
-    with get_db_connection() as conn:
-        if params:
-            return conn.execute(query, params).fetchone()
-        return conn.execute(query).fetchone()
-
-
 # ============================================================
 # TITEL & DATENAUSWAHL
 # ============================================================
@@ -174,35 +165,123 @@ if not available_months:
     st.error("❌ Keine Daten verfügbar. Bitte später erneut versuchen.")
     st.stop()
 
-# Dropdown für Monatsauswahl
-month_options = {format_month_label(m): m for m in available_months}
-selected_month_label = st.selectbox(
-    "📅 Zeitraum auswählen:",
-    options=list(month_options.keys()),
-    index=0
-)
+if catalog.last_error:
+    st.caption(f"⚠️ HuggingFace nicht erreichbar, zeige den zuletzt bekannten Stand ({catalog.last_error})")
 
-selected_month = month_options[selected_month_label]
+# Analyse-Modus: einzelner Monat oder Zeitraum über mehrere Monate
+analysis_mode = MODE_EINZELMONAT
+if len(available_months) > 1:
+    analysis_mode = st.radio(
+        "🔎 Analyse-Modus:",
+        options=[MODE_EINZELMONAT, MODE_ZEITRAUM],
+        horizontal=True
+    )
 
-# Daten laden
+if analysis_mode == MODE_EINZELMONAT:
+    # Dropdown für Monatsauswahl
+    month_options = {format_month_label(m): m for m in available_months}
+    selected_month_label = st.selectbox(
+        "📅 Zeitraum auswählen:",
+        options=list(month_options.keys()),
+        index=0
+    )
+    selected_months = [month_options[selected_month_label]]
+else:
+    # Von–bis Slider über alle Monate (aufsteigend sortiert)
+    months_ascending = sorted(available_months)
+    default_start = months_ascending[max(0, len(months_ascending) - DEFAULT_RANGE_MONTHS)]
+    month_from, month_to = st.select_slider(
+        "📅 Zeitraum auswählen (von – bis):",
+        options=months_ascending,
+        value=(default_start, months_ascending[-1]),
+        format_func=format_month_label
+    )
+    selected_months = [m for m in months_ascending if month_from <= m <= month_to]
+    selected_month_label = f"{format_month_label(month_from)} – {format_month_label(month_to)}"
+
+# Daten laden (aus dem lokalen Mirror, fehlende Monate von HuggingFace)
 try:
-    DATA_PATH = download_month_data(selected_month)
-    st.success(f"✅ Daten für {selected_month_label} geladen")
+    DATA_PATHS = tuple(
+        download_month_data(month, keep=tuple(selected_months)) for month in selected_months
+    )
+    st.success(f"✅ Daten für {selected_month_label} geladen ({len(DATA_PATHS)} Monat(e))")
 except Exception as e:
     st.error(f"❌ Fehler beim Laden: {e}")
     st.stop()
 
 st.markdown("---")
 
+# ============================================================
+# AGGREGATION (ein Scan über das Monats-Rollup)
+# ============================================================
+
+def shared_cache(**cache_kwargs):
+    """st.cache_data im Speicher, darunter der von allen Workern geteilte Disk-Cache."""
+    def decorator(func):
+        return st.cache_data(**cache_kwargs)(
+            result_cache.disk_cached(func, on_hit=query_metrics.mark_disk_hit)
+        )
+    return decorator
+
+
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES, show_spinner="Baue Monats-Rollup..."))
+def get_panels(data_paths: tuple[str, ...]) -> pa.Table:
+    """
+    Berechnet alle Dashboard-Panels aus den Monats-Rollups.
+
+    Bei mehreren Monaten liest DuckDB alle Rollups als ein Dataset
+    (paralleler Multi-File-Scan) und aggregiert sie in einem Durchgang.
+    Fehlende Rollups werden aus dem Warehouse gebaut, falls der Monat dort liegt.
+    """
+    rollup_paths = [
+        rollup.ensure_rollup(path, source=warehouse.source_for(path)) for path in data_paths
+    ]
+    return panel_engine.compute_panels(panel_engine.parquet_source(rollup_paths))
+
+
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_approx_panels(data_paths: tuple[str, ...]) -> pa.Table:
+    """Schätzt alle Panels aus den Monats-Stichproben (mit Konfidenzintervallen)."""
+    return panel_engine.compute_estimates(approximate.sample_cells(data_paths))
+
+
+def get_panels_for(data_paths: tuple[str, ...], approx: bool) -> pa.Table:
+    """Geschätzte oder exakte Panels."""
+    return get_approx_panels(data_paths) if approx else get_panels(data_paths)
+
+
+@st.cache_resource
+def get_refiner() -> approximate.PanelRefiner:
+    """Prozessweiter Hintergrund-Rechner für die exakten Panels."""
+    return approximate.PanelRefiner(compute=get_panels)
+
+
+# Exakte Panels im Hintergrund anstoßen; sind sie nicht innerhalb des
+# Budgets fertig, zeigt die Seite zunächst Schätzwerte. Die gibt es nur aus
+# fertigen Stichproben: fehlt eine, wird sie im Hintergrund gebaut und die
+# Seite wartet auf die exakten Werte
+refiner = get_refiner()
+if all(approximate.is_sampled(path) for path in DATA_PATHS):
+    APPROXIMATE = not refiner.wait(DATA_PATHS, APPROX_BUDGET_SECONDS)
+else:
+    refiner.wait(DATA_PATHS, 0)  # exakten Job vor den Stichproben einplanen
+    refiner.build_samples(DATA_PATHS)
+    APPROXIMATE = not refiner.wait(DATA_PATHS, None)
+
+
 # ============================================================
 # DATEN-VALIDIERUNG
 # ============================================================
 
 try:
-    result = execute_query_single(f"SELECT COUNT(*) FROM '{DATA_PATH}'")
-    if result:
-        row_count = result[0]
-        st.info(f"📊 **{row_count:,} Zugfahrten** im ausgewählten Zeitraum")
+    if APPROXIMATE and not panel_engine.row_count_from_panels(get_approx_panels(DATA_PATHS)):
+        # Leere Stichprobe (sehr kleine Datei): auf die exakten Werte warten
+        APPROXIMATE = not refiner.wait(DATA_PATHS, None)
+
+    row_count = panel_engine.row_count_from_panels(get_panels_for(DATA_PATHS, APPROXIMATE))
+    if row_count:
+        prefix = "≈ " if APPROXIMATE else ""
+        st.info(f"📊 **{prefix}{row_count:,} Zugfahrten** im ausgewählten Zeitraum")
     else:
         st.error("❌ Keine Daten gefunden.")
         st.stop()
@@ -215,51 +294,38 @@ except Exception as e:
 # KPI BERECHNUNG
 # ============================================================
 
-@st.cache_data(ttl=CACHE_TTL_SECONDS)
-def get_kpis(data_path: str) -> dict[str, int | float | str]:
-    """Berechnet die Haupt-KPIs für das Dashboard."""
-    query = f"""
-    SELECT
-        COUNT(*) as total_fahrten,
-        ROUND(AVG(delay_in_min), 2) as avg_delay,
-        ROUND(
-            SUM(CASE WHEN delay_in_min <= {PUENKTLICH_THRESHOLD_MIN} THEN 1 ELSE 0 END) 
-            * 100.0 / COUNT(*), 1
-        ) as puenktlich_pct,
-        ROUND(
-            SUM(CASE WHEN is_canceled THEN 1 ELSE 0 END) 
-            * 100.0 / COUNT(*), 2
-        ) as canceled_pct,
-        MIN(time) as start_datum,
-        MAX(time) as end_datum
-    FROM '{data_path}'
-    WHERE delay_in_min IS NOT NULL
-    """
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_kpis(data_paths: tuple[str, ...], approx: bool = False) -> dict[str, int | float | str]:
+    """Berechnet die Haupt-KPIs für das Dashboard (approx: aus der Stichprobe)."""
+    return panel_engine.kpis_from_panels(get_panels_for(data_paths, approx))
 
-    result = execute_query_single(query)
-
-    if not result:
-        return {
-            "total_fahrten": 0,
-            "avg_delay": 0.0,
-            "puenktlich_pct": 0.0,
-            "canceled_pct": 0.0,
-            "start_datum": "N/A",
-            "end_datum": "N/A",
-        }
-
-    return {
-        "total_fahrten": result[0],
-        "avg_delay": result[1] or 0.0,
-        "puenktlich_pct": result[2] or 0.0,
-        "canceled_pct": result[3] or 0.0,
-        "start_datum": result[4],
-        "end_datum": result[5],
-    }
+
+def format_estimate(value: object, ci: object | None, unit: str = "") -> str:
+    """'4.19 min' bzw. '≈ 4.2 ± 0.3 min' für Schätzwerte."""
+    if ci is None:
+        return f"{value}{unit}"
+    return f"≈ {value} ± {ci}{unit}"
+
+
+def render_approximation_badge() -> None:
+    """Kennzeichnet Schätzwerte, bis die exakten Panels fertig sind."""
+    st.badge(
+        "Näherung aus Stichprobe (95%-Intervall) – exakte Werte werden berechnet",
+        icon="⏳",
+        color="orange"
+    )
+
+
+@st.fragment(run_every=APPROX_REFRESH_SECONDS)
+def watch_refinement() -> None:
+    """Lädt die Seite neu, sobald die exakten Panels im Hintergrund fertig sind."""
+    if refiner.is_ready(DATA_PATHS):
+        st.rerun()
+    render_approximation_badge()
 
 
 try:
-    kpis = get_kpis(DATA_PATH)
+    kpis = get_kpis(DATA_PATHS, APPROXIMATE)
 except Exception as e:
     st.error(f"❌ Fehler bei KPI-Berechnung: {e}")
     st.stop()
@@ -270,30 +336,35 @@ except Exception as e:
 
 st.subheader("📊 Key Performance Indicators")
 
+if APPROXIMATE:
+    watch_refinement()
+
+total_ci = kpis.get("total_fahrten_ci")
+
 col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     st.metric(
         label="Total Fahrten",
-        value=f"{kpis['total_fahrten']:,}"
+        value=format_estimate(f"{kpis['total_fahrten']:,}", None if total_ci is None else f"{total_ci:,}")
     )
 
 with col2:
     st.metric(
         label="Ø Verspätung",
-        value=f"{kpis['avg_delay']} min"
+        value=format_estimate(kpis['avg_delay'], kpis.get("avg_delay_ci"), " min")
     )
 
 with col3:
     st.metric(
         label=f"Pünktlich (≤{PUENKTLICH_THRESHOLD_MIN} min)",
-        value=f"{kpis['puenktlich_pct']}%"
+        value=format_estimate(kpis['puenktlich_pct'], kpis.get("puenktlich_pct_ci"), "%")
     )
 
 with col4:
     st.metric(
         label="Ausgefallen",
-        value=f"{kpis['canceled_pct']}%"
+        value=format_estimate(kpis['canceled_pct'], kpis.get("canceled_pct_ci"), "%")
     )
 
 st.markdown("---")
@@ -303,301 +374,453 @@ st.markdown("---")
 # RUSH HOUR ANALYSE
 # ============================================================
 
-@st.cache_data(ttl=CACHE_TTL_SECONDS)
-def get_rush_hour_stats(data_path: str) -> pd.DataFrame:
-    """Vergleicht Rush Hour Zeiten mit normalen Zeiten."""
-    morgen_start, morgen_end = RUSH_HOUR_MORGEN
-    abend_start, abend_end = RUSH_HOUR_ABEND
-
-    query = f"""
-    SELECT
-        CASE
-            WHEN HOUR(time) BETWEEN {morgen_start} AND {morgen_end} 
-                THEN 'Morgen Rush ({morgen_start}-{morgen_end})'
-            WHEN HOUR(time) BETWEEN {abend_start} AND {abend_end} 
-                THEN 'Abend Rush ({abend_start}-{abend_end})'
-            ELSE 'Normal'
-        END as zeitfenster,
-        COUNT(*) as fahrten,
-        ROUND(AVG(delay_in_min), 2) as avg_delay,
-        ROUND(
-            SUM(CASE WHEN delay_in_min > {VERSPAETET_THRESHOLD_MIN} THEN 1 ELSE 0 END) 
-            * 100.0 / COUNT(*), 2
-        ) as verspaetet_pct,
-        ROUND(
-            SUM(CASE WHEN is_canceled THEN 1 ELSE 0 END) 
-            * 100.0 / COUNT(*), 2
-        ) as canceled_pct
-    FROM '{data_path}'
-    WHERE delay_in_min IS NOT NULL
-    GROUP BY 1
-    ORDER BY avg_delay DESC
-    """
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_rush_hour_stats(data_paths: tuple[str, ...], approx: bool = False) -> pa.Table:
+    """Vergleicht Rush Hour Zeiten mit normalen Zeiten (approx: aus der Stichprobe)."""
+    return panel_engine.rush_hour_from_panels(get_panels_for(data_paths, approx))
 
-    return execute_query(query)
 
+def render_rush_hour_section() -> None:
+    """Zeigt die Rush Hour Analyse an."""
+    rush_hour_table = get_rush_hour_stats(DATA_PATHS, APPROXIMATE)
 
-rush_hour_df = get_rush_hour_stats(DATA_PATH)
+    st.subheader("🕐 Rush Hour Analyse")
+    if APPROXIMATE:
+        render_approximation_badge()
 
-st.subheader("🕐 Rush Hour Analyse")
+    col1, col2 = st.columns(2)
 
-col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Durchschnittliche Verspätung nach Tageszeit**")
+        st.bar_chart(
+            rush_hour_table,
+            x="zeitfenster",
+            y="avg_delay",
+            color="#FF6B6B"
+        )
 
-with col1:
-    st.markdown("**Durchschnittliche Verspätung nach Tageszeit**")
-    st.bar_chart(
-        rush_hour_df.set_index("zeitfenster")["avg_delay"],
-        color="#FF6B6B"
-    )
+    with col2:
+        st.markdown("**Detaillierte Statistiken**")
+        st.dataframe(
+            rush_hour_table,
+            hide_index=True,
+            use_container_width=True
+        )
 
-with col2:
-    st.markdown("**Detaillierte Statistiken**")
-    st.dataframe(
-        rush_hour_df,
-        hide_index=True,
-        use_container_width=True
-    )
+    if rush_hour_table.num_rows:
+        worst = rush_hour_table.slice(0, 1).to_pylist()[0]
+        worst_time = worst["zeitfenster"]
+        worst_delay = format_estimate(worst["avg_delay"], worst.get("avg_delay_ci"), " min")
 
-if not rush_hour_df.empty:
-    worst_time = rush_hour_df.iloc[0]["zeitfenster"]
-    worst_delay = rush_hour_df.iloc[0]["avg_delay"]
+        st.info(f"""
+        **💡 Business Insight:**
+        {worst_time} hat die höchste durchschnittliche Verspätung ({worst_delay}).
+        Empfehlung: Zusätzliche Kapazitäten in diesem Zeitfenster einplanen.
+        """)
 
-    st.info(f"""
-    **💡 Business Insight:**
-    {worst_time} hat die höchste durchschnittliche Verspätung ({worst_delay} min).
-    Empfehlung: Zusätzliche Kapazitäten in diesem Zeitfenster einplanen.
-    """)
 
-st.markdown("---")
+# ============================================================
+# WOCHENTAG ANALYSE
+# ============================================================
+
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_weekday_stats(data_paths: tuple[str, ...], approx: bool = False) -> pa.Table:
+    """Analysiert Verspätungen nach Wochentag (approx: aus der Stichprobe)."""
+    return panel_engine.weekday_from_panels(get_panels_for(data_paths, approx))
+
+
+def render_weekday_section() -> None:
+    """Zeigt die Wochentag Analyse an."""
+    weekday_table = get_weekday_stats(DATA_PATHS, APPROXIMATE)
+
+    st.subheader("📅 Wochentag Analyse")
+    if APPROXIMATE:
+        render_approximation_badge()
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("**Verspätung pro Wochentag**")
+        st.bar_chart(
+            weekday_table,
+            x="wochentag",
+            y="avg_delay",
+            color="#4ECDC4"
+        )
+
+    with col2:
+        st.markdown("**Ausfälle pro Wochentag**")
+        st.bar_chart(
+            weekday_table,
+            x="wochentag",
+            y="canceled_pct",
+            color="#FFE66D"
+        )
+
+    if weekday_table.num_rows:
+        delays = weekday_table["avg_delay"]
+        min_max = pc.min_max(delays)
+        best_day = weekday_table.filter(pc.equal(delays, min_max["min"])).slice(0, 1).to_pylist()[0]
+        worst_day = weekday_table.filter(pc.equal(delays, min_max["max"])).slice(0, 1).to_pylist()[0]
+
+        col1, col2 = st.columns(2)
+        best_delay = format_estimate(best_day["avg_delay"], best_day.get("avg_delay_ci"), " min")
+        worst_delay = format_estimate(worst_day["avg_delay"], worst_day.get("avg_delay_ci"), " min")
+        with col1:
+            st.success(f"✅ **Bester Tag:** {best_day['wochentag']} ({best_delay})")
+        with col2:
+            st.error(f"❌ **Schlechtester Tag:** {worst_day['wochentag']} ({worst_delay})")
 
 
 # ============================================================
-# WOCHENTAG ANALYSE
+# ZUGTYP ANALYSE MIT FILTER
 # ============================================================
 
-@st.cache_data(ttl=CACHE_TTL_SECONDS)
-def get_weekday_stats(data_path: str) -> pd.DataFrame:
-    """Analysiert Verspätungen nach Wochentag."""
-    case_parts = [f"WHEN {num} THEN '{name}'" for num, name in WOCHENTAGE.items()]
-    case_statement = "CASE DAYOFWEEK(time) " + " ".join(case_parts) + " END"
-
-    query = f"""
-    SELECT
-        {case_statement} as wochentag,
-        DAYOFWEEK(time) as tag_nummer,
-        COUNT(*) as fahrten,
-        ROUND(AVG(delay_in_min), 2) as avg_delay,
-        ROUND(
-            SUM(CASE WHEN is_canceled THEN 1 ELSE 0 END) 
-            * 100.0 / COUNT(*), 2
-        ) as canceled_pct
-    FROM '{data_path}'
-    WHERE delay_in_min IS NOT NULL
-    GROUP BY DAYOFWEEK(time)
-    ORDER BY DAYOFWEEK(time)
-    """
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_train_types(data_paths: tuple[str, ...]) -> list[str]:
+    """Holt alle verfügbaren Zugtypen aus den Daten."""
+    return panel_engine.train_types_from_panels(get_panels(data_paths))
 
-    return execute_query(query)
 
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_train_type_stats(data_paths: tuple[str, ...], selected_types: tuple[str, ...]) -> pa.Table:
+    """Analysiert Performance nach Zugtyp."""
+    return panel_engine.train_type_stats_from_panels(get_panels(data_paths), selected_types)
 
-weekday_df = get_weekday_stats(DATA_PATH)
 
-st.subheader("📅 Wochentag Analyse")
+@st.fragment
+def render_train_type_section() -> None:
+    """Zugtyp-Vergleich (Fragment: der Filter rendert nur diesen Abschnitt neu)."""
+    st.subheader("🚄 Zugtyp Vergleich")
 
-col1, col2 = st.columns(2)
+    all_train_types = get_train_types(DATA_PATHS)
+    valid_defaults = [t for t in DEFAULT_TRAIN_TYPES if t in all_train_types]
 
-with col1:
-    st.markdown("**Verspätung pro Wochentag**")
-    st.bar_chart(
-        weekday_df.set_index("wochentag")["avg_delay"],
-        color="#4ECDC4"
+    selected_types = st.multiselect(
+        "Wähle Zugtypen zum Vergleichen:",
+        options=all_train_types,
+        default=valid_defaults if valid_defaults else all_train_types[:5]
     )
 
-with col2:
-    st.markdown("**Ausfälle pro Wochentag**")
-    st.bar_chart(
-        weekday_df.set_index("wochentag")["canceled_pct"],
-        color="#FFE66D"
-    )
+    if not selected_types:
+        st.warning("⚠️ Bitte wähle mindestens einen Zugtyp aus.")
+        return
 
-if not weekday_df.empty:
-    best_day = weekday_df.loc[weekday_df["avg_delay"].idxmin()]
-    worst_day = weekday_df.loc[weekday_df["avg_delay"].idxmax()]
+    train_type_table = get_train_type_stats(DATA_PATHS, tuple(selected_types))
+
+    if not train_type_table.num_rows:
+        st.warning("⚠️ Keine Daten für die ausgewählten Zugtypen gefunden.")
+        return
 
     col1, col2 = st.columns(2)
+
     with col1:
-        st.success(f"✅ **Bester Tag:** {best_day['wochentag']} ({best_day['avg_delay']} min)")
+        st.markdown("**Durchschnittliche Verspätung**")
+        st.bar_chart(
+            train_type_table,
+            x="train_type",
+            y="avg_delay",
+            color="#9B59B6"
+        )
+
     with col2:
-        st.error(f"❌ **Schlechtester Tag:** {worst_day['wochentag']} ({worst_day['avg_delay']} min)")
+        st.markdown("**Pünktlichkeitsrate**")
+        st.bar_chart(
+            train_type_table,
+            x="train_type",
+            y="puenktlich_pct",
+            color="#2ECC71"
+        )
 
-st.markdown("---")
+    st.markdown("**Detaillierte Statistiken:**")
+    st.dataframe(
+        train_type_table,
+        hide_index=True,
+        use_container_width=True
+    )
 
 
 # ============================================================
-# ZUGTYP ANALYSE MIT FILTER
+# ERWEITERTE ANALYSE: Zugtyp × Wochentag
 # ============================================================
 
-@st.cache_data(ttl=CACHE_TTL_SECONDS)
-def get_train_types(data_path: str) -> list[str]:
-    """Holt alle verfügbaren Zugtypen aus den Daten."""
-    query = f"""
-    SELECT DISTINCT train_type
-    FROM '{data_path}'
-    WHERE train_type IS NOT NULL
-    ORDER BY train_type
-    """
-    result = execute_query(query)
-    return result["train_type"].tolist()
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_train_weekday_stats(data_paths: tuple[str, ...], train_types: tuple[str, ...]) -> pa.Table:
+    """Durchschnittliche Verspätung pro Zugtyp pro Wochentag."""
+    return panel_engine.train_weekday_from_panels(get_panels(data_paths), train_types)
 
 
-@st.cache_data(ttl=CACHE_TTL_SECONDS)
-def get_train_type_stats(data_path: str, selected_types: tuple[str, ...]) -> pd.DataFrame:
-    """Analysiert Performance nach Zugtyp."""
-    if not selected_types:
-        return pd.DataFrame()
-
-    types_list = list(selected_types)
-    placeholders = ", ".join(["?" for _ in types_list])
-
-    query = f"""
-    SELECT
-        train_type,
-        COUNT(*) as fahrten,
-        ROUND(AVG(delay_in_min), 2) as avg_delay,
-        ROUND(
-            SUM(CASE WHEN delay_in_min <= {PUENKTLICH_THRESHOLD_MIN} THEN 1 ELSE 0 END) 
-            * 100.0 / COUNT(*), 1
-        ) as puenktlich_pct,
-        ROUND(
-            SUM(CASE WHEN is_canceled THEN 1 ELSE 0 END) 
-            * 100.0 / COUNT(*), 2
-        ) as canceled_pct
-    FROM '{data_path}'
-    WHERE train_type IN ({placeholders})
-      AND delay_in_min IS NOT NULL
-    GROUP BY train_type
-    ORDER BY avg_delay DESC
-    """
+@st.fragment
+def render_extended_section() -> None:
+    """Zugtyp × Wochentag (Fragment: der Filter rendert nur diesen Abschnitt neu)."""
+    st.subheader("📊 Erweiterte Analyse: Zugtyp × Wochentag")
 
-    return execute_query(query, types_list)
+    all_train_types = get_train_types(DATA_PATHS)
 
+    extended_analysis_types = st.multiselect(
+        "Zugtypen für erweiterte Analyse:",
+        options=all_train_types,
+        default=["ICE", "IC", "RE"] if all(t in all_train_types for t in ["ICE", "IC", "RE"]) else all_train_types[:3],
+        key="extended_analysis"
+    )
 
-st.subheader("🚄 Zugtyp Vergleich")
+    if not extended_analysis_types:
+        st.info("Wähle mindestens einen Zugtyp für die erweiterte Analyse.")
+        return
 
-all_train_types = get_train_types(DATA_PATH)
-valid_defaults = [t for t in DEFAULT_TRAIN_TYPES if t in all_train_types]
+    train_weekday_table = get_train_weekday_stats(DATA_PATHS, tuple(extended_analysis_types))
 
-selected_types = st.multiselect(
-    "Wähle Zugtypen zum Vergleichen:",
-    options=all_train_types,
-    default=valid_defaults if valid_defaults else all_train_types[:5]
-)
+    if not train_weekday_table.num_rows:
+        st.info("Keine Daten für die ausgewählten Zugtypen verfügbar.")
+        return
+
+    st.markdown(f"**Verspätungen nach Zugtyp und Wochentag ({', '.join(extended_analysis_types)}):**")
+    st.dataframe(
+        train_weekday_table.drop_columns(["tag_nummer"]),
+        hide_index=True,
+        use_container_width=True
+    )
 
-if selected_types:
-    train_type_df = get_train_type_stats(DATA_PATH, tuple(selected_types))
+    # Pivot ist der einzige Schritt, der wirklich Pandas braucht
+    pivot_df = train_weekday_table.to_pandas().pivot(
+        index="train_type",
+        columns="wochentag",
+        values="avg_delay"
+    )
 
-    if not train_type_df.empty:
-        col1, col2 = st.columns(2)
+    weekday_order = list(WOCHENTAGE_KURZ.values())
+    pivot_df = pivot_df[[col for col in weekday_order if col in pivot_df.columns]]
 
-        with col1:
-            st.markdown("**Durchschnittliche Verspätung**")
-            st.bar_chart(
-                train_type_df.set_index("train_type")["avg_delay"],
-                color="#9B59B6"
-            )
+    st.markdown("**Heatmap-Ansicht (Durchschnittliche Verspätung in Minuten):**")
+    st.dataframe(pivot_df, use_container_width=True)
+
+
+# ============================================================
+# VERSPÄTUNGSVERTEILUNG (Perzentile aus Monats-Histogrammen)
+# ============================================================
+
+def get_sketch_paths(data_paths: tuple[str, ...]) -> list[str]:
+    """Verspätungs-Histogramme der Monate (fehlende werden gebaut)."""
+    return [
+        delay_sketch.ensure_sketch(path, source=warehouse.source_for(path)) for path in data_paths
+    ]
+
+
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_delay_percentiles(data_paths: tuple[str, ...], train_types: tuple[str, ...]) -> pa.Table:
+    """p50/p90/p99 der Verspätung über alle ausgewählten Zugtypen und pro Zugtyp."""
+    sketch_paths = get_sketch_paths(data_paths)
+    gesamt = delay_sketch.compute_percentiles(sketch_paths, train_types=train_types)
+    gesamt = gesamt.add_column(0, "train_type", pa.array(["Alle ausgewählten"] * gesamt.num_rows, pa.string()))
+    per_type = delay_sketch.compute_percentiles(sketch_paths, ["train_type"], train_types)
+    return pa.concat_tables([gesamt, per_type.cast(gesamt.schema)])
+
+
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_hourly_percentiles(data_paths: tuple[str, ...], train_types: tuple[str, ...]) -> pa.Table:
+    """p50/p90/p99 der Verspätung pro Stunde für die ausgewählten Zugtypen."""
+    return delay_sketch.compute_percentiles(get_sketch_paths(data_paths), ["hour"], train_types)
 
-        with col2:
-            st.markdown("**Pünktlichkeitsrate**")
-            st.bar_chart(
-                train_type_df.set_index("train_type")["puenktlich_pct"],
-                color="#2ECC71"
-            )
 
-        st.markdown("**Detaillierte Statistiken:**")
+@st.fragment
+def render_distribution_section() -> None:
+    """Perzentile der Verspätung (Fragment: der Filter rendert nur diesen Abschnitt neu)."""
+    st.subheader("📈 Verspätungsverteilung")
+    st.caption("Der Durchschnitt versteckt die langen Verspätungen: p90 heißt, 90% der Halte sind höchstens so spät.")
+
+    all_train_types = get_train_types(DATA_PATHS)
+    valid_defaults = [t for t in DEFAULT_TRAIN_TYPES if t in all_train_types]
+
+    selected_types = st.multiselect(
+        "Zugtypen für die Verteilung:",
+        options=all_train_types,
+        default=valid_defaults if valid_defaults else all_train_types[:5],
+        key="distribution_types"
+    )
+
+    if not selected_types:
+        st.info("Wähle mindestens einen Zugtyp für die Verteilung.")
+        return
+
+    percentile_table = get_delay_percentiles(DATA_PATHS, tuple(selected_types))
+    if not percentile_table.num_rows:
+        st.info("Keine Verspätungsdaten für die ausgewählten Zugtypen verfügbar.")
+        return
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.markdown("**Perzentile pro Zugtyp (Minuten)**")
         st.dataframe(
-            train_type_df,
+            percentile_table,
             hide_index=True,
             use_container_width=True
         )
-    else:
-        st.warning("⚠️ Keine Daten für die ausgewählten Zugtypen gefunden.")
-else:
-    st.warning("⚠️ Bitte wähle mindestens einen Zugtyp aus.")
 
-st.markdown("---")
+    with col2:
+        st.markdown("**Perzentile nach Stunde (Minuten)**")
+        st.line_chart(
+            get_hourly_percentiles(DATA_PATHS, tuple(selected_types)),
+            x="hour",
+            y=[f"p{p}" for p in delay_sketch.PERCENTILES]
+        )
+
+    gesamt = percentile_table.slice(0, 1).to_pylist()[0]
+    st.info(f"""
+    **💡 Business Insight:**
+    90% der Halte sind höchstens {gesamt['p90']} min verspätet, 99% höchstens {gesamt['p99']} min
+    (Median: {gesamt['p50']} min).
+    """)
+
 
 # ============================================================
-# ERWEITERTE ANALYSE: Zugtyp × Wochentag
+# BAHNHOFS-RANGLISTE (aus dem vorberechneten Bahnhofs-Index)
 # ============================================================
 
-st.subheader("📊 Erweiterte Analyse: Zugtyp × Wochentag")
+@query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+def get_station_stats(data_paths: tuple[str, ...]) -> pa.Table:
+    """Kennzahlen aller Bahnhöfe aus den Monats-Indizes (fehlende werden gebaut)."""
+    index_paths = [
+        station_index.ensure_station_index(path, source=warehouse.source_for(path)) for path in data_paths
+    ]
+    return station_index.compute_station_stats(index_paths)
 
 
-@st.cache_data(ttl=CACHE_TTL_SECONDS)
-def get_train_weekday_stats(data_path: str, train_types: tuple[str, ...]) -> pd.DataFrame:
-    """Durchschnittliche Verspätung pro Zugtyp pro Wochentag."""
-    if not train_types:
-        return pd.DataFrame()
-
-    case_parts = [f"WHEN {num} THEN '{name}'" for num, name in WOCHENTAGE_KURZ.items()]
-    case_statement = "CASE DAYOFWEEK(time) " + " ".join(case_parts) + " END"
-
-    types_list = list(train_types)
-    placeholders = ", ".join(["?" for _ in types_list])
-
-    query = f"""
-    SELECT
-        train_type,
-        {case_statement} as wochentag,
-        DAYOFWEEK(time) as tag_nummer,
-        COUNT(*) as fahrten,
-        ROUND(AVG(delay_in_min), 2) as avg_delay
-    FROM '{data_path}'
-    WHERE train_type IN ({placeholders})
-        AND delay_in_min IS NOT NULL
-    GROUP BY train_type, DAYOFWEEK(time)
-    ORDER BY train_type, DAYOFWEEK(time)
-    """
+@st.fragment
+def render_station_section() -> None:
+    """Bahnhofs-Rangliste (Fragment: Sortierung und Blättern rendern nur diesen Abschnitt neu)."""
+    st.subheader("🏆 Bahnhofs-Rangliste")
 
-    return execute_query(query, types_list)
+    stations = get_station_stats(DATA_PATHS)
+    if not stations.num_rows:
+        st.info("Keine Bahnhofsdaten verfügbar.")
+        return
 
+    col1, col2, col3 = st.columns(3)
 
-extended_analysis_types = st.multiselect(
-    "Zugtypen für erweiterte Analyse:",
-    options=all_train_types,
-    default=["ICE", "IC", "RE"] if all(t in all_train_types for t in ["ICE", "IC", "RE"]) else all_train_types[:3],
-    key="extended_analysis"
-)
-
-if extended_analysis_types:
-    train_weekday_df = get_train_weekday_stats(DATA_PATH, tuple(extended_analysis_types))
+    with col1:
+        ranking = st.radio(
+            "Rangliste:",
+            options=["Schlechteste", "Beste"],
+            horizontal=True,
+            key="station_ranking"
+        )
 
-    if not train_weekday_df.empty:
-        st.markdown(f"**Verspätungen nach Zugtyp und Wochentag ({', '.join(extended_analysis_types)}):**")
-        st.dataframe(
-            train_weekday_df.drop(columns=["tag_nummer"]),
-            hide_index=True,
-            use_container_width=True
+    with col2:
+        sort_label = st.selectbox(
+            "Sortieren nach:",
+            options=list(STATION_SORT_OPTIONS.keys()),
+            key="station_sort"
         )
 
-        pivot_df = train_weekday_df.pivot(
-            index="train_type",
-            columns="wochentag",
-            values="avg_delay"
+    with col3:
+        max_fahrten = int(pc.max(stations["fahrten"]).as_py())
+        min_fahrten = st.slider(
+            "Mindestanzahl Halte:",
+            min_value=0,
+            max_value=max_fahrten,
+            value=min(STATION_MIN_FAHRTEN_DEFAULT, max_fahrten),
+            key="station_min_fahrten"
         )
 
-        weekday_order = list(WOCHENTAGE_KURZ.values())
-        pivot_df = pivot_df[[col for col in weekday_order if col in pivot_df.columns]]
+    sort_by, worst_descending = STATION_SORT_OPTIONS[sort_label]
+    descending = worst_descending if ranking == "Schlechteste" else not worst_descending
+
+    matching = pc.sum(pc.greater_equal(stations["fahrten"], min_fahrten)).as_py() or 0
+    if not matching:
+        st.warning("⚠️ Kein Bahnhof erreicht die Mindestanzahl Halte.")
+        return
+
+    pages = (matching + STATION_PAGE_SIZE - 1) // STATION_PAGE_SIZE
+    if st.session_state.get("station_page", 1) > pages:
+        # Filter hat die Liste verkürzt: zurück auf die erste Seite
+        st.session_state["station_page"] = 1
+    page = st.number_input(
+        f"Seite (von {pages}):",
+        min_value=1,
+        max_value=pages,
+        value=1,
+        key="station_page"
+    ) if pages > 1 else 1
+
+    page_table, _ = station_index.leaderboard_page(
+        stations, sort_by, descending, min_fahrten, int(page), STATION_PAGE_SIZE
+    )
 
-        st.markdown("**Heatmap-Ansicht (Durchschnittliche Verspätung in Minuten):**")
-        st.dataframe(pivot_df, use_container_width=True)
-    else:
-        st.info("Keine Daten für die ausgewählten Zugtypen verfügbar.")
-else:
-    st.info("Wähle mindestens einen Zugtyp für die erweiterte Analyse.")
+    st.caption(f"{matching:,} von {stations.num_rows:,} Bahnhöfen mit mindestens {min_fahrten:,} Halten")
+    st.dataframe(
+        page_table,
+        hide_index=True,
+        use_container_width=True
+    )
+
+
+# ============================================================
+# ANALYSE-TABS (nur der geöffnete Tab wird berechnet)
+# ============================================================
+
+tab_rush_hour, tab_weekday, tab_train_type, tab_extended, tab_distribution, tab_stations = st.tabs(
+    ["🕐 Rush Hour", "📅 Wochentage", "🚄 Zugtypen", "📊 Zugtyp × Wochentag", "📈 Verteilung", "🏆 Bahnhöfe"],
+    on_change="rerun",
+    key="analysis_tab"
+)
+
+with tab_rush_hour:
+    if tab_rush_hour.open:
+        render_rush_hour_section()
+
+with tab_weekday:
+    if tab_weekday.open:
+        render_weekday_section()
+
+with tab_train_type:
+    if tab_train_type.open:
+        render_train_type_section()
+
+with tab_extended:
+    if tab_extended.open:
+        render_extended_section()
+
+with tab_distribution:
+    if tab_distribution.open:
+        render_distribution_section()
+
+with tab_stations:
+    if tab_stations.open:
+        render_station_section()
 
 st.markdown("---")
 
+# ============================================================
+# PREFETCH (Nachbarmonate im Hintergrund vorbereiten)
+# ============================================================
+
+def warm_month_panels(data_path: str) -> None:
+    """Berechnet KPIs, Rush Hour und Wochentage eines Monats vor (füllt den Cache)."""
+    data_paths = (data_path,)
+    get_kpis(data_paths)
+    get_rush_hour_stats(data_paths)
+    get_weekday_stats(data_paths)
+    # Stichprobe für den schnellen ersten Aufbau bei einem späteren Zeitraum
+    approximate.ensure_sample(data_path, source=warehouse.source_for(data_path))
+
+
+@st.cache_resource
+def get_prefetcher() -> prefetch.MonthPrefetcher:
+    """Prozessweiter Prefetcher, von allen Sessions geteilt."""
+    mirror = data_mirror.get_mirror()
+    return prefetch.MonthPrefetcher(
+        fetch=lambda month, keep: mirror.fetch(
+            month, keep=keep, sha256=expected_checksum(month), revision=catalog.revision()
+        ),
+        warm=warm_month_panels,
+        is_ready=lambda month: mirror.contains(month, expected_checksum(month)),
+    )
+
+
+prefetcher = get_prefetcher()
+prefetcher.schedule(selected_months, available_months)
+
 # ============================================================
 # FOOTER
 # ============================================================
@@ -612,7 +835,8 @@ st.markdown(f"""
 **Konfiguration:**
 - Pünktlichkeitsschwelle: ≤{PUENKTLICH_THRESHOLD_MIN} Minuten
 - Verspätungsschwelle: >{VERSPAETET_THRESHOLD_MIN} Minuten
-- Daten-Cache: 24 Stunden
+- Daten-Cache: lokaler Mirror mit LRU-Eviction ({data_mirror.MIRROR_MAX_BYTES / 1024 ** 3:.0f} GB)
+- Ergebnis-Cache: auf der Platte, von allen Workern geteilt ({result_cache.RESULT_CACHE_MAX_BYTES / 1024 ** 2:.0f} MB)
 
 **Erstellt von:** Sebastian Kühnrich  
 **Technologien:** Python, DuckDB, Streamlit, HuggingFace Hub
@@ -622,15 +846,88 @@ st.markdown(f"""
 *Dieses Dashboard wurde im Rahmen des Big Data Moduls erstellt.*
 """)
 
-with st.expander("🔍 Rohdaten anzeigen (erste 100 Zeilen)"):
-    try:
-        sample = execute_query(f"SELECT * FROM '{DATA_PATH}' LIMIT 100")
-        st.dataframe(sample, use_container_width=True)
-    except Exception as e:
-        st.error(f"Fehler beim Laden der Rohdaten: {e}")
 
-with st.expander("🔧 Debug-Informationen"):
-    st.write("**Datenpfad:**", DATA_PATH)
+def render_query_log() -> None:
+    """Tabelle der letzten Query-Aufrufe und EXPLAIN ANALYZE auf Knopfdruck."""
+    records = query_metrics.get_query_log().records()
+    st.write("**Letzte Queries:**")
+    if not records:
+        st.caption("Noch keine Queries gemessen.")
+        return
+
+    st.dataframe(
+        pa.Table.from_pylist([
+            {key: value for key, value in record.items() if key != "sql"}
+            for record in records
+        ]),
+        hide_index=True,
+        use_container_width=True
+    )
+
+    # Jede lesende SQL-Query kann profiliert werden (gleiche SQL nur einmal)
+    statements: dict[str, str] = {}
+    for record in records:
+        for i, sql in enumerate(record["sql"]):
+            if query_metrics.is_explainable(sql) and sql not in statements.values():
+                statements[f"{record['funktion']}({record['parameter']}) – Query {i + 1}"] = sql
+    if not statements:
+        return
+
+    choice = st.selectbox(
+        "EXPLAIN ANALYZE für:",
+        options=list(statements.keys()),
+        key="explain_choice"
+    )
+    if st.button("⏱️ Profil erfassen", key="explain_run"):
+        try:
+            st.code(query_metrics.explain_analyze(statements[choice]), language="text")
+        except Exception as e:
+            st.error(f"Fehler bei EXPLAIN ANALYZE: {e}")
+
+
+def render_debug_info() -> None:
+    """Zeigt Pfade, Cache-, Prefetch- und Query-Status für Entwickler an."""
+    st.write("**Datenpfade:**", list(DATA_PATHS))
+    st.write("**Rollups:**", [rollup.rollup_path_for(path) for path in DATA_PATHS])
+    st.write("**Scan-Quelle:**", [warehouse.describe_source(path) for path in DATA_PATHS])
+    st.write("**Stichproben:**", [approximate.describe_sample(path) for path in DATA_PATHS])
+    st.write("**Verspätungs-Histogramme:**", [delay_sketch.sketch_path_for(path) for path in DATA_PATHS])
+    st.write("**Bahnhofs-Indizes:**", [station_index.station_index_path_for(path) for path in DATA_PATHS])
+    st.write("**Anzeige:**", "Schätzwerte (exakte Panels laufen)" if APPROXIMATE else "exakt")
     st.write("**Verfügbare Monate:**", len(available_months))
-    st.write("**Verfügbare Zugtypen:**", len(all_train_types))
-    st.write("**HuggingFace Repo:**", HF_REPO_ID)
\ No newline at end of file
+    st.write("**Verfügbare Zugtypen:**", len(get_train_types(DATA_PATHS)))
+    st.write("**HuggingFace Repo:**", HF_REPO_ID)
+    age = catalog.age_seconds()
+    st.write(
+        "**Dataset-Stand:**",
+        f"{catalog.revision()} (vor {age / 60:.0f} min abgeglichen)" if age is not None else "noch nicht abgeglichen"
+    )
+    st.write("**Prefetch:**", prefetcher.status() or "keine Jobs")
+    cache = result_cache.get_result_cache()
+    st.write(
+        "**Ergebnis-Cache:**",
+        f"{cache.cache_dir} ({cache.total_bytes() / 1024 ** 2:.1f} / {cache.max_bytes / 1024 ** 2:.0f} MB)"
+    )
+    mirror = data_mirror.get_mirror()
+    st.write(
+        "**Lokaler Mirror:**",
+        f"{mirror.mirror_dir} ({mirror.total_bytes() / 1024 ** 3:.2f} / "
+        f"{mirror.max_bytes / 1024 ** 3:.2f} GB, {len(mirror.entries())} Monate)"
+    )
+    render_query_log()
+
+
+# Expander laden ihren Inhalt erst beim Aufklappen
+raw_data_expander = st.expander("🔍 Rohdaten anzeigen (erste 100 Zeilen)", on_change="rerun", key="raw_data")
+with raw_data_expander:
+    if raw_data_expander.open:
+        try:
+            sample = execute_query_arrow(f"SELECT * FROM {warehouse.source_for(DATA_PATHS)} LIMIT 100")
+            st.dataframe(sample, use_container_width=True)
+        except Exception as e:
+            st.error(f"Fehler beim Laden der Rohdaten: {e}")
+
+debug_expander = st.expander("🔧 Debug-Informationen", on_change="rerun", key="debug")
+with debug_expander:
+    if debug_expander.open:
+        render_debug_info()
@@ -0,0 +1,244 @@
+"""
+============================================================
+    APPROXIMATIVE PANELS
+    Schätzwerte aus Stichproben, exakte Werte im Hintergrund
+============================================================
+
+Ein Cache-Miss auf die exakten Panels kostet bei großen Zeiträumen
+Sekunden (Rollup-Build bzw. Scan über alle Rollups). Damit die Seite
+trotzdem sofort etwas zeigt, werden die Panels zuerst aus einer kleinen
+Stichprobe geschätzt (`panel_engine.compute_estimates`, mit 95%-
+Konfidenzintervallen), während der PanelRefiner die exakten Panels in
+einem Hintergrund-Thread berechnet.
+
+Pro Monat liegt eine Stichprobe als `<monat>.<fingerabdruck>.sample.parquet`
+vor: eine Bernoulli-Stichprobe (SAMPLE_FRACTION) der Messgrößen je Halt
+mit Gewicht 1/Anteil. Gebaut wird sie nur im Hintergrund (Ingest, Prefetch,
+`PanelRefiner.build_samples`): der Bau ist ein voller Scan des Monats und
+liefe im Vordergrund parallel zum exakten Scan. Fehlt sie, wartet die
+Seite auf die exakten Werte. System-Sampling (ganze Vektoren) wäre noch
+billiger, trifft aber Ausreißer und Zeitbereiche so grob, dass die
+Intervalle nicht halten.
+
+Verwendung:
+    python approximate.py ../Data/deutsche_bahn_data/monthly_processed_data/data-2024-10.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Callable, Sequence
+
+import warehouse
+from db_connection import execute_statement
+from panel_engine import WEIGHT_COLUMN, parquet_source, stop_event_measures
+from rollup import source_fingerprint, source_month_stem, source_stem
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_DIR = os.environ.get(
+    "DB_SAMPLE_DIR",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "samples"),
+)
+
+SAMPLE_SUFFIX = ".sample.parquet"
+
+# Anteil der Halte in der vorgebauten Stichprobe (1% ≈ 20k Zeilen pro Monat)
+SAMPLE_FRACTION = float(os.environ.get("DB_SAMPLE_FRACTION", "0.01"))
+
+# Fester Seed: gleiche Schätzung bei jedem Aufruf
+SAMPLE_SEED = 42
+
+# Gleichzeitige Hintergrund-Berechnungen der exakten Panels
+REFINE_WORKERS = int(os.environ.get("DB_REFINE_WORKERS", "2"))
+
+# Verhindert, dass zwei Threads dieselbe Stichprobe gleichzeitig bauen
+_build_lock = threading.Lock()
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# STICHPROBEN
+# ============================================================
+
+def sample_path_for(data_path: str, sample_dir: str = SAMPLE_DIR) -> str:
+    """Pfad der Stichprobe, die zum aktuellen Stand der Quelldatei gehört."""
+    name = f"{source_stem(data_path)}.{source_fingerprint(data_path)}{SAMPLE_SUFFIX}"
+    return os.path.join(sample_dir, name)
+
+
+def is_sampled(data_path: str, sample_dir: str = SAMPLE_DIR) -> bool:
+    """True, wenn eine aktuelle Stichprobe existiert."""
+    return os.path.exists(sample_path_for(data_path, sample_dir))
+
+
+def build_sample(
+    data_path: str,
+    sample_dir: str = SAMPLE_DIR,
+    source: str | None = None,
+    fraction: float = SAMPLE_FRACTION,
+) -> str:
+    """Schreibt die Bernoulli-Stichprobe eines Monats und gibt ihren Pfad zurück."""
+    os.makedirs(sample_dir, exist_ok=True)
+    target = sample_path_for(data_path, sample_dir)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    sampled = (
+        f"(SELECT * FROM {source or parquet_source(data_path)} "
+        f"USING SAMPLE {fraction * 100:g} PERCENT (bernoulli, {SAMPLE_SEED}))"
+    )
+    execute_statement(
+        f"COPY (SELECT *, {1 / fraction!r} as {WEIGHT_COLUMN} FROM {stop_event_measures(sampled)}) "
+        f"TO '{tmp_path}' (FORMAT parquet, COMPRESSION zstd)"
+    )
+    os.replace(tmp_path, target)
+
+    for old in glob.glob(os.path.join(sample_dir, f"{source_month_stem(data_path)}.*{SAMPLE_SUFFIX}")):
+        if old != target:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    return target
+
+
+def ensure_sample(data_path: str, sample_dir: str = SAMPLE_DIR, source: str | None = None) -> str:
+    """Gibt eine aktuelle Stichprobe zurück und baut sie bei Bedarf."""
+    target = sample_path_for(data_path, sample_dir)
+    if os.path.exists(target):
+        return target
+
+    with _build_lock:
+        if os.path.exists(target):
+            return target
+        return build_sample(data_path, sample_dir, source)
+
+
+def sample_cells(data_paths: Sequence[str], sample_dir: str = SAMPLE_DIR) -> str:
+    """
+    Gewichtete Stichprobe über alle Monate (Eingabe für compute_estimates).
+
+    Baut nichts: nur aufrufen, wenn is_sampled() für alle Monate gilt.
+    """
+    return parquet_source([sample_path_for(data_path, sample_dir) for data_path in data_paths])
+
+
+def describe_sample(data_path: str, sample_dir: str = SAMPLE_DIR) -> str:
+    """Stichprobe eines Monats (für die Debug-Anzeige)."""
+    if is_sampled(data_path, sample_dir):
+        return f"Stichprobe: {sample_path_for(data_path, sample_dir)}"
+    return "Stichprobe: noch nicht gebaut"
+
+
+# ============================================================
+# VERFEINERUNG IM HINTERGRUND
+# ============================================================
+
+class PanelRefiner:
+    """
+    Berechnet exakte Panels in Hintergrund-Threads.
+
+    `compute(data_paths)` ist die (gecachte) exakte Berechnung. Das
+    Ergebnis wird nicht hier gehalten: Ist ein Job fertig, liefert ein
+    erneuter Aufruf von `compute` den Wert aus dessen Cache.
+    """
+
+    def __init__(self, compute: Callable[[tuple[str, ...]], object], max_workers: int = REFINE_WORKERS):
+        self._compute = compute
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refine")
+        self._lock = threading.Lock()
+        self._jobs: dict[tuple[str, ...], Future] = {}
+        self._sample_jobs: dict[str, Future] = {}
+
+    def _run(self, data_paths: tuple[str, ...]) -> None:
+        try:
+            self._compute(data_paths)
+        except Exception:
+            # Der Fehler erscheint beim nächsten Aufruf im Vordergrund erneut
+            logger.exception("Exakte Panels fehlgeschlagen: %s", data_paths)
+
+    def wait(self, data_paths: tuple[str, ...], timeout: float | None) -> bool:
+        """
+        Startet (falls nötig) den Job und wartet höchstens `timeout` Sekunden.
+
+        True, wenn die exakten Panels danach bereitstehen.
+        """
+        with self._lock:
+            future = self._jobs.get(data_paths)
+            if future is None:
+                future = self._jobs[data_paths] = self._executor.submit(self._run, data_paths)
+
+        done, _ = wait_futures([future], timeout=timeout)
+        if not done:
+            return False
+
+        with self._lock:
+            if self._jobs.get(data_paths) is future:
+                del self._jobs[data_paths]
+        return True
+
+    def _build_sample(self, data_path: str) -> None:
+        try:
+            ensure_sample(data_path, source=warehouse.source_for(data_path))
+        except Exception:
+            logger.exception("Stichprobe fehlgeschlagen: %s", data_path)
+
+    def build_samples(self, data_paths: tuple[str, ...]) -> None:
+        """Baut fehlende Stichproben im Hintergrund (nach bereits geplanten exakten Jobs)."""
+        with self._lock:
+            self._sample_jobs = {path: job for path, job in self._sample_jobs.items() if not job.done()}
+            for data_path in data_paths:
+                if data_path in self._sample_jobs or is_sampled(data_path):
+                    continue
+                self._sample_jobs[data_path] = self._executor.submit(self._build_sample, data_path)
+
+    def is_ready(self, data_paths: tuple[str, ...]) -> bool:
+        """True, wenn kein Job für data_paths mehr läuft."""
+        with self._lock:
+            future = self._jobs.get(data_paths)
+        return future is None or future.done()
+
+    def running(self) -> list[tuple[str, ...]]:
+        """Zeiträume, deren exakte Panels gerade berechnet werden."""
+        with self._lock:
+            return [paths for paths, future in self._jobs.items() if not future.done()]
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Baut Stichproben für die approximative Dashboard-Anzeige.")
+    parser.add_argument("files", nargs="+", help="Monatsdateien (data-YYYY-MM.parquet)")
+    parser.add_argument("--out", default=SAMPLE_DIR, help="Zielordner für die Stichproben")
+    parser.add_argument("--fraction", type=float, default=SAMPLE_FRACTION, help="Anteil der Halte (0.01 = 1%%)")
+    parser.add_argument("--force", action="store_true", help="Auch aktuelle Stichproben neu bauen")
+    args = parser.parse_args()
+
+    for data_path in args.files:
+        if is_sampled(data_path, args.out) and not args.force:
+            print(f"⏭️  {os.path.basename(data_path)} ist aktuell")
+            continue
+
+        target = build_sample(data_path, args.out, warehouse.source_for(data_path), args.fraction)
+        sample_kb = os.path.getsize(target) / 1024
+        print(f"✅ {os.path.basename(data_path)} → {target} ({sample_kb:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+"""
+============================================================
+    BATCH-BEREINIGUNG
+    Viele Monate parallel bereinigen (Prozess-Pool)
+============================================================
+
+data_cleaning.py bereinigt genau eine fest eingetragene Datei. Für einen
+Backfill (z.B. ein ganzes Jahr) bereinigt dieser Befehl alle angegebenen
+Monate parallel, jeden in einem eigenen Prozess:
+
+- Eingaben: Dateien, Globs oder Monate/Monatsbereiche (2024-01..2024-12,
+  gesucht als data-YYYY-MM.parquet in --input-dir)
+- Pro Monat: `<name>-CLEANED.parquet` und `<name>-cleaning_log.txt`
+  (wie data_cleaning.py), geschrieben über eine Temp-Datei
+- Gesamt: `cleaning_summary.json` (pro Monat Zeilen, Dauer, Fehler) und
+  `cleaning_summary.txt` mit den summierten Zählern aller Regeln
+
+Jeder Worker bekommt das Speicherbudget --memory-mb (Engine streaming
+oder duckdb) und einen Anteil der Kerne für DuckDB/Arrow. Ein Fehler in
+einem Monat bricht die anderen nicht ab.
+
+Verwendung:
+    python batch_cleaning.py 2024-01..2024-12 --workers 4 --memory-mb 512
+    python batch_cleaning.py "../Data/deutsche_bahn_data/monthly_processed_data/data-2024-*.parquet"
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Sequence
+
+import data_cleaning
+import data_mirror
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+INPUT_DIR = os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "monthly_processed_data")
+
+CLEANED_SUFFIX = "-CLEANED.parquet"
+LOG_SUFFIX = "-cleaning_log.txt"
+SUMMARY_NAME = "cleaning_summary"
+
+MONTH_PATTERN = re.compile(r"(\d{4})-(\d{2})")
+
+
+# ============================================================
+# EINGABEN
+# ============================================================
+
+def expand_months(spec: str) -> list[str]:
+    """'2024-10' → ['2024-10'], '2024-11..2025-01' → ['2024-11', '2024-12', '2025-01']."""
+    first, _, last = spec.partition("..")
+    start, end = MONTH_PATTERN.fullmatch(first), MONTH_PATTERN.fullmatch(last or first)
+    if start is None or end is None:
+        raise ValueError(f"Kein Monat oder Monatsbereich: {spec}")
+
+    year, month = int(start[1]), int(start[2])
+    end_year, end_month = int(end[1]), int(end[2])
+    months = []
+    while (year, month) <= (end_year, end_month):
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def resolve_inputs(specs: Sequence[str], input_dir: str = INPUT_DIR) -> list[str]:
+    """Dateien, Globs und Monatsbereiche → sortierte Liste von Monatsdateien (ohne Doppelte)."""
+    paths = []
+    for spec in specs:
+        if MONTH_PATTERN.fullmatch(spec.partition("..")[0]):
+            paths += [os.path.join(input_dir, data_mirror.month_filename(m)) for m in expand_months(spec)]
+        elif glob.has_magic(spec):
+            paths += glob.glob(spec)
+        else:
+            paths.append(spec)
+
+    # Eigene Ausgaben eines früheren Laufs nicht erneut bereinigen
+    paths = [path for path in paths if not path.endswith(CLEANED_SUFFIX)]
+    return sorted(set(os.path.abspath(path) for path in paths))
+
+
+def output_paths(input_path: str, out_dir: str | None = None) -> tuple[str, str]:
+    """(bereinigte Datei, Log) für eine Monatsdatei; ohne `out_dir` neben der Quelle."""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    directory = out_dir or os.path.dirname(input_path)
+    return os.path.join(directory, stem + CLEANED_SUFFIX), os.path.join(directory, stem + LOG_SUFFIX)
+
+
+# ============================================================
+# WORKER
+# ============================================================
+
+def _init_worker(threads: int) -> None:
+    """Begrenzt DuckDB und Arrow im Worker auf seinen Anteil der Kerne."""
+    os.environ["DB_THREADS"] = str(threads)
+    import pyarrow as pa
+    pa.set_cpu_count(threads)
+
+
+def clean_one(
+    input_path: str,
+    output_path: str,
+    log_path: str,
+    engine: str,
+    memory_mb: int,
+    compact: bool = False,
+) -> dict[str, Any]:
+    """Bereinigt einen Monat im Worker; die Log-Zeilen landen nur in der Log-Datei."""
+    start = time.time()
+    stats = Counter()
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            counts = data_cleaning.clean_file(input_path, tmp_path, log_path, engine, memory_mb, stats, compact)
+        os.replace(tmp_path, output_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {**counts, "seconds": round(time.time() - start, 1), "stats": dict(stats)}
+
+
+# ============================================================
+# BATCH
+# ============================================================
+
+def clean_months(
+    input_paths: Sequence[str],
+    out_dir: str | None = None,
+    workers: int | None = None,
+    engine: str = "streaming",
+    memory_mb: int = data_cleaning.STREAM_MEMORY_MB,
+    compact: bool = False,
+) -> dict[str, Any]:
+    """
+    Bereinigt alle Monate parallel und gibt die Zusammenfassung zurück.
+
+    Schreibt `cleaning_summary.json` und `cleaning_summary.txt` nach
+    `out_dir` (ohne `out_dir` neben die erste Eingabe).
+    """
+    names = [os.path.basename(path) for path in input_paths]
+    if len(set(names)) != len(names):
+        raise ValueError("Dateinamen müssen eindeutig sein (Ausgaben und Zusammenfassung nach Namen)")
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(input_paths) or 1))
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    summary_dir = out_dir or (os.path.dirname(input_paths[0]) if input_paths else ".")
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    start = time.time()
+    months: dict[str, dict[str, Any]] = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = {}
+        for input_path in input_paths:
+            output_path, log_path = output_paths(input_path, out_dir)
+            future = pool.submit(clean_one, input_path, output_path, log_path, engine, memory_mb, compact)
+            futures[future] = (input_path, output_path, log_path)
+
+        for future in as_completed(futures):
+            input_path, output_path, log_path = futures[future]
+            entry: dict[str, Any] = {"input": input_path, "output": output_path, "log": log_path}
+            try:
+                entry.update(future.result())
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+                print(f"❌ {os.path.basename(input_path)}: {entry['error']}")
+            else:
+                print(
+                    f"✅ {os.path.basename(input_path)}: {entry['rows_before']:,} → "
+                    f"{entry['rows_after']:,} Zeilen ({entry['seconds']:.1f} s)"
+                )
+            months[os.path.basename(input_path)] = entry
+
+    done = [entry for entry in months.values() if "error" not in entry]
+    stats = data_cleaning.merge_stats(entry.pop("stats") for entry in done)
+    summary = {
+        "engine": engine,
+        "workers": workers,
+        "memory_mb_per_worker": memory_mb,
+        "compact": compact,
+        "seconds": round(time.time() - start, 1),
+        "months": dict(sorted(months.items())),
+        "failed": sorted(name for name, entry in months.items() if "error" in entry),
+        "rows_before": sum(entry["rows_before"] for entry in done),
+        "rows_after": sum(entry["rows_after"] for entry in done),
+        "stats": dict(sorted(stats.items())),
+    }
+    write_summary(summary, stats, summary_dir)
+    return summary
+
+
+def write_summary(summary: dict[str, Any], stats: Counter, summary_dir: str) -> None:
+    """Schreibt die Zusammenfassung als JSON und als Log mit den summierten Zählern."""
+    with open(os.path.join(summary_dir, SUMMARY_NAME + ".json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+
+    logger = data_cleaning.CleaningLogger(os.path.join(summary_dir, SUMMARY_NAME + ".txt"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        logger.log("INFO", f"{len(summary['months'])} Monate, {summary['workers']} Worker, "
+                           f"Engine {summary['engine']}, {summary['memory_mb_per_worker']:,} MB pro Worker")
+        for name, entry in summary["months"].items():
+            if "error" in entry:
+                logger.log("ERROR", f"{name}: {entry['error']}")
+            else:
+                logger.log("MONTH", f"{name}: {entry['rows_before']:,} → {entry['rows_after']:,} Zeilen "
+                                    f"({entry['seconds']:.1f} s)")
+        if stats:
+            data_cleaning.log_stats(stats, logger)
+        logger.save()
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bereinigt viele Monate parallel.")
+    parser.add_argument("inputs", nargs="+", help="Monatsdateien, Globs oder Monate (2024-10, 2024-01..2024-12)")
+    parser.add_argument("--input-dir", default=INPUT_DIR, help="Ordner für Monatsangaben (data-YYYY-MM.parquet)")
+    parser.add_argument("--out", default=None, help="Zielordner (Standard: neben der jeweiligen Quelle)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Anzahl paralleler Prozesse")
+    parser.add_argument("--engine", choices=data_cleaning.ENGINES, default="streaming", help="Engine pro Monat")
+    parser.add_argument("--memory-mb", type=int, default=data_cleaning.STREAM_MEMORY_MB, help="Speicherbudget pro Worker")
+    parser.add_argument("--compact", action="store_true", help="Kompakte Typen (Dictionary, int16) und zstd")
+    args = parser.parse_args()
+
+    input_paths = resolve_inputs(args.inputs, args.input_dir)
+    missing = [path for path in input_paths if not os.path.exists(path)]
+    if missing:
+        print(f"❌ Nicht gefunden: {', '.join(missing)}")
+        sys.exit(1)
+    if not input_paths:
+        print("📭 Keine Monatsdateien gefunden")
+        sys.exit(1)
+
+    print(f"🧹 {len(input_paths)} Monate, {min(args.workers, len(input_paths))} Worker, "
+          f"Engine {args.engine}, {args.memory_mb:,} MB pro Worker")
+    summary = clean_months(input_paths, args.out, args.workers, args.engine, args.memory_mb, args.compact)
+
+    removed = summary["rows_before"] - summary["rows_after"]
+    print(f"📊 {summary['rows_before']:,} → {summary['rows_after']:,} Zeilen ({removed:,} entfernt) "
+          f"in {summary['seconds']:.1f} s")
+    if summary["failed"]:
+        print(f"❌ Fehlgeschlagen: {', '.join(summary['failed'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
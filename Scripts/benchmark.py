@@ -0,0 +1,251 @@
+"""
+============================================================
+    BENCHMARK DER DASHBOARD-QUERIES
+    p50/p95 Latenz und Peak-RSS auf synthetischen Daten
+============================================================
+
+Misst die Query-Funktionen des Dashboards ohne Streamlit auf synthetischen
+Monatsdateien aus create_sample_data.py (Schema wie die echten Monate). Jede
+Funktion läuft in einem eigenen Prozess, damit der Peak-RSS nur ihr
+gehört. Gemessen wird der Cache-Miss-Pfad des Dashboards:
+
+    build_rollup   Rohdaten → Monats-Rollup (einmal pro Monat)
+    get_*          Panels aus dem Rollup berechnen + Panel herausschneiden
+
+Die Ergebnisse landen als JSON im Benchmark-Ordner und können gegen eine
+gespeicherte Baseline verglichen werden (Exit-Code 1 bei Regression).
+
+Verwendung:
+    python benchmark.py --sizes 100k 2M --repeat 5
+    python benchmark.py --save-baseline
+    python benchmark.py --baseline ../Data/deutsche_bahn_data/benchmark/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from typing import Any, Callable
+
+import duckdb
+import pyarrow as pa
+
+import create_sample_data
+import panel_engine
+import rollup
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BENCHMARK_DIR = os.environ.get(
+    "DB_BENCHMARK_DIR",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "benchmark"),
+)
+BASELINE_PATH = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Datensatzgrößen (Label → Zeilen)
+DATASET_SIZES: dict[str, int] = {
+    "100k": 100_000,
+    "2M": 2_000_000,
+    "20M": 20_000_000,
+    "100M": 100_000_000,
+}
+
+# Filter wie in den Standardeinstellungen des Dashboards
+BENCHMARK_TRAIN_TYPES: tuple[str, ...] = ("ICE", "IC", "RE", "RB", "S")
+BENCHMARK_EXTENDED_TYPES: tuple[str, ...] = ("ICE", "IC", "RE")
+
+# Query-Funktion → Schnitt aus den Panels (wie die gleichnamigen Dashboard-Funktionen)
+BENCHMARK_FUNCTIONS: dict[str, Callable[[pa.Table], Any]] = {
+    "get_kpis": panel_engine.kpis_from_panels,
+    "get_rush_hour_stats": panel_engine.rush_hour_from_panels,
+    "get_weekday_stats": panel_engine.weekday_from_panels,
+    "get_train_types": panel_engine.train_types_from_panels,
+    "get_train_type_stats": lambda panels: panel_engine.train_type_stats_from_panels(
+        panels, BENCHMARK_TRAIN_TYPES
+    ),
+    "get_train_weekday_stats": lambda panels: panel_engine.train_weekday_from_panels(
+        panels, BENCHMARK_EXTENDED_TYPES
+    ),
+}
+
+ROLLUP_CASE = "build_rollup"
+
+# Ab dieser Verschlechterung von p50 oder p95 gilt ein Lauf als Regression
+DEFAULT_TOLERANCE = 0.10
+
+
+# ============================================================
+# SYNTHETISCHE DATEN
+# ============================================================
+
+def ensure_dataset(label: str, rows: int, benchmark_dir: str = BENCHMARK_DIR) -> str:
+    """Pfad der synthetischen Datei für eine Größe (wird einmalig erzeugt)."""
+    data_dir = os.path.join(benchmark_dir, "data")
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"synthetic-{label}.parquet")
+    if not os.path.exists(path):
+        create_sample_data.generate(path, rows)
+    return path
+
+
+# ============================================================
+# MESSUNG
+# ============================================================
+
+def percentile(values: list[float], pct: float) -> float:
+    """Perzentil nach Nearest-Rank (stabil auch bei wenigen Läufen)."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _peak_rss_mb() -> float:
+    """Peak-RSS des aktuellen Prozesses in MB."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux meldet KB, macOS Bytes
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _measure(case: str, data_path: str, rollup_dir: str, repeat: int, warmup: int) -> dict[str, Any]:
+    """Läuft im Kindprozess: misst einen Fall und gibt Latenzen + Peak-RSS zurück."""
+    if case == ROLLUP_CASE:
+        def run() -> Any:
+            return rollup.build_rollup(data_path, rollup_dir)
+    else:
+        source = panel_engine.parquet_source(rollup.ensure_rollup(data_path, rollup_dir))
+        slice_panels = BENCHMARK_FUNCTIONS[case]
+
+        def run() -> Any:
+            return slice_panels(panel_engine.compute_panels(source))
+
+    latencies = []
+    for i in range(warmup + repeat):
+        start = time.perf_counter()
+        run()
+        if i >= warmup:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    return {
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "runs_ms": [round(value, 2) for value in latencies],
+    }
+
+
+def run_benchmark(
+    sizes: list[str],
+    functions: list[str],
+    repeat: int,
+    warmup: int,
+    benchmark_dir: str = BENCHMARK_DIR,
+) -> dict[str, Any]:
+    """Misst alle Funktionen auf allen Größen, jeden Fall in einem frischen Prozess."""
+    rollup_dir = os.path.join(benchmark_dir, "rollups")
+    context = multiprocessing.get_context("spawn")
+    results: dict[str, dict[str, Any]] = {}
+
+    for label in sizes:
+        print(f"📦 Datensatz {label} ({DATASET_SIZES[label]:,} Zeilen)")
+        data_path = ensure_dataset(label, DATASET_SIZES[label], benchmark_dir)
+        results[label] = {}
+
+        for case in [ROLLUP_CASE, *functions]:
+            with context.Pool(1) as pool:
+                stats = pool.apply(_measure, (case, data_path, rollup_dir, repeat, warmup))
+            results[label][case] = stats
+            print(
+                f"   {case:<26} p50 {stats['p50_ms']:>9.1f} ms   "
+                f"p95 {stats['p95_ms']:>9.1f} ms   RSS {stats['peak_rss_mb']:>7.1f} MB"
+            )
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "duckdb": duckdb.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "warmup": warmup,
+        },
+        "results": results,
+    }
+
+
+# ============================================================
+# BASELINE-VERGLEICH
+# ============================================================
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float = DEFAULT_TOLERANCE) -> list[str]:
+    """Vergleicht p50/p95 mit der Baseline und gibt die Regressionen zurück."""
+    regressions = []
+    print(f"\n📊 Vergleich mit Baseline vom {baseline['meta']['created']}")
+
+    for label, cases in results["results"].items():
+        for case, stats in cases.items():
+            base = baseline["results"].get(label, {}).get(case)
+            if base is None:
+                continue
+            changes = []
+            for metric in ("p50_ms", "p95_ms"):
+                ratio = stats[metric] / base[metric] if base[metric] else 1.0
+                changes.append(f"{metric[:3]} {ratio - 1:+.0%}")
+                if ratio > 1 + tolerance:
+                    regressions.append(f"{label}/{case} {metric}: {base[metric]} → {stats[metric]} ms")
+            print(f"   {label:<5} {case:<26} {'   '.join(changes)}")
+
+    return regressions
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark der Dashboard-Queries auf synthetischen Daten.")
+    parser.add_argument("--sizes", nargs="+", choices=list(DATASET_SIZES), default=list(DATASET_SIZES))
+    parser.add_argument("--functions", nargs="+", choices=list(BENCHMARK_FUNCTIONS), default=list(BENCHMARK_FUNCTIONS))
+    parser.add_argument("--repeat", type=int, default=10, help="Gemessene Läufe pro Funktion")
+    parser.add_argument("--warmup", type=int, default=1, help="Ungemessene Läufe vorab")
+    parser.add_argument("--out", help="Ergebnis-JSON (Standard: Benchmark-Ordner mit Zeitstempel)")
+    parser.add_argument("--baseline", help="Baseline-JSON zum Vergleich")
+    parser.add_argument("--save-baseline", action="store_true", help="Ergebnis als neue Baseline speichern")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Erlaubte Verschlechterung (0.1 = 10%%)")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.functions, args.repeat, args.warmup)
+
+    out = args.out or os.path.join(BENCHMARK_DIR, f"results-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    targets = [out, BASELINE_PATH] if args.save_baseline else [out]
+    for path in targets:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"💾 {path}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\n❌ Regressionen:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ Keine Regression")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,408 @@
-import duckdb
-import pandas as pd
+"""
+============================================================
+    SYNTHETISCHE MONATSDATEN
+    Schema-identische Parquet-Dateien beliebiger Größe
+============================================================
+
+Erzeugt Monatsdateien mit dem Schema von `data-YYYY-MM.parquet` – von
+10k bis 500M Zeilen – für Lasttests von Dashboard und Datenbereinigung
+ohne echte Daten. Generiert werden ganze Fahrten: Jede Fahrt hat einen
+Zugtyp, eine Linie, eine Startzeit und eine Folge von Halten
+(`train_line_station_num`), entlang derer sich die Verspätung aufbaut.
+
+Nachgebildet werden:
+- Zugtyp-Mix (viel S-Bahn, wenig Fernverkehr) mit typischer Haltanzahl
+- Tagesgang mit Rush Hour und weniger Verkehr am Wochenende
+- Verspätung: exponentiell je Zugtyp, höher in der Rush Hour und freitags
+- Teil-Ausfälle (ab einem Halt bis zum Ende der Fahrt)
+- Bahnhöfe mit Zipf-verteilter Popularität
+- Die Datenfehler, die data_cleaning.py behebt (abschaltbar mit --clean)
+
+Die Datei entsteht in Chunks, die ein Prozess-Pool parallel erzeugt. Es
+sind nie mehr als `2 × workers` Chunks gleichzeitig im Speicher, und
+jeder Chunk ist über (Seed, Chunk-Nummer) reproduzierbar – das Ergebnis
+hängt nicht von der Anzahl Worker ab.
+
+Verwendung:
+    python create_sample_data.py --rows 2M
+    python create_sample_data.py --rows 500M --workers 16 --out /data/data-2024-10.parquet
+    python create_sample_data.py --from ../Data/.../data-2024-10.parquet --rows 2000
+"""
+
+from __future__ import annotations
+
+import argparse
 import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-FULL_PATH = os.path.join(BASE_DIR, 'Data', 'deutsche_bahn_data', 'monthly_processed_data', 'data-2024-10.parquet')
-OUT_PATH = os.path.join(BASE_DIR, 'Data', 'deutsche_bahn_data', 'monthly_processed_data', 'data-2024-10-SAMPLE.parquet')
+DATA_DIR = os.path.join(BASE_DIR, 'Data', 'deutsche_bahn_data', 'monthly_processed_data')
+
+DEFAULT_MONTH = "2024-10"
+DEFAULT_SEED = 42
+DEFAULT_CHUNK_ROWS = 1_000_000
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+# Schema der Monatsdateien (wie data-2024-10-SAMPLE.parquet)
+SCHEMA = pa.schema([
+    ("station_name", pa.string()),
+    ("xml_station_name", pa.string()),
+    ("eva", pa.string()),
+    ("train_name", pa.string()),
+    ("final_destination_station", pa.string()),
+    ("delay_in_min", pa.int32()),
+    ("time", pa.timestamp("ns")),
+    ("is_canceled", pa.bool_()),
+    ("train_type", pa.string()),
+    ("train_line_ride_id", pa.string()),
+    ("train_line_station_num", pa.int64()),
+    ("arrival_planned_time", pa.timestamp("ns")),
+    ("arrival_change_time", pa.timestamp("ns")),
+    ("departure_planned_time", pa.timestamp("ns")),
+    ("departure_change_time", pa.timestamp("ns")),
+    ("id", pa.string()),
+])
+
+# Zugtyp → Anteil an den Halten, Halte pro Fahrt (min, max),
+# Minuten zwischen Halten, mittlere Startverspätung, Ausfallquote, Linien
+TRAIN_TYPES: dict[str, dict[str, Any]] = {
+    "S":   {"share": 0.50,  "stops": (12, 35), "interval": 2.5, "delay": 2.0, "cancel": 0.08, "lines": 40},
+    "RE":  {"share": 0.14,  "stops": (6, 20),  "interval": 7.0, "delay": 3.5, "cancel": 0.10, "lines": 90},
+    "RB":  {"share": 0.09,  "stops": (8, 25),  "interval": 4.0, "delay": 3.0, "cancel": 0.11, "lines": 120},
+    "Bus": {"share": 0.07,  "stops": (10, 30), "interval": 3.0, "delay": 2.0, "cancel": 0.05, "lines": 200},
+    "ICE": {"share": 0.06,  "stops": (5, 15),  "interval": 25.0, "delay": 7.0, "cancel": 0.11, "lines": 30},
+    "MEX": {"share": 0.022, "stops": (8, 20),  "interval": 5.0, "delay": 3.0, "cancel": 0.08, "lines": 20},
+    "IC":  {"share": 0.012, "stops": (6, 18),  "interval": 20.0, "delay": 6.0, "cancel": 0.10, "lines": 25},
+    "BRB": {"share": 0.012, "stops": (6, 18),  "interval": 5.0, "delay": 2.5, "cancel": 0.08, "lines": 10},
+    "ME":  {"share": 0.012, "stops": (6, 18),  "interval": 5.0, "delay": 3.0, "cancel": 0.08, "lines": 10},
+    "erx": {"share": 0.012, "stops": (6, 18),  "interval": 5.0, "delay": 3.0, "cancel": 0.08, "lines": 10},
+    "NWB": {"share": 0.01,  "stops": (6, 18),  "interval": 5.0, "delay": 2.5, "cancel": 0.08, "lines": 10},
+    "HLB": {"share": 0.01,  "stops": (6, 18),  "interval": 5.0, "delay": 2.5, "cancel": 0.08, "lines": 10},
+    "NJ":  {"share": 0.009, "stops": (8, 20),  "interval": 30.0, "delay": 9.0, "cancel": 0.06, "lines": 6},
+    "EC":  {"share": 0.005, "stops": (6, 15),  "interval": 25.0, "delay": 8.0, "cancel": 0.10, "lines": 8},
+    "FEX": {"share": 0.004, "stops": (3, 6),   "interval": 10.0, "delay": 2.5, "cancel": 0.06, "lines": 1},
+}
+
+# Verkehr pro Stunde (0–23): Nachtpause, Rush Hour morgens und abends
+HOUR_WEIGHTS: tuple[float, ...] = (
+    0.3, 0.15, 0.1, 0.1, 0.3, 1.2, 2.8, 4.2, 4.4, 3.2, 2.6, 2.6,
+    2.8, 2.9, 3.1, 3.6, 4.3, 4.5, 4.1, 3.2, 2.4, 1.8, 1.3, 0.8,
+)
+
+# Verkehr und Verspätungsfaktor pro Wochentag (0=Montag … 6=Sonntag)
+WEEKDAY_WEIGHTS: tuple[float, ...] = (1.0, 1.0, 1.0, 1.0, 1.05, 0.8, 0.7)
+WEEKDAY_DELAY_FACTOR: tuple[float, ...] = (1.05, 1.0, 1.0, 1.05, 1.25, 0.85, 0.8)
+
+# Verspätungsfaktor pro Stunde (Rush Hour 7–9 und 16–19 deutlich höher)
+HOUR_DELAY_FACTOR: tuple[float, ...] = tuple(
+    1.4 if 7 <= h <= 9 or 16 <= h <= 19 else 0.7 if h < 5 else 1.0
+    for h in range(24)
+)
+
+# Bahnhöfe: Anzahl und Zipf-Exponent der Popularität
+STATION_COUNT = 5_500
+STATION_ZIPF = 0.9
+
+BIG_STATIONS: tuple[str, ...] = (
+    "Hamburg Hbf", "München Hbf", "Frankfurt (Main) Hbf", "Köln Hbf", "Berlin Hbf",
+    "Hannover Hbf", "Stuttgart Hbf", "Düsseldorf Hbf", "Nürnberg Hbf", "Dortmund Hbf",
+    "Essen Hbf", "Bremen Hbf", "Leipzig Hbf", "Mannheim Hbf", "Duisburg Hbf",
+    "Hanau Hbf", "Karlsruhe Hbf", "Dresden Hbf", "Bonn Hbf", "Mainz Hbf",
+)
+
+# Anteil fehlerhafter Zeilen (Probleme 1–4 aus data_cleaning.py)
+DIRTY_RATES: dict[str, float] = {
+    "missing_station_name": 0.002,
+    "untrimmed_strings": 0.001,
+    "negative_delay": 0.0003,       # unter -30 min
+    "impossible_delay": 0.00005,    # unter -1000 min
+    "extreme_delay": 0.0005,        # über 180 min
+    "empty_ride_id": 0.05,
+}
+
+
+def parse_rows(value: str) -> int:
+    """'100k' → 100_000, '2M' → 2_000_000, '1500' → 1500."""
+    factors = {"k": 1_000, "m": 1_000_000, "b": 1_000_000_000}
+    value = value.strip().lower().replace("_", "")
+    if value and value[-1] in factors:
+        return int(float(value[:-1]) * factors[value[-1]])
+    return int(value)
+
+
+def station_names(count: int = STATION_COUNT) -> pa.Array:
+    """Bahnhofsnamen, nach Popularität sortiert (große Knoten zuerst)."""
+    names = list(BIG_STATIONS[:count])
+    names += [f"Haltepunkt {i:04d}" for i in range(len(names), count)]
+    return pa.array(names, pa.string())
+
+
+# ============================================================
+# GENERIERUNG
+# ============================================================
+
+def _month_days(month: str) -> tuple[np.datetime64, np.ndarray]:
+    """Monatsanfang und Wochentag (0=Montag) jedes Tages im Monat."""
+    first = np.datetime64(month, "M")
+    days = np.arange(first.astype("datetime64[D]"), (first + 1).astype("datetime64[D]"))
+    weekdays = (days.astype("int64") + 3) % 7  # 1970-01-01 war ein Donnerstag
+    return days[0], weekdays
+
+
+def _concat_strings(*parts: pa.Array | str) -> pa.Array:
+    return pc.binary_join_element_wise(*parts, "")
+
+
+def generate_chunk(
+    chunk_index: int,
+    rows: int,
+    month: str = DEFAULT_MONTH,
+    seed: int = DEFAULT_SEED,
+    clean: bool = False,
+) -> pa.Table:
+    """Erzeugt genau `rows` Halte; reproduzierbar über (seed, chunk_index)."""
+    rng = np.random.default_rng([seed, chunk_index])
+
+    # ---------- Fahrten ----------
+    type_names = list(TRAIN_TYPES)
+    specs = [TRAIN_TYPES[name] for name in type_names]
+    mean_stops = np.array([sum(spec["stops"]) / 2 for spec in specs])
+    ride_share = np.array([spec["share"] for spec in specs]) / mean_stops
+    ride_share /= ride_share.sum()
+
+    # Obergrenze: so viele Fahrten, dass auch die kürzesten `rows` Halte ergeben
+    n_rides = rows // min(spec["stops"][0] for spec in specs) + 1
+    ride_type = rng.choice(len(specs), size=n_rides, p=ride_share)
+    stops_min = np.array([spec["stops"][0] for spec in specs])[ride_type]
+    stops_max = np.array([spec["stops"][1] for spec in specs])[ride_type]
+    ride_stops = rng.integers(stops_min, stops_max + 1)
+
+    # Auf genau `rows` Halte kürzen (letzte Fahrt ggf. angeschnitten)
+    ends = np.cumsum(ride_stops)
+    n_rides = int(np.searchsorted(ends, rows) + 1)
+    ride_type, ride_stops = ride_type[:n_rides], ride_stops[:n_rides]
+    ride_stops[-1] -= int(ends[n_rides - 1] - rows)
+
+    # Starttag nach Wochentag gewichtet, Startstunde nach Tagesgang
+    month_start, weekdays = _month_days(month)
+    day_weights = np.array(WEEKDAY_WEIGHTS)[weekdays]
+    ride_day = rng.choice(len(weekdays), size=n_rides, p=day_weights / day_weights.sum())
+    hour_weights = np.array(HOUR_WEIGHTS)
+    ride_hour = rng.choice(24, size=n_rides, p=hour_weights / hour_weights.sum())
+    ride_start = (
+        month_start.astype("datetime64[m]")
+        + ride_day.astype("timedelta64[D]")
+        + ride_hour.astype("timedelta64[h]")
+        + rng.integers(0, 60, n_rides).astype("timedelta64[m]")
+    )
+
+    # Startverspätung je Zugtyp, Stunde und Wochentag
+    delay_mean = (
+        np.array([spec["delay"] for spec in specs])[ride_type]
+        * np.array(HOUR_DELAY_FACTOR)[ride_hour]
+        * np.array(WEEKDAY_DELAY_FACTOR)[weekdays[ride_day]]
+    )
+    ride_delay = rng.exponential(delay_mean)
+
+    ride_line = rng.integers(1, np.array([spec["lines"] for spec in specs])[ride_type] + 1)
+    weights = 1.0 / np.arange(1, STATION_COUNT + 1) ** STATION_ZIPF
+    ride_first_station = rng.choice(STATION_COUNT, size=n_rides, p=weights / weights.sum())
+    ride_stride = rng.integers(1, STATION_COUNT, n_rides)
+
+    # Teil-Ausfall: ab einem zufälligen Halt bis zum Ende der Fahrt
+    canceled = rng.random(n_rides) < np.array([spec["cancel"] for spec in specs])[ride_type]
+    cancel_from = np.where(canceled, rng.integers(0, ride_stops), ride_stops)
+
+    ride_id = rng.integers(-(2 ** 62), 2 ** 62, n_rides).astype(str)
+    if not clean:
+        ride_id[rng.random(n_rides) < DIRTY_RATES["empty_ride_id"]] = ""
+
+    # ---------- Halte ----------
+    ride_of_row = np.repeat(np.arange(n_rides), ride_stops)
+    first_row = np.cumsum(ride_stops) - ride_stops
+    stop_index = np.arange(rows) - np.repeat(first_row, ride_stops)
+    is_first = stop_index == 0
+    is_last = stop_index == np.repeat(ride_stops - 1, ride_stops)
+
+    interval = np.array([spec["interval"] for spec in specs])[ride_type][ride_of_row]
+    offset_min = np.round(stop_index * interval * rng.uniform(0.8, 1.2, rows)).astype("int64")
+    planned = ride_start[ride_of_row] + offset_min.astype("timedelta64[m]")
+
+    # Verspätung baut sich entlang der Fahrt auf (Random Walk je Fahrt)
+    steps = rng.normal(0.05, 0.6, rows)
+    walk = np.cumsum(steps)
+    walk -= np.repeat(walk[first_row] - steps[first_row], ride_stops)
+    delay = np.maximum(np.round(ride_delay[ride_of_row] + walk), -3).astype("int32")
+
+    is_canceled = stop_index >= cancel_from[ride_of_row]
+    if clean:
+        delay = np.maximum(delay, 0)
+        delay[is_canceled] = 0
+
+    # Zeitstempel aus der plausiblen Verspätung: die Fehlerwerte unten stehen
+    # nur in delay_in_min (sonst läge `time` bis zu Jahre außerhalb des Monats)
+    actual = planned + delay.astype("timedelta64[m]")
+    if not clean:
+        for rule, low, high in (
+            ("negative_delay", -600, -31),
+            ("impossible_delay", -1500, -1001),    # echte Daten: bis -1432 min
+            ("extreme_delay", 181, 1500),
+        ):
+            mask = rng.random(rows) < DIRTY_RATES[rule]
+            delay[mask] = rng.integers(low, high, int(mask.sum()))
+
+    station_index = (ride_first_station[ride_of_row] + stop_index * ride_stride[ride_of_row]) % STATION_COUNT
+    final_index = (ride_first_station + (ride_stops - 1) * ride_stride) % STATION_COUNT
+
+    # ---------- Arrow-Spalten ----------
+    names = station_names()
+    xml_station = names.take(pa.array(station_index))
+    station = xml_station
+    if not clean:
+        missing = rng.random(rows) < DIRTY_RATES["missing_station_name"]
+        station = pc.if_else(pa.array(missing), pa.scalar(None, pa.string()), station)
+        untrimmed = rng.random(rows) < DIRTY_RATES["untrimmed_strings"]
+        station = pc.if_else(pa.array(untrimmed), _concat_strings(station, " "), station)
+
+    train_type = pa.array(np.array(type_names, dtype=object)[ride_type][ride_of_row], pa.string())
+    train_name = _concat_strings(train_type, " ", pa.array(ride_line[ride_of_row].astype(str)))
+    ride_ids = pa.array(ride_id[ride_of_row], pa.string())
+    station_num = stop_index + 1
+
+    dwell = np.timedelta64(1, "m")
+    null_ts = np.datetime64("NaT")
+    arrival_planned = np.where(is_first, null_ts, planned)
+    departure_planned = np.where(is_last, null_ts, planned + dwell)
+
+    ride_code = pa.array(
+        np.datetime_as_string(ride_start, unit="m")[ride_of_row], pa.string()
+    )
+    # '2024-10-01T06:25' → '2410010625'
+    ride_code = pc.replace_substring_regex(
+        pc.utf8_slice_codeunits(ride_code, 2), r"[-T:]", ""
+    )
+    ids = _concat_strings(ride_ids, "-", ride_code, "-", pa.array(station_num.astype(str)))
+
+    def timestamps(values: np.ndarray) -> pa.Array:
+        return pa.array(values.astype("datetime64[ns]"), pa.timestamp("ns"))
+
+    return pa.table(
+        {
+            "station_name": station,
+            "xml_station_name": xml_station,
+            "eva": pa.array(np.char.zfill((8_000_000 + station_index).astype(str), 8), pa.string()),
+            "train_name": train_name,
+            "final_destination_station": names.take(pa.array(final_index[ride_of_row])),
+            "delay_in_min": pa.array(delay, pa.int32()),
+            "time": timestamps(actual),
+            "is_canceled": pa.array(is_canceled),
+            "train_type": train_type,
+            "train_line_ride_id": ride_ids,
+            "train_line_station_num": pa.array(station_num, pa.int64()),
+            "arrival_planned_time": timestamps(arrival_planned),
+            "arrival_change_time": timestamps(np.where(is_first, null_ts, actual)),
+            "departure_planned_time": timestamps(departure_planned),
+            "departure_change_time": timestamps(np.where(is_last, null_ts, actual + dwell)),
+            "id": ids,
+        },
+        schema=SCHEMA,
+    )
+
+
+# ============================================================
+# PARALLELES SCHREIBEN
+# ============================================================
+
+def _chunk_sizes(rows: int, chunk_rows: int) -> list[int]:
+    full, rest = divmod(rows, chunk_rows)
+    return [chunk_rows] * full + ([rest] if rest else [])
+
+
+def generate(
+    out_path: str,
+    rows: int,
+    month: str = DEFAULT_MONTH,
+    seed: int = DEFAULT_SEED,
+    workers: int = DEFAULT_WORKERS,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    clean: bool = False,
+) -> str:
+    """
+    Schreibt eine synthetische Monatsdatei mit `rows` Zeilen.
+
+    Worker erzeugen die Chunks parallel, der Hauptprozess schreibt sie in
+    Reihenfolge als Row Groups. Höchstens `2 × workers` Chunks sind
+    gleichzeitig unterwegs, der Speicher bleibt so unabhängig von `rows`.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+    sizes = _chunk_sizes(rows, chunk_rows)
+    max_in_flight = 2 * max(1, workers)
+
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool, \
+            pq.ParquetWriter(tmp_path, SCHEMA, compression="zstd") as writer:
+        pending: list[Future] = []
+        next_chunk = 0
+        while next_chunk < len(sizes) or pending:
+            while next_chunk < len(sizes) and len(pending) < max_in_flight:
+                pending.append(pool.submit(generate_chunk, next_chunk, sizes[next_chunk], month, seed, clean))
+                next_chunk += 1
+            writer.write_table(pending.pop(0).result())
+
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def slice_sample(source_path: str, out_path: str, rows: int) -> str:
+    """Schreibt die ersten `rows` Zeilen einer echten Monatsdatei (altes Verhalten)."""
+    con = duckdb.connect()
+    con.execute(f"COPY (SELECT * FROM '{source_path}' LIMIT {rows}) TO '{out_path}' (FORMAT parquet)")
+    return out_path
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Erzeugt synthetische Monatsdateien beliebiger Größe.")
+    parser.add_argument("--rows", default="2M", help="Zeilenanzahl, z.B. 10k, 2M, 500M")
+    parser.add_argument("--month", default=DEFAULT_MONTH, help="Monat im Format YYYY-MM")
+    parser.add_argument("--out", help="Zieldatei (Standard: data-<Monat>-SYNTHETIC.parquet)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Parallele Prozesse")
+    parser.add_argument("--chunk-rows", default=str(DEFAULT_CHUNK_ROWS), help="Zeilen pro Chunk / Row Group")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--clean", action="store_true", help="Ohne die Datenfehler aus data_cleaning.py")
+    parser.add_argument("--from", dest="source", help="Stattdessen die ersten N Zeilen dieser Datei kopieren")
+    args = parser.parse_args()
 
-os.makedirs(os.path.dirname(OUT_PATH), exist_ok=True)
+    rows = parse_rows(args.rows)
+    start = time.time()
 
-print('Lese Original-Datei:', FULL_PATH)
-con = duckdb.connect()
+    if args.source:
+        out_path = args.out or os.path.join(DATA_DIR, f"data-{args.month}-SAMPLE.parquet")
+        print(f"Lese Original-Datei: {args.source}")
+        slice_sample(args.source, out_path, rows)
+    else:
+        out_path = args.out or os.path.join(DATA_DIR, f"data-{args.month}-SYNTHETIC.parquet")
+        print(f"Erzeuge {rows:,} Zeilen für {args.month} mit {args.workers} Worker(n)...")
+        generate(out_path, rows, args.month, args.seed, args.workers, parse_rows(args.chunk_rows), args.clean)
 
-# Nimm z.B. 2000 Zeilen als Sample
-df = con.execute(f"SELECT * FROM '{FULL_PATH}' LIMIT 2000").fetchdf()
-print('Sample Zeilen:', len(df))
+    size_mb = os.path.getsize(out_path) / (1024 * 1024)
+    print(f"✅ {out_path} ({size_mb:.1f} MB, {time.time() - start:.1f} s)")
 
-print('Schreibe Sample-Datei:', OUT_PATH)
-df.to_parquet(OUT_PATH)
-print('Fertig.')
 
+if __name__ == "__main__":
+    main()
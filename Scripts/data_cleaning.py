@@ -13,9 +13,32 @@ Dieser Script behebt alle 6 identifizierten Datenqualitätsprobleme:
 6. Fehlende Zeitstempel
 
 Ergebnis: Sauberer Datensatz ohne Qualitätsprobleme
+
+Drei Engines mit identischem Ergebnis und identischen Zählern im Log:
+- pandas (Standard): ganzer Monat als DataFrame im Speicher
+- streaming: Batch für Batch mit pyarrow, Arbeitsspeicher unter einem
+  Budget (--memory-mb); siehe clean_file_streaming()
+- duckdb: alle Regeln als eine SQL-Pipeline auf allen Kernen, lagert
+  bei Bedarf auf die Platte aus; siehe clean_file_duckdb()
+
+Mit --compact wird die Ausgabe kompakt typisiert (siehe compact_table()).
+
+Verwendung:
+    python data_cleaning.py
+    python data_cleaning.py --engine streaming --memory-mb 512
+    python data_cleaning.py --engine duckdb --compact
 """
 
+import argparse
+import shutil
+import tempfile
+import duckdb
 import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from collections import Counter
 from datetime import datetime
 import os
 
@@ -35,6 +58,32 @@ RULES = {
     'min_realistic_delay': -1000,   # Unter -1000 min = definitiv Fehler
 }
 
+# Streaming: Speicherbudget für die Batches (dazu kommen ~250 MB für
+# Interpreter, pandas/pyarrow und Arrow-Threads) und geschätzter Speicher
+# pro Zeile als Vielfaches der unkomprimierten Parquet-Größe (pandas-
+# Strings, Masken und Kopien der Regeln; gemessen ~10x)
+STREAM_MEMORY_MB = int(os.environ.get('DB_CLEANING_MEMORY_MB', '1024'))
+PANDAS_BYTES_FACTOR = 12
+MIN_BATCH_ROWS = 10_000
+
+ENGINES = ('pandas', 'streaming', 'duckdb')
+
+# Zeichen, die Pythons str.strip() entfernt (Arrow und DuckDB trimmen damit)
+WHITESPACE = ''.join(c for c in map(chr, range(0x110000)) if c.isspace())
+
+# Kompakte Ausgabe (--compact): Strings mit wenigen Werten als Dictionary
+# (pandas liest sie als category), kleine Integer und zstd. Die drei Flags
+# bleiben bool: Arrow und Parquet speichern bool bereits als Bits, ein
+# gepacktes uint8 wäre größer.
+COMPACT_DICTIONARY_COLUMNS = (
+    'station_name', 'xml_station_name', 'eva', 'train_type', 'train_name', 'final_destination_station',
+)
+COMPACT_INT_TYPES = {
+    'delay_in_min': pa.int16(),            # nach den Regeln zwischen -30 und 180
+    'train_line_station_num': pa.int16(),
+}
+COMPACT_COMPRESSION = 'zstd'
+
 # ============================================================
 # LOGGING
 # ============================================================
@@ -65,51 +114,42 @@ class CleaningLogger:
             f.write(f"Dauer: {(datetime.now() - self.start_time).total_seconds():.2f} Sekunden\n")
 
 # ============================================================
-# HAUPTPROGRAMM
+# REGELN
 # ============================================================
+#
+# Die Regeln arbeiten zeilenweise auf einem DataFrame (ganzer Monat oder
+# ein Batch) und zählen betroffene Zeilen in `stats` (collections.Counter).
+# Zähler mehrerer Batches lassen sich so einfach aufsummieren. Nur
+# Problem 5 (Duplikate) braucht den ganzen Monat und steckt je Modus in
+# keep_latest() bzw. latest_row_mask(). Über Monatsgrenzen hinweg
+# dedupliziert ride_dedup.py mehrere (bereinigte) Monate gemeinsam.
 
-def main():
-    logger = CleaningLogger(LOG_PATH)
-
-    print("=" * 80)
-    print("   DATENBEREINIGUNG - Deutsche Bahn")
-    print("=" * 80)
-    print()
-
-    # Daten laden
-    logger.log("INFO", "Lade Originaldaten...")
-    df = pd.read_parquet(INPUT_PATH)
-    original_count = len(df)
-    logger.log("INFO", f"Originaldaten geladen: {original_count:,} Zeilen")
+def fix_values(df, stats):
+    """Problem 1-4: Bahnhofsnamen, negative und extreme Verspätungen, Stornierungen."""
 
     # ============================================================
     # PROBLEM 1: FEHLENDE BAHNHOFSNAMEN
     # ============================================================
 
-    logger.log("PROBLEM 1", "Behebe fehlende Bahnhofsnamen")
-
     missing_station = df['station_name'].isna().sum()
-    logger.log("FOUND", "Fehlende station_name", missing_station)
 
     # Fix: Nutze xml_station_name als Fallback
     df['station_name'] = df['station_name'].fillna(df['xml_station_name'])
 
     # Prüfe Verbesserung
     still_missing = df['station_name'].isna().sum()
-    fixed = missing_station - still_missing
-    logger.log("FIXED", f"Gefüllt mit xml_station_name", fixed)
 
     if still_missing > 0:
         # Wenn immer noch NULLs: Markiere als "Unbekannt"
         df['station_name'] = df['station_name'].fillna("Unbekannt")
-        logger.log("FIXED", "Rest als 'Unbekannt' markiert", still_missing)
+
+    stats['missing_station'] += int(missing_station)
+    stats['unknown_station'] += int(still_missing)
 
     # ============================================================
     # PROBLEM 2: NEGATIVE VERSPÄTUNGEN (KRITISCH)
     # ============================================================
 
-    logger.log("PROBLEM 2", "Behebe negative Verspätungen")
-
     # Kategorisiere negative Delays
     extreme_negative = (df['delay_in_min'] < RULES['min_realistic_delay']).sum()
     moderate_negative = ((df['delay_in_min'] < 0) &
@@ -117,80 +157,75 @@ def main():
     acceptable_negative = ((df['delay_in_min'] < RULES['max_negative_delay']) &
                           (df['delay_in_min'] >= RULES['min_realistic_delay'])).sum()
 
-    logger.log("FOUND", f"Extreme negative (< {RULES['min_realistic_delay']} min)", extreme_negative)
-    logger.log("FOUND", f"Inakzeptabel negative (< {RULES['max_negative_delay']} min)", acceptable_negative)
-    logger.log("FOUND", f"Akzeptabel negative (>= {RULES['max_negative_delay']} min)", moderate_negative)
-
     # Fix 1: Extreme Negative = Datenfehler → auf 0 setzen
     df.loc[df['delay_in_min'] < RULES['min_realistic_delay'], 'delay_in_min'] = 0
-    logger.log("FIXED", f"Extreme negative auf 0 gesetzt", extreme_negative)
 
     # Fix 2: Inakzeptabel negative → auf maximal erlaubtes Negative (-30) setzen
     mask = (df['delay_in_min'] < RULES['max_negative_delay']) & (df['delay_in_min'] >= RULES['min_realistic_delay'])
     df.loc[mask, 'delay_in_min'] = RULES['max_negative_delay']
-    logger.log("FIXED", f"Auf {RULES['max_negative_delay']} min begrenzt", acceptable_negative)
 
     # Moderate negative Werte bleiben (sind realistisch)
 
+    stats['extreme_negative'] += int(extreme_negative)
+    stats['acceptable_negative'] += int(acceptable_negative)
+    stats['moderate_negative'] += int(moderate_negative)
+
     # ============================================================
     # PROBLEM 3: EXTREME VERSPÄTUNGEN
     # ============================================================
 
-    logger.log("PROBLEM 3", "Behebe extreme Verspätungen")
-
     extreme_delays = (df['delay_in_min'] > RULES['extreme_delay_threshold']).sum()
-    logger.log("FOUND", f"Extreme Delays (> {RULES['extreme_delay_threshold']} min)", extreme_delays)
 
     # Fix: Züge mit extremer Verspätung als storniert markieren
     mask = df['delay_in_min'] > RULES['extreme_delay_threshold']
     df.loc[mask, 'is_canceled'] = True
     df.loc[mask, 'delay_in_min'] = 0  # Stornierte Züge haben keine Verspätung
-    logger.log("FIXED", f"Als storniert markiert + Delay auf 0", extreme_delays)
+
+    stats['extreme_delays'] += int(extreme_delays)
 
     # ============================================================
     # PROBLEM 4: STORNIERTE ZÜGE MIT VERSPÄTUNG (LOGIK-FEHLER)
     # ============================================================
 
-    logger.log("PROBLEM 4", "Behebe Logik-Inkonsistenzen")
-
     inconsistent = ((df['is_canceled'] == True) & (df['delay_in_min'] > 0)).sum()
-    logger.log("FOUND", "Storniert + Verspätung", inconsistent)
 
     # Fix: Stornierte Züge können keine Verspätung haben → auf 0 setzen
     df.loc[df['is_canceled'] == True, 'delay_in_min'] = 0
-    logger.log("FIXED", "Verspätung von stornierten Zügen auf 0 gesetzt", inconsistent)
 
-    # ============================================================
-    # PROBLEM 5: DOPPELTE RIDE IDs
-    # ============================================================
+    stats['inconsistent'] += int(inconsistent)
 
-    logger.log("PROBLEM 5", "Behebe doppelte Ride IDs")
+    return df
+
+
+def keep_latest(df, stats):
+    """Problem 5 im Speicher: behält pro train_line_ride_id die neueste Zeile."""
 
     # Zähle Duplikate
     duplicates_before = df[df['train_line_ride_id'].notna()].duplicated(subset=['train_line_ride_id']).sum()
-    logger.log("FOUND", "Duplikate bei train_line_ride_id", duplicates_before)
 
     # Fix: Behalte nur neueste Version pro ride_id (höchster Zeitstempel)
-    # Sortiere nach time (neueste zuerst) und entferne Duplikate
-    df_sorted = df.sort_values('time', ascending=False)
+    # Sortiere nach time (neueste zuerst) und entferne Duplikate. Stabil
+    # sortiert, damit bei gleichem Zeitstempel die erste Zeile der Datei bleibt
+    df_sorted = df.sort_values('time', ascending=False, kind='stable')
     df_dedup = df_sorted.drop_duplicates(subset=['train_line_ride_id'], keep='first')
 
     removed = len(df) - len(df_dedup)
     df = df_dedup.sort_index()  # Zurück zur ursprünglichen Reihenfolge
 
-    logger.log("FIXED", "Ältere Duplikate entfernt (neueste behalten)", removed)
+    stats['duplicates'] += int(duplicates_before)
+    stats['removed_duplicates'] += int(removed)
+    return df
+
+
+def add_flags(df, stats):
+    """Problem 6 (Flags für fehlende Zeitstempel) und zusätzliche Bereinigungen."""
 
     # ============================================================
     # PROBLEM 6: FEHLENDE ZEITSTEMPEL
     # ============================================================
 
-    logger.log("PROBLEM 6", "Analysiere fehlende Zeitstempel")
-
-    missing_arr_planned = df['arrival_planned_time'].isna().sum()
-    missing_dep_planned = df['departure_planned_time'].isna().sum()
-
-    logger.log("FOUND", "Fehlende arrival_planned_time", missing_arr_planned)
-    logger.log("FOUND", "Fehlende departure_planned_time", missing_dep_planned)
+    stats['missing_arrival'] += int(df['arrival_planned_time'].isna().sum())
+    stats['missing_departure'] += int(df['departure_planned_time'].isna().sum())
 
     # Analyse: Warum fehlen Zeitstempel?
     # Mögliche Gründe:
@@ -203,66 +238,169 @@ def main():
     df['is_potential_start_station'] = (df['arrival_planned_time'].isna()) & (df['departure_planned_time'].notna())
     df['is_missing_both_times'] = (df['arrival_planned_time'].isna()) & (df['departure_planned_time'].isna())
 
-    final_stations = df['is_potential_final_station'].sum()
-    start_stations = df['is_potential_start_station'].sum()
-    missing_both = df['is_missing_both_times'].sum()
-
-    logger.log("INFO", f"Potenzielle Endhaltestellen: {final_stations:,}")
-    logger.log("INFO", f"Potenzielle Starthaltestellen: {start_stations:,}")
-    logger.log("INFO", f"Beide Zeiten fehlen: {missing_both:,}")
-    logger.log("DECISION", "Flags hinzugefügt statt Deletion (Daten bleiben erhalten)")
+    stats['final_stations'] += int(df['is_potential_final_station'].sum())
+    stats['start_stations'] += int(df['is_potential_start_station'].sum())
+    stats['missing_both'] += int(df['is_missing_both_times'].sum())
 
     # ============================================================
     # ZUSÄTZLICHE BEREINIGUNGEN
     # ============================================================
 
-    logger.log("BONUS", "Zusätzliche Qualitätsverbesserungen")
-
     # Entferne komplett leere Zeilen (falls vorhanden)
     empty_rows = df.isna().all(axis=1).sum()
     if empty_rows > 0:
         df = df.dropna(how='all')
-        logger.log("FIXED", "Komplett leere Zeilen entfernt", empty_rows)
+    stats['empty_rows'] += int(empty_rows)
 
-    # Trimme String-Spalten (entferne Leerzeichen)
+    # String-Spalten werden beim Schreiben mit Arrow getrimmt (trim_strings)
+    # (ab pandas 3 sind Strings nicht mehr dtype 'object', select_dtypes
+    # liefert sie aber weiterhin)
     string_columns = df.select_dtypes(include=['object']).columns
-    for col in string_columns:
-        if df[col].dtype == 'object':
-            df[col] = df[col].str.strip() if df[col].notna().any() else df[col]
-    logger.log("INFO", f"String-Spalten getrimmt: {len(string_columns)}")
+    # Anzahl Spalten, nicht Zeilen: über Batches nicht aufsummieren
+    stats['string_columns'] = max(stats['string_columns'], len(string_columns))
+
+    return df
+
+
+def trim_strings(table):
+    """Entfernt Leerraum am Rand aller String-Spalten (Arrow compute statt .str.strip())."""
+    for index, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(index, field, pc.utf8_trim(table.column(index), characters=WHITESPACE))
+    return table
+
+
+def compact_table(table):
+    """Kompakte Typen: Dictionary-Strings und int16 (Werte bleiben gleich)."""
+    for index, field in enumerate(table.schema):
+        if field.name in COMPACT_DICTIONARY_COLUMNS and not pa.types.is_dictionary(field.type):
+            column = pc.dictionary_encode(table.column(index))
+            table = table.set_column(index, pa.field(field.name, column.type), column)
+        elif field.name in COMPACT_INT_TYPES:
+            # safe=True: Werte außerhalb von int16 brechen ab statt überzulaufen
+            target = COMPACT_INT_TYPES[field.name]
+            table = table.set_column(index, pa.field(field.name, target), table.column(index).cast(target))
+    return table
+
+
+def to_output_table(df, compact=False):
+    """DataFrame → Arrow-Tabelle, wie sie geschrieben wird (getrimmt, ggf. kompakt)."""
+    table = trim_strings(pa.Table.from_pandas(df, preserve_index=False))
+    return compact_table(table) if compact else table
+
+
+def count_violations(df, stats):
+    """Zählt, was nach der Bereinigung noch gegen die Regeln verstößt (für die Validierung)."""
+    stats['check_negative'] += int((df['delay_in_min'] < RULES['max_negative_delay']).sum())
+    stats['check_inconsistent'] += int(((df['is_canceled'] == True) & (df['delay_in_min'] > 0)).sum())
+    stats['check_extreme'] += int(((df['delay_in_min'] > RULES['extreme_delay_threshold']) &
+                                   (df['is_canceled'] == False)).sum())
+    stats['check_null_station'] += int(df['station_name'].isna().sum())
+
+
+def log_stats(stats, logger):
+    """Schreibt die Zähler aller Regeln ins Log (gleiche Einträge in jedem Modus)."""
+    logger.log("PROBLEM 1", "Behebe fehlende Bahnhofsnamen")
+    logger.log("FOUND", "Fehlende station_name", stats['missing_station'])
+    logger.log("FIXED", f"Gefüllt mit xml_station_name", stats['missing_station'] - stats['unknown_station'])
+    if stats['unknown_station'] > 0:
+        logger.log("FIXED", "Rest als 'Unbekannt' markiert", stats['unknown_station'])
+
+    logger.log("PROBLEM 2", "Behebe negative Verspätungen")
+    logger.log("FOUND", f"Extreme negative (< {RULES['min_realistic_delay']} min)", stats['extreme_negative'])
+    logger.log("FOUND", f"Inakzeptabel negative (< {RULES['max_negative_delay']} min)", stats['acceptable_negative'])
+    logger.log("FOUND", f"Akzeptabel negative (>= {RULES['max_negative_delay']} min)", stats['moderate_negative'])
+    logger.log("FIXED", f"Extreme negative auf 0 gesetzt", stats['extreme_negative'])
+    logger.log("FIXED", f"Auf {RULES['max_negative_delay']} min begrenzt", stats['acceptable_negative'])
+
+    logger.log("PROBLEM 3", "Behebe extreme Verspätungen")
+    logger.log("FOUND", f"Extreme Delays (> {RULES['extreme_delay_threshold']} min)", stats['extreme_delays'])
+    logger.log("FIXED", f"Als storniert markiert + Delay auf 0", stats['extreme_delays'])
+
+    logger.log("PROBLEM 4", "Behebe Logik-Inkonsistenzen")
+    logger.log("FOUND", "Storniert + Verspätung", stats['inconsistent'])
+    logger.log("FIXED", "Verspätung von stornierten Zügen auf 0 gesetzt", stats['inconsistent'])
+
+    logger.log("PROBLEM 5", "Behebe doppelte Ride IDs")
+    logger.log("FOUND", "Duplikate bei train_line_ride_id", stats['duplicates'])
+    logger.log("FIXED", "Ältere Duplikate entfernt (neueste behalten)", stats['removed_duplicates'])
+
+    logger.log("PROBLEM 6", "Analysiere fehlende Zeitstempel")
+    logger.log("FOUND", "Fehlende arrival_planned_time", stats['missing_arrival'])
+    logger.log("FOUND", "Fehlende departure_planned_time", stats['missing_departure'])
+    logger.log("INFO", f"Potenzielle Endhaltestellen: {stats['final_stations']:,}")
+    logger.log("INFO", f"Potenzielle Starthaltestellen: {stats['start_stations']:,}")
+    logger.log("INFO", f"Beide Zeiten fehlen: {stats['missing_both']:,}")
+    logger.log("DECISION", "Flags hinzugefügt statt Deletion (Daten bleiben erhalten)")
+
+    logger.log("BONUS", "Zusätzliche Qualitätsverbesserungen")
+    if stats['empty_rows'] > 0:
+        logger.log("FIXED", "Komplett leere Zeilen entfernt", stats['empty_rows'])
+    logger.log("INFO", f"String-Spalten getrimmt: {stats['string_columns']}")
 
-    # ============================================================
-    # DATEN-VALIDIERUNG
-    # ============================================================
 
+def merge_stats(stats_list):
+    """Summiert die Zähler mehrerer Dateien (string_columns ist eine Spaltenzahl: Maximum)."""
+    total = Counter()
+    for stats in stats_list:
+        for name, value in stats.items():
+            if name == 'string_columns':
+                total[name] = max(total[name], value)
+            else:
+                total[name] += value
+    return total
+
+
+def validate_stats(stats, logger):
+    """Prüft die Zähler aus count_violations() (AssertionError bei Verstößen)."""
     logger.log("VALIDATION", "Validiere bereinigte Daten")
 
     # Check 1: Keine negativen Delays unter Schwellwert
-    invalid_negative = (df['delay_in_min'] < RULES['max_negative_delay']).sum()
-    logger.log("CHECK", f"Negative Delays < {RULES['max_negative_delay']}", invalid_negative)
-    assert invalid_negative == 0, "Es gibt noch zu negative Delays!"
+    logger.log("CHECK", f"Negative Delays < {RULES['max_negative_delay']}", stats['check_negative'])
+    assert stats['check_negative'] == 0, "Es gibt noch zu negative Delays!"
 
     # Check 2: Keine Inkonsistenzen
-    inconsistent = ((df['is_canceled'] == True) & (df['delay_in_min'] > 0)).sum()
-    logger.log("CHECK", "Storniert + Verspätung", inconsistent)
-    assert inconsistent == 0, "Es gibt noch Logik-Inkonsistenzen!"
+    logger.log("CHECK", "Storniert + Verspätung", stats['check_inconsistent'])
+    assert stats['check_inconsistent'] == 0, "Es gibt noch Logik-Inkonsistenzen!"
 
     # Check 3: Keine extremen Delays ohne Stornierung
-    extreme_not_canceled = ((df['delay_in_min'] > RULES['extreme_delay_threshold']) &
-                           (df['is_canceled'] == False)).sum()
-    logger.log("CHECK", f"Extreme Delays ohne Stornierung", extreme_not_canceled)
-    assert extreme_not_canceled == 0, "Es gibt noch extreme Delays ohne Stornierung!"
+    logger.log("CHECK", f"Extreme Delays ohne Stornierung", stats['check_extreme'])
+    assert stats['check_extreme'] == 0, "Es gibt noch extreme Delays ohne Stornierung!"
 
     # Check 4: Keine NULLs in station_name
-    null_stations = df['station_name'].isna().sum()
-    logger.log("CHECK", "NULL station_name", null_stations)
-    assert null_stations == 0, "Es gibt noch fehlende Bahnhofsnamen!"
+    logger.log("CHECK", "NULL station_name", stats['check_null_station'])
+    assert stats['check_null_station'] == 0, "Es gibt noch fehlende Bahnhofsnamen!"
 
     logger.log("SUCCESS", "✅ Alle Validierungen bestanden!")
 
-    # ============================================================
-    # STATISTIKEN
-    # ============================================================
+
+# ============================================================
+# BEREINIGUNG (GANZER MONAT IM SPEICHER)
+# ============================================================
+
+def load_data(input_path, logger):
+    """Lädt eine Monatsdatei."""
+    logger.log("INFO", "Lade Originaldaten...")
+    df = pd.read_parquet(input_path)
+    logger.log("INFO", f"Originaldaten geladen: {len(df):,} Zeilen")
+    return df
+
+
+def clean_dataframe(df, logger, stats=None):
+    """Behebt die 6 Datenqualitätsprobleme und validiert das Ergebnis."""
+    stats = Counter() if stats is None else stats
+    df = fix_values(df, stats)
+    df = keep_latest(df, stats)
+    df = add_flags(df, stats)
+    count_violations(df, stats)
+
+    log_stats(stats, logger)
+    validate_stats(stats, logger)
+    return df
+
+
+def print_statistics(df, original_count):
+    """Vorher/Nachher-Statistiken auf der Konsole."""
 
     print("\n" + "=" * 80)
     print("📊 VORHER/NACHHER STATISTIKEN")
@@ -295,11 +433,9 @@ def main():
     print(f"   Wertebereich (delay):             100.00%")
     print(f"   Duplikate entfernt:               Ja")
 
-    # ============================================================
-    # EXPORT
-    # ============================================================
 
-    print("\n" + "=" * 80)
+def export_data(df, output_path, logger, compact=False):
+    """Speichert die bereinigten Daten als Parquet (mit compact=True kompakt typisiert)."""
     logger.log("EXPORT", "Speichere bereinigte Daten...")
 
     # Entferne temporäre Flag-Spalten (optional)
@@ -307,16 +443,493 @@ def main():
     # Kommentar: Wir behalten die Flags für bessere Transparenz
     # df = df.drop(columns=flags_to_remove)
 
-    # Exportiere als Parquet
-    df.to_parquet(OUTPUT_PATH, index=False, compression='snappy')
+    # Exportiere als Parquet (Strings dabei getrimmt)
+    table = to_output_table(df, compact)
+    pq.write_table(table, output_path, compression=COMPACT_COMPRESSION if compact else 'snappy')
+
+    file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
+    logger.log("SUCCESS", f"Datei gespeichert: {output_path}")
+    logger.log("INFO", f"Dateigröße: {file_size_mb:.1f} MB")
+
+
+def clean_file(input_path, output_path, log_path, engine='pandas', memory_mb=STREAM_MEMORY_MB, stats=None,
+               compact=False):
+    """
+    Bereinigt eine Monatsdatei ohne Konsolen-Statistiken (z.B. für batch_cleaning.py).
+
+    `engine` ist einer von ENGINES; `memory_mb` gilt für streaming und
+    duckdb. Ein übergebener leerer Counter `stats` erhält die Zähler aller
+    Regeln (pro Datei ein eigener, zum Summieren siehe merge_stats()).
+    `compact` schreibt kompakte Typen (siehe compact_table()).
+    Gibt die Zeilenzahl vorher und nachher zurück.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unbekannte Engine: {engine} (erlaubt: {', '.join(ENGINES)})")
+    if engine == 'streaming':
+        return clean_file_streaming(input_path, output_path, log_path, memory_mb, stats, compact)
+    if engine == 'duckdb':
+        return clean_file_duckdb(input_path, output_path, log_path, memory_mb, stats, compact)
+
+    logger = CleaningLogger(log_path)
+    df = load_data(input_path, logger)
+    original_count = len(df)
+    df = clean_dataframe(df, logger, stats)
+    export_data(df, output_path, logger, compact)
+    logger.save()
+    return {'rows_before': original_count, 'rows_after': len(df)}
+
+
+# ============================================================
+# BEREINIGUNG (STREAMING)
+# ============================================================
+#
+# Liest die Datei in Batches (iter_batches), wendet pro Batch dieselben
+# Regeln an und schreibt sofort mit einem ParquetWriter. Für Problem 5
+# läuft vorab ein schmaler Durchgang über Ride ID und time, der pro Ride
+# ID nur die bisher neueste Zeile behält. Im Speicher liegen also ein
+# Batch, eine Zeile pro Ride ID und die Keep-Maske (1 Byte pro Zeile).
+
+def _latest_per_ride(table):
+    """Pro Ride ID die Zeile mit dem spätesten time (Gleichstand: kleinste Zeilennummer)."""
+    # Fehlende Werte sortiert Arrow ans Ende: fehlende IDs bilden eine Gruppe,
+    # fehlende Zeiten verlieren gegen jede vorhandene
+    ordered = table.sort_by([
+        ('train_line_ride_id', 'ascending'),
+        ('time', 'descending'),
+        ('row', 'ascending'),
+    ])
+    latest = ordered.group_by('train_line_ride_id', use_threads=False).aggregate(
+        [('time', 'first'), ('row', 'first')]
+    )
+    return latest.rename_columns(['train_line_ride_id', 'time', 'row'])
+
+
+def latest_row_mask(input_path, batch_rows):
+    """
+    Problem 5 ohne den ganzen Monat: Keep-Maske über alle Zeilen und Anzahl Duplikate.
+
+    Gleiche Semantik wie keep_latest(): pro train_line_ride_id (fehlende
+    IDs bilden eine Gruppe) bleibt die Zeile mit dem spätesten time,
+    fehlende Zeiten zählen als älteste, bei Gleichstand die erste Zeile.
+    """
+    parquet_file = pq.ParquetFile(input_path)
+    keep = np.zeros(parquet_file.metadata.num_rows, dtype=bool)
+
+    latest = None
+    rows_with_id = 0
+    offset = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=['train_line_ride_id', 'time']):
+        rows = pa.array(np.arange(offset, offset + batch.num_rows), pa.int64())
+        offset += batch.num_rows
+        rows_with_id += batch.num_rows - batch.column(0).null_count
+
+        candidates = pa.Table.from_batches([batch]).append_column('row', rows)
+        if latest is not None:
+            candidates = pa.concat_tables([latest, candidates])
+        latest = _latest_per_ride(candidates)
+
+    if latest is None:
+        return keep, 0
+
+    keep[latest.column('row').to_numpy()] = True
+    # Wie keep_latest(): fehlende IDs zählen nicht als Duplikate
+    distinct_ids = latest.num_rows - latest.column('train_line_ride_id').null_count
+    return keep, rows_with_id - distinct_ids
+
+
+def stream_batch_rows(parquet_file, memory_mb):
+    """Zeilen pro Batch, so dass ein Batch mit allen Zwischenergebnissen ins Budget passt."""
+    meta = parquet_file.metadata
+    raw_bytes = sum(meta.row_group(i).total_byte_size for i in range(meta.num_row_groups))
+    bytes_per_row = max(1.0, raw_bytes / max(1, meta.num_rows)) * PANDAS_BYTES_FACTOR
+    # Die Keep-Maske geht vom Budget ab
+    available = memory_mb * 1024 * 1024 - meta.num_rows
+    return max(MIN_BATCH_ROWS, int(available / bytes_per_row))
+
+
+def _nullable_int_columns(parquet_file):
+    """Integer-Spalten mit fehlenden Werten (pandas liest sie im ganzen Monat als float64)."""
+    schema = parquet_file.schema_arrow
+    meta = parquet_file.metadata
+    columns = []
+    for index, field in enumerate(schema):
+        if not pa.types.is_integer(field.type):
+            continue
+        statistics = [meta.row_group(i).column(index).statistics for i in range(meta.num_row_groups)]
+        if all(stat is not None and stat.has_null_count for stat in statistics):
+            null_count = sum(stat.null_count for stat in statistics)
+        else:
+            null_count = parquet_file.read(columns=[field.name]).column(0).null_count
+        if null_count:
+            columns.append(field.name)
+    return columns
+
+
+def clean_file_streaming(input_path, output_path, log_path, memory_mb=STREAM_MEMORY_MB, stats=None, compact=False):
+    """
+    Bereinigt eine Monatsdatei Batch für Batch mit begrenztem Speicher.
+
+    Ergebnis (Zeilen, Reihenfolge, Typen) und Log entsprechen clean_file().
+    """
+    logger = CleaningLogger(log_path)
+    stats = Counter() if stats is None else stats
+
+    parquet_file = pq.ParquetFile(input_path)
+    original_count = parquet_file.metadata.num_rows
+    batch_rows = stream_batch_rows(parquet_file, memory_mb)
+    logger.log("INFO", f"Streaming: {original_count:,} Zeilen in Batches zu {batch_rows:,} Zeilen "
+                       f"(Budget {memory_mb:,} MB)")
+
+    keep, stats['duplicates'] = latest_row_mask(input_path, batch_rows)
+    float_columns = _nullable_int_columns(parquet_file)
+
+    batches = parquet_file.iter_batches(batch_size=batch_rows)
+    if original_count == 0:
+        batches = [parquet_file.schema_arrow.empty_table()]
+
+    writer = None
+    offset = 0
+    final_count = 0
+    try:
+        for batch in batches:
+            df = batch.to_pandas()
+            del batch
+            for col in float_columns:
+                df[col] = df[col].astype('float64')
+
+            df = fix_values(df, stats)
+            batch_keep = keep[offset:offset + len(df)]
+            offset += len(df)
+            stats['removed_duplicates'] += int(len(df) - batch_keep.sum())
+            df = df[batch_keep]
+            df = add_flags(df, stats)
+            count_violations(df, stats)
+
+            table = to_output_table(df, compact)
+            if writer is None:
+                # Komplett leere Spalten im ersten Batch (Typ null) bekommen den Typ der Quelle
+                source = parquet_file.schema_arrow
+                schema = pa.schema(
+                    [
+                        source.field(field.name) if pa.types.is_null(field.type) and field.name in source.names
+                        else field
+                        for field in table.schema
+                    ],
+                    metadata=table.schema.metadata,
+                )
+                compression = COMPACT_COMPRESSION if compact else 'snappy'
+                writer = pq.ParquetWriter(output_path, schema, compression=compression)
+            writer.write_table(table.cast(schema))
+            final_count += len(df)
+            del df, table
+    finally:
+        if writer is not None:
+            writer.close()
+
+    log_stats(stats, logger)
+    try:
+        validate_stats(stats, logger)
+    except AssertionError:
+        os.remove(output_path)
+        raise
 
-    file_size_mb = os.path.getsize(OUTPUT_PATH) / (1024 * 1024)
-    logger.log("SUCCESS", f"Datei gespeichert: {OUTPUT_PATH}")
+    file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
+    logger.log("SUCCESS", f"Datei gespeichert: {output_path}")
     logger.log("INFO", f"Dateigröße: {file_size_mb:.1f} MB")
+    logger.save()
+    return {'rows_before': original_count, 'rows_after': final_count}
+
+
+# ============================================================
+# BEREINIGUNG (DUCKDB)
+# ============================================================
+#
+# Dieselben Regeln als SQL: Problem 1-4 als aufeinander aufbauende CTEs,
+# Problem 5 als schmale Aggregation (Gewinner-Zeile pro Ride ID) mit
+# Semi-Join, Problem 6 und das Trimmen im letzten SELECT. Ein einziges
+# COPY schreibt das Ergebnis; DuckDB nutzt alle Kerne und lagert
+# Aggregation, Join und Sortierung über dem Speicherlimit in ein
+# Temp-Verzeichnis aus. Die Zähler für das Log kommen aus einer
+# Aggregation über dieselben CTEs (ohne Fenster) und aus der geschriebenen
+# Datei.
+
+def _sql_string(value):
+    """SQL-String-Literal (einfache Anführungszeichen verdoppelt)."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _source_with_row_numbers(input_path):
+    """Monatsdatei mit Zeilennummer (file_row_number) für Reihenfolge und Gleichstände."""
+    return f"read_parquet({_sql_string(input_path)}, file_row_number = true)"
+
+
+def build_rule_stages(input_path):
+    """
+    CTEs für Problem 1-4 über einer Monatsdatei.
+
+    Jede Stufe ersetzt die korrigierten Spalten und hängt pro Zähler eine
+    Spalte `_<zähler>` an (betroffene Zeilen, vor der Korrektur gemessen).
+    """
+    min_realistic = RULES['min_realistic_delay']
+    max_negative = RULES['max_negative_delay']
+    extreme = RULES['extreme_delay_threshold']
+    return f"""
+    problem1 AS (
+        SELECT
+            * REPLACE (COALESCE(station_name, xml_station_name, 'Unbekannt') AS station_name),
+            station_name IS NULL AS _missing_station,
+            station_name IS NULL AND xml_station_name IS NULL AS _unknown_station
+        FROM {_source_with_row_numbers(input_path)}
+    ),
+    problem2 AS (
+        SELECT
+            * REPLACE (
+                CASE
+                    WHEN delay_in_min < {min_realistic} THEN 0
+                    WHEN delay_in_min < {max_negative} THEN {max_negative}
+                    ELSE delay_in_min
+                END AS delay_in_min
+            ),
+            delay_in_min < {min_realistic} AS _extreme_negative,
+            delay_in_min < {max_negative} AND delay_in_min >= {min_realistic} AS _acceptable_negative,
+            delay_in_min < 0 AND delay_in_min >= {max_negative} AS _moderate_negative
+        FROM problem1
+    ),
+    problem3 AS (
+        SELECT
+            * REPLACE (
+                CASE WHEN delay_in_min > {extreme} THEN TRUE ELSE is_canceled END AS is_canceled,
+                CASE WHEN delay_in_min > {extreme} THEN 0 ELSE delay_in_min END AS delay_in_min
+            ),
+            delay_in_min > {extreme} AS _extreme_delays
+        FROM problem2
+    ),
+    problem4 AS (
+        SELECT
+            * REPLACE (CASE WHEN is_canceled THEN 0 ELSE delay_in_min END AS delay_in_min),
+            is_canceled AND delay_in_min > 0 AS _inconsistent
+        FROM problem3
+    )"""
+
+
+RULE_COUNTERS = (
+    'missing_station', 'unknown_station', 'extreme_negative', 'acceptable_negative',
+    'moderate_negative', 'extreme_delays', 'inconsistent',
+)
+
+
+def build_cleaning_query(input_path, string_columns, float_columns, compact=False):
+    """
+    SELECT mit allen 6 Regeln; Spalten und Reihenfolge wie im pandas-Modus.
+
+    Mit `compact` werden die Spalten aus COMPACT_INT_TYPES SMALLINT. Die
+    Dictionary-Spalten schreibt DuckDB ohnehin als Parquet-Dictionary.
+    """
+    helper_columns = ', '.join(['file_row_number'] + [f'_{name}' for name in RULE_COUNTERS])
+    int_columns = list(COMPACT_INT_TYPES) if compact else []
+    replace = [f"strip_ws({col}) AS {col}" for col in string_columns]
+    replace += [f"CAST({col} AS SMALLINT) AS {col}" for col in int_columns if col not in string_columns]
+    replace += [
+        f"CAST({col} AS DOUBLE) AS {col}" for col in float_columns
+        if col not in string_columns and col not in int_columns
+    ]
+    replace_clause = f" REPLACE ({', '.join(replace)})" if replace else ""
+
+    # Problem 5: pro Ride ID (fehlende IDs bilden eine Gruppe) die Zeile mit
+    # dem spätesten time, fehlende Zeiten zuletzt, bei Gleichstand die erste
+    # Zeile der Datei (wie keep_latest() und latest_row_mask()). Der Schlüssel
+    # enthält kein NULL, damit der Vergleich nicht von der NULL-Sortierung
+    # abhängt. Eigener Scan statt über die CTEs: zweimal referenzierte CTEs
+    # würde DuckDB komplett materialisieren
+    return f"""
+    WITH {build_rule_stages(input_path)},
+    problem5 AS (
+        SELECT arg_max(file_row_number, {{
+            'has_time': time IS NOT NULL,
+            'time': COALESCE(epoch_ns(time), 0),
+            'first_row': -file_row_number
+        }}) AS file_row_number
+        FROM {_source_with_row_numbers(input_path)}
+        GROUP BY train_line_ride_id
+    )
+    SELECT
+        * EXCLUDE ({helper_columns}){replace_clause},
+        departure_planned_time IS NULL AND arrival_planned_time IS NOT NULL AS is_potential_final_station,
+        arrival_planned_time IS NULL AND departure_planned_time IS NOT NULL AS is_potential_start_station,
+        arrival_planned_time IS NULL AND departure_planned_time IS NULL AS is_missing_both_times
+    FROM problem4
+    WHERE file_row_number IN (SELECT file_row_number FROM problem5)
+    ORDER BY file_row_number
+    """
+
+
+def build_rule_counts_query(input_path):
+    """Zähler für Problem 1-5 über die Quelldatei."""
+    counts = ', '.join(f"COUNT(*) FILTER (_{name}) AS {name}" for name in RULE_COUNTERS)
+    return f"""
+    WITH {build_rule_stages(input_path)}
+    SELECT
+        COUNT(*) AS rows_before,
+        {counts},
+        COUNT(train_line_ride_id) - COUNT(DISTINCT train_line_ride_id) AS duplicates
+    FROM problem4
+    """
+
+
+def build_output_counts_query(output_path):
+    """Zähler für Problem 6 und die Validierung über die geschriebene Datei."""
+    max_negative = RULES['max_negative_delay']
+    extreme = RULES['extreme_delay_threshold']
+    return f"""
+    SELECT
+        COUNT(*) AS rows_after,
+        COUNT(*) FILTER (arrival_planned_time IS NULL) AS missing_arrival,
+        COUNT(*) FILTER (departure_planned_time IS NULL) AS missing_departure,
+        COUNT(*) FILTER (is_potential_final_station) AS final_stations,
+        COUNT(*) FILTER (is_potential_start_station) AS start_stations,
+        COUNT(*) FILTER (is_missing_both_times) AS missing_both,
+        COUNT(*) FILTER (delay_in_min < {max_negative}) AS check_negative,
+        COUNT(*) FILTER (is_canceled AND delay_in_min > 0) AS check_inconsistent,
+        COUNT(*) FILTER (delay_in_min > {extreme} AND is_canceled = FALSE) AS check_extreme,
+        COUNT(*) FILTER (station_name IS NULL) AS check_null_station
+    FROM read_parquet({_sql_string(output_path)})
+    """
+
+
+def _fetch_counts(con, query):
+    """Erste Ergebniszeile als Dict Spaltenname → int."""
+    result = con.execute(query)
+    names = [column[0] for column in result.description]
+    return {name: int(value) for name, value in zip(names, result.fetchone())}
+
+
+def clean_file_duckdb(input_path, output_path, log_path, memory_mb=STREAM_MEMORY_MB, stats=None, compact=False):
+    """
+    Bereinigt eine Monatsdatei mit DuckDB (ein COPY, alle Kerne, Spill auf die Platte).
+
+    Ergebnis (Zeilen, Reihenfolge, Werte) und Log entsprechen clean_file().
+    """
+    logger = CleaningLogger(log_path)
+    stats = Counter() if stats is None else stats
+
+    parquet_file = pq.ParquetFile(input_path)
+    string_columns = [
+        field.name for field in parquet_file.schema_arrow
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)
+    ]
+    # Wie im pandas-Modus: Integer-Spalten mit fehlenden Werten als float64
+    float_columns = _nullable_int_columns(parquet_file)
+
+    # Eigene Verbindung: Speicherlimit und Temp-Verzeichnis nur für diesen Lauf
+    spill_dir = tempfile.mkdtemp(prefix='cleaning-', dir=os.path.dirname(os.path.abspath(output_path)))
+    con = duckdb.connect(config={
+        'threads': os.environ.get('DB_THREADS', str(os.cpu_count() or 1)),
+        'memory_limit': f'{memory_mb}MB',
+        'temp_directory': spill_dir,
+        # Reihenfolge kommt aus dem ORDER BY, sonst muss DuckDB sie nirgends halten
+        'preserve_insertion_order': False,
+    })
+    try:
+        threads = con.execute("SELECT current_setting('threads')").fetchone()[0]
+        logger.log("INFO", f"DuckDB: {parquet_file.metadata.num_rows:,} Zeilen, {threads} Threads "
+                           f"(Speicherlimit {memory_mb:,} MB)")
+        # trim() mit Zeichenliste ist teuer: nur aufrufen, wenn am Rand Leerraum steht
+        whitespace = _sql_string(WHITESPACE)
+        con.execute(
+            f"CREATE TEMP MACRO strip_ws(s) AS CASE "
+            f"WHEN contains({whitespace}, left(s, 1)) OR contains({whitespace}, right(s, 1)) "
+            f"THEN trim(s, {whitespace}) ELSE s END"
+        )
+
+        try:
+            compression = COMPACT_COMPRESSION if compact else 'snappy'
+            con.execute(
+                f"COPY ({build_cleaning_query(input_path, string_columns, float_columns, compact)}) "
+                f"TO {_sql_string(output_path)} (FORMAT parquet, COMPRESSION {compression})"
+            )
+        except duckdb.Error:
+            # z.B. Speicherlimit trotz Spill überschritten: keine halbe Datei liegen lassen
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            raise
+        stats.update(_fetch_counts(con, build_rule_counts_query(input_path)))
+        stats.update(_fetch_counts(con, build_output_counts_query(output_path)))
+    finally:
+        con.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+
+    original_count = stats.pop('rows_before')
+    final_count = stats.pop('rows_after')
+    stats['removed_duplicates'] = original_count - final_count
+    # Nach Problem 1 hat jede Zeile einen Bahnhofsnamen, leer ist also keine
+    stats['empty_rows'] = 0
+    stats['string_columns'] = len(string_columns)
+
+    log_stats(stats, logger)
+    try:
+        validate_stats(stats, logger)
+    except AssertionError:
+        os.remove(output_path)
+        raise
 
-    # Speichere Log
+    file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
+    logger.log("SUCCESS", f"Datei gespeichert: {output_path}")
+    logger.log("INFO", f"Dateigröße: {file_size_mb:.1f} MB")
     logger.save()
-    logger.log("SUCCESS", f"Log gespeichert: {LOG_PATH}")
+    return {'rows_before': original_count, 'rows_after': final_count}
+
+
+# ============================================================
+# HAUPTPROGRAMM
+# ============================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Bereinigt die Deutsche Bahn Monatsdaten.")
+    parser.add_argument("--engine", choices=ENGINES, default='pandas', help="pandas (Standard), streaming oder duckdb")
+    parser.add_argument("--streaming", action="store_true", help="Kurz für --engine streaming")
+    parser.add_argument("--memory-mb", type=int, default=STREAM_MEMORY_MB, help="Speicherbudget für streaming und duckdb")
+    parser.add_argument("--compact", action="store_true", help="Kompakte Typen (Dictionary, int16) und zstd")
+    args = parser.parse_args()
+    engine = 'streaming' if args.streaming else args.engine
+
+    print("=" * 80)
+    print("   DATENBEREINIGUNG - Deutsche Bahn")
+    print("=" * 80)
+    print()
+
+    if engine != 'pandas':
+        counts = clean_file(INPUT_PATH, OUTPUT_PATH, LOG_PATH, engine, args.memory_mb, compact=args.compact)
+        removed_total = counts['rows_before'] - counts['rows_after']
+        print("\n📈 Datensatz-Größe:")
+        print(f"   Vorher:      {counts['rows_before']:>10,} Zeilen")
+        print(f"   Nachher:     {counts['rows_after']:>10,} Zeilen")
+        print(f"   Entfernt:    {removed_total:>10,} Zeilen")
+        print(f"\nLog gespeichert: {LOG_PATH}")
+    else:
+        logger = CleaningLogger(LOG_PATH)
+
+        # Daten laden
+        df = load_data(INPUT_PATH, logger)
+        original_count = len(df)
+
+        df = clean_dataframe(df, logger)
+
+        # ============================================================
+        # STATISTIKEN
+        # ============================================================
+
+        print_statistics(df, original_count)
+
+        # ============================================================
+        # EXPORT
+        # ============================================================
+
+        print("\n" + "=" * 80)
+        export_data(df, OUTPUT_PATH, logger, args.compact)
+
+        # Speichere Log
+        logger.save()
+        logger.log("SUCCESS", f"Log gespeichert: {LOG_PATH}")
 
     print("\n" + "=" * 80)
     print("✅ DATENBEREINIGUNG ERFOLGREICH ABGESCHLOSSEN!")
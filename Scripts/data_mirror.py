@@ -0,0 +1,454 @@
+"""
+============================================================
+    LOKALER PARQUET-MIRROR
+    Größenbegrenzter Cache für monthly_processed_data
+============================================================
+
+Spiegelt die Monatsdateien von HuggingFace in einen eigenen Ordner
+(z.B. ein gemountetes Volume), statt sich auf den unbegrenzten
+`hf_hub_download` Cache zu verlassen. Ein Manifest hält pro Monat
+Dateiname, Größe, SHA-256 und letzten Zugriff fest. Wird das Budget
+überschritten, fliegen die am längsten nicht genutzten Monate raus (LRU).
+
+Die Dateinamen enthalten den Anfang des SHA-256 (`data-2024-10.<sha>.parquet`).
+Ersetzt HuggingFace eine Monatsdatei, meldet `remote_checksums()` einen
+neuen SHA-256, `fetch()` lädt die Datei neu und alle Caches, die am Pfad
+oder Fingerabdruck der Datei hängen, sind automatisch ungültig.
+
+Konfiguration über Umgebungsvariablen:
+    DB_MIRROR_DIR     Ordner des Mirrors (Standard: Data/deutsche_bahn_data/mirror)
+    DB_MIRROR_MAX_GB  Speicherbudget in GB (Standard: 5)
+    DB_HUB_DIR        Lokaler Ordner mit data-YYYY-MM.parquet statt HuggingFace
+                      (für Tests und Betrieb ohne Netz)
+
+Verwendung:
+    python data_mirror.py status
+    python data_mirror.py fetch 2024-10 2024-11
+    python data_mirror.py fetch --latest 2024-10
+    python data_mirror.py verify
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: nur der Lock innerhalb des Prozesses
+    fcntl = None
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+# HuggingFace Dataset
+HF_REPO_ID = "piebro/deutsche-bahn-data"
+HF_REPO_TYPE = "dataset"
+HF_DATA_FOLDER = "monthly_processed_data"
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MIRROR_DIR = os.environ.get(
+    "DB_MIRROR_DIR",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "mirror"),
+)
+MIRROR_MAX_BYTES = int(float(os.environ.get("DB_MIRROR_MAX_GB", "5")) * 1024 ** 3)
+
+MANIFEST_NAME = "manifest.json"
+
+# Lock-Datei für Manifest und Eviction über Prozesse hinweg (Web-Worker, Ingest)
+LOCK_NAME = ".lock"
+
+# Blockgröße für Checksummen (große Dateien nicht komplett in den RAM laden)
+CHECKSUM_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+# Stellen des SHA-256 im Dateinamen des Mirrors
+FILENAME_HASH_CHARS = 12
+
+# Lokaler Ersatz für HuggingFace: ein Ordner mit den Monatsdateien
+HUB_DIR = os.environ.get("DB_HUB_DIR")
+
+
+def month_filename(month: str) -> str:
+    """'2024-10' → 'data-2024-10.parquet'."""
+    return f"data-{month}.parquet"
+
+
+def mirror_filename(month: str, sha256: str) -> str:
+    """Inhaltsadressierter Name im Mirror: 'data-2024-10.<sha>.parquet'."""
+    return f"data-{month}.{sha256[:FILENAME_HASH_CHARS]}.parquet"
+
+
+def filename_sha256(path: str) -> str | None:
+    """Anfang des SHA-256 aus einem Mirror-Dateinamen (None bei anderen Dateien)."""
+    match = re.fullmatch(
+        rf"data-\d{{4}}-\d{{2}}\.([0-9a-f]{{{FILENAME_HASH_CHARS}}})\.parquet", os.path.basename(path)
+    )
+    return match.group(1) if match else None
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 einer Datei, blockweise gelesen."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ============================================================
+# STAND AUF HUGGINGFACE
+# ============================================================
+
+def _local_hub_files() -> dict[str, str]:
+    """Monat → Datei im lokalen Hub-Ordner (DB_HUB_DIR)."""
+    files = {}
+    for name in sorted(os.listdir(HUB_DIR)):
+        match = re.fullmatch(r"data-(\d{4}-\d{2})\.parquet", name)
+        if match:
+            files[match.group(1)] = os.path.join(HUB_DIR, name)
+    return files
+
+
+def remote_revision() -> str:
+    """Commit-Hash des aktuellen Stands des Datasets (billiger Metadaten-Aufruf)."""
+    if HUB_DIR:
+        # Lokaler Hub: Stand aus Namen, Größen und mtimes (ohne Dateien zu lesen)
+        digest = hashlib.sha1()
+        for path in _local_hub_files().values():
+            stat = os.stat(path)
+            digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+        return digest.hexdigest()
+
+    from huggingface_hub import repo_info
+
+    return repo_info(HF_REPO_ID, repo_type=HF_REPO_TYPE).sha
+
+
+def remote_checksums(revision: str | None = None) -> dict[str, str | None]:
+    """
+    Monat → SHA-256 der Monatsdatei im Stand `revision`.
+
+    Der SHA-256 stammt aus den LFS-Metadaten; fehlt er (keine LFS-Datei),
+    ist der Wert None und der Mirror vertraut seiner lokalen Kopie.
+    Ein lokaler Hub kennt nur seinen aktuellen Stand (`revision` egal).
+    """
+    if HUB_DIR:
+        return {month: file_sha256(path) for month, path in _local_hub_files().items()}
+
+    from huggingface_hub import repo_info
+
+    info = repo_info(HF_REPO_ID, repo_type=HF_REPO_TYPE, revision=revision, files_metadata=True)
+    prefix = f"{HF_DATA_FOLDER}/data-"
+    checksums: dict[str, str | None] = {}
+    for sibling in info.siblings or []:
+        name = sibling.rfilename
+        if not (name.startswith(prefix) and name.endswith(".parquet")):
+            continue
+        lfs = sibling.lfs
+        # Ältere huggingface_hub Versionen liefern die LFS-Infos als dict
+        sha256 = lfs.get("sha256") if isinstance(lfs, dict) else getattr(lfs, "sha256", None)
+        checksums[name[len(prefix):-len(".parquet")]] = sha256
+    return checksums
+
+
+# ============================================================
+# MIRROR
+# ============================================================
+
+class ParquetMirror:
+    """Lokaler, größenbegrenzter Mirror der Monatsdateien mit LRU-Eviction."""
+
+    def __init__(self, mirror_dir: str = MIRROR_DIR, max_bytes: int = MIRROR_MAX_BYTES):
+        self.mirror_dir = os.path.abspath(mirror_dir)
+        self.max_bytes = max_bytes
+        self.manifest_path = os.path.join(self.mirror_dir, MANIFEST_NAME)
+        self.lock_path = os.path.join(self.mirror_dir, LOCK_NAME)
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+        os.makedirs(self.mirror_dir, exist_ok=True)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """
+        Exklusiver Zugriff auf Manifest und Dateien, auch gegenüber anderen
+        Prozessen auf demselben Ordner (flock auf `.lock`). Verschachtelbar.
+        """
+        with self._lock:
+            if self._lock_depth == 0 and fcntl is not None:
+                self._lock_file = open(self.lock_path, "a")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0 and self._lock_file is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    # ---------- Manifest ----------
+
+    def _load_manifest(self) -> dict[str, dict[str, Any]]:
+        """Liest das Manifest (leer, wenn es fehlt oder kaputt ist)."""
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f).get("months", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, months: dict[str, dict[str, Any]]) -> None:
+        """Schreibt das Manifest atomar (erst Temp-Datei, dann rename)."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.mirror_dir, suffix=".json.tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"months": months}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _path(self, entry: dict[str, Any]) -> str:
+        return os.path.join(self.mirror_dir, entry["file"])
+
+    def _is_intact(self, entry: dict[str, Any]) -> bool:
+        """Schneller Check: Datei vorhanden und Größe passt zum Manifest."""
+        try:
+            return os.path.getsize(self._path(entry)) == entry["size"]
+        except OSError:
+            return False
+
+    # ---------- Zugriff ----------
+
+    def _is_current(self, entry: dict[str, Any] | None, sha256: str | None) -> bool:
+        """Eintrag vorhanden, intakt und (falls bekannt) auf dem erwarteten Stand."""
+        return (
+            entry is not None
+            and self._is_intact(entry)
+            and (sha256 is None or entry["sha256"] == sha256)
+        )
+
+    def contains(self, month: str, sha256: str | None = None) -> bool:
+        """True, wenn der Monat lokal liegt (mit `sha256`: in genau diesem Stand)."""
+        with self._locked():
+            return self._is_current(self._load_manifest().get(month), sha256)
+
+    def entries(self) -> dict[str, dict[str, Any]]:
+        """Kopie aller Manifest-Einträge."""
+        with self._locked():
+            return self._load_manifest()
+
+    def checksum_for(self, path: str) -> str | None:
+        """SHA-256 aus dem Manifest, falls `path` eine intakte Mirror-Datei ist."""
+        path = os.path.abspath(path)
+        with self._locked():
+            for entry in self._load_manifest().values():
+                if self._path(entry) == path and self._is_intact(entry):
+                    return entry["sha256"]
+        return None
+
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self.entries().values())
+
+    def fetch(
+        self,
+        month: str,
+        keep: Iterable[str] = (),
+        sha256: str | None = None,
+        revision: str | None = None,
+    ) -> str:
+        """
+        Gibt den lokalen Pfad eines Monats zurück und lädt ihn bei Bedarf.
+
+        `keep` sind Monate, die bei einer Eviction nicht entfernt werden
+        dürfen (z.B. alle Monate des gerade angezeigten Zeitraums).
+        Mit `sha256` (siehe remote_checksums) wird eine lokale Kopie in
+        einem anderen Stand durch den Stand aus `revision` ersetzt.
+        """
+        with self._locked():
+            months = self._load_manifest()
+            entry = months.get(month)
+
+            if self._is_current(entry, sha256):
+                entry["last_used"] = time.time()
+                # Budget kann seit dem letzten Download verkleinert worden sein
+                self._evict(months, protected={month, *keep})
+                self._save_manifest(months)
+                return self._path(entry)
+
+        # Download außerhalb des Locks (kann Minuten dauern)
+        path, size, downloaded_sha256 = self._download(month, revision)
+        if sha256 is not None and downloaded_sha256 != sha256:
+            os.remove(path)
+            raise ValueError(f"Checksumme von {month} passt nicht zum erwarteten Stand")
+
+        with self._locked():
+            months = self._load_manifest()
+            old = months.get(month)
+            if old is not None and old["file"] != os.path.basename(path):
+                # Überholter Stand (Leser mit offenem Handle lesen weiter)
+                try:
+                    os.remove(self._path(old))
+                except FileNotFoundError:
+                    pass
+            now = time.time()
+            months[month] = {
+                "file": os.path.basename(path),
+                "size": size,
+                "sha256": downloaded_sha256,
+                "downloaded": now,
+                "last_used": now,
+            }
+            self._evict(months, protected={month, *keep})
+            self._save_manifest(months)
+            return path
+
+    def _download(self, month: str, revision: str | None = None) -> tuple[str, int, str]:
+        """Lädt einen Monat von HuggingFace (bzw. DB_HUB_DIR) und verschiebt ihn in den Mirror."""
+        incoming = tempfile.mkdtemp(prefix=".incoming-", dir=self.mirror_dir)
+        try:
+            if HUB_DIR:
+                downloaded = shutil.copyfile(
+                    os.path.join(HUB_DIR, month_filename(month)),
+                    os.path.join(incoming, month_filename(month)),
+                )
+            else:
+                from huggingface_hub import hf_hub_download
+
+                downloaded = hf_hub_download(
+                    repo_id=HF_REPO_ID,
+                    filename=f"{HF_DATA_FOLDER}/{month_filename(month)}",
+                    repo_type=HF_REPO_TYPE,
+                    revision=revision,
+                    local_dir=incoming,
+                )
+            sha256 = file_sha256(downloaded)
+            target = os.path.join(self.mirror_dir, mirror_filename(month, sha256))
+            if os.path.islink(downloaded):
+                # Ältere huggingface_hub Versionen verlinken in den globalen Cache
+                shutil.copyfile(os.path.realpath(downloaded), target)
+            else:
+                os.replace(downloaded, target)
+            return target, os.path.getsize(target), sha256
+        finally:
+            shutil.rmtree(incoming, ignore_errors=True)
+
+    # ---------- Eviction ----------
+
+    def _evict(self, months: dict[str, dict[str, Any]], protected: set[str]) -> list[str]:
+        """
+        Entfernt die ältesten Monate, bis das Budget eingehalten wird.
+
+        Nur unter _locked() und mit einem darunter frisch gelesenen Manifest
+        aufrufen: `last_used` anderer Prozesse ist dann aktuell, ein gerade
+        genutzter Monat steht in der LRU-Reihenfolge hinten.
+        """
+        evicted = []
+        total = sum(entry["size"] for entry in months.values())
+        by_last_use = sorted(months.items(), key=lambda item: item[1]["last_used"])
+
+        for month, entry in by_last_use:
+            if total <= self.max_bytes:
+                break
+            if month in protected:
+                continue
+            try:
+                os.remove(self._path(entry))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+            del months[month]
+            evicted.append(month)
+
+        return evicted
+
+    # ---------- Wartung ----------
+
+    def verify(self) -> dict[str, bool]:
+        """Prüft alle Dateien gegen die SHA-256 im Manifest."""
+        with self._locked():
+            months = self._load_manifest()
+        return {
+            month: self._is_intact(entry) and file_sha256(self._path(entry)) == entry["sha256"]
+            for month, entry in sorted(months.items())
+        }
+
+    def discard(self, month: str) -> None:
+        """Entfernt einen Monat aus Mirror und Manifest."""
+        with self._locked():
+            months = self._load_manifest()
+            entry = months.pop(month, None)
+            if entry is not None:
+                try:
+                    os.remove(self._path(entry))
+                except FileNotFoundError:
+                    pass
+                self._save_manifest(months)
+
+
+# Prozessweite Instanz
+_mirror: ParquetMirror | None = None
+_mirror_lock = threading.Lock()
+
+
+def get_mirror() -> ParquetMirror:
+    """Gibt den prozessweiten Mirror zurück (wird beim ersten Aufruf angelegt)."""
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = ParquetMirror()
+        return _mirror
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Verwaltet den lokalen Parquet-Mirror.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Zeigt Inhalt und Belegung des Mirrors")
+    fetch_parser = sub.add_parser("fetch", help="Lädt Monate in den Mirror")
+    fetch_parser.add_argument("months", nargs="+", help="Monate im Format YYYY-MM")
+    fetch_parser.add_argument("--latest", action="store_true", help="Veraltete Monate durch den aktuellen Stand ersetzen")
+    verify_parser = sub.add_parser("verify", help="Prüft alle Checksummen")
+    verify_parser.add_argument("--repair", action="store_true", help="Defekte Monate entfernen")
+    args = parser.parse_args()
+
+    mirror = get_mirror()
+
+    if args.command == "fetch":
+        revision = remote_revision() if args.latest else None
+        checksums = remote_checksums(revision) if args.latest else {}
+        for month in args.months:
+            path = mirror.fetch(month, keep=args.months, sha256=checksums.get(month), revision=revision)
+            print(f"✅ {month}: {path}")
+
+    elif args.command == "verify":
+        for month, ok in mirror.verify().items():
+            print(f"{'✅' if ok else '❌'} {month}")
+            if not ok and args.repair:
+                mirror.discard(month)
+                print("   → entfernt, wird beim nächsten Zugriff neu geladen")
+
+    else:
+        entries = mirror.entries()
+        used_gb = mirror.total_bytes() / 1024 ** 3
+        print(f"📁 Mirror: {mirror.mirror_dir}")
+        print(f"💾 Belegt:  {used_gb:.2f} / {mirror.max_bytes / 1024 ** 3:.2f} GB ({len(entries)} Monate)")
+        for month, entry in sorted(entries.items(), key=lambda item: -item[1]["last_used"]):
+            last_used = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["last_used"]))
+            print(f"   {month}  {entry['size'] / 1024 ** 2:>8.1f} MB  zuletzt genutzt {last_used}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,243 @@
+"""
+============================================================
+    DUCKDB CONNECTION MANAGER
+    Eine Datenbank pro Prozess, ein Cursor pro Thread
+============================================================
+
+Statt für jede Query ein neues `duckdb.connect()` zu öffnen, teilen sich
+alle Streamlit-Sessions eines Prozesses eine In-Memory-Datenbank. Jeder
+Thread bekommt daraus einen eigenen Cursor (DuckDB-Cursor sind nicht
+thread-sicher), der wiederverwendet wird. Parquet-Metadaten und der
+Object Cache bleiben so zwischen den Queries warm. Cursor beendeter
+Threads (Streamlit startet pro Rerun einen neuen) werden geschlossen,
+sobald ein neuer Thread seinen Cursor anlegt.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+import weakref
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Iterator, Protocol, TypeVar
+
+import duckdb
+import pyarrow as pa
+
+if TYPE_CHECKING:
+    # Nur für Typen: pandas kostet beim Start ~0,25 s und wird im Dashboard nicht gebraucht
+    import pandas as pd
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+# Einstellungen für die geteilte Datenbank
+DB_CONFIG: dict[str, str] = {
+    "enable_object_cache": "true",  # Parquet-Footer & Statistiken cachen
+    "threads": os.environ.get("DB_THREADS", str(os.cpu_count() or 1)),  # Scans auf allen Kernen
+}
+
+# Werden nach dem Öffnen gesetzt (brauchen die geladene Parquet-Extension)
+DB_SETTINGS: tuple[str, ...] = (
+    "SET parquet_metadata_cache = true",  # Metadaten nicht bei jeder Query neu lesen
+)
+
+# Profiling-Metriken, die an einen Query-Beobachter gemeldet werden
+PROFILING_METRICS: tuple[str, ...] = (
+    "latency",
+    "cumulative_rows_scanned",
+    "total_bytes_read",
+    "system_peak_buffer_memory",
+)
+
+T = TypeVar("T")
+
+
+# ============================================================
+# CONNECTION MANAGER
+# ============================================================
+
+class ConnectionManager:
+    """Hält eine geteilte DuckDB-Datenbank und verteilt Cursor pro Thread."""
+
+    def __init__(self, database: str = ":memory:", config: dict[str, str] | None = None):
+        self.database = database
+        self.config = dict(DB_CONFIG if config is None else config)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._conn: duckdb.DuckDBPyConnection | None = None
+        # (Thread, Cursor): Cursor beendeter Threads werden beim nächsten Anlegen geschlossen
+        self._cursors: list[tuple[weakref.ref[threading.Thread], duckdb.DuckDBPyConnection]] = []
+
+    def _root(self) -> duckdb.DuckDBPyConnection:
+        """Öffnet die geteilte Datenbank beim ersten Zugriff."""
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    conn = duckdb.connect(self.database, config=self.config)
+                    for statement in DB_SETTINGS:
+                        conn.execute(statement)
+                    self._conn = conn
+        return self._conn
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """Gibt den Cursor des aktuellen Threads zurück (wird bei Bedarf angelegt)."""
+        cur = getattr(self._local, "cursor", None)
+        if cur is None:
+            cur = self._root().cursor()
+            with self._lock:
+                self._close_orphans()
+                self._cursors.append((weakref.ref(threading.current_thread()), cur))
+            self._local.cursor = cur
+        return cur
+
+    def _close_orphans(self) -> None:
+        """Schließt die Cursor beendeter Threads (Aufrufer hält self._lock)."""
+        alive = []
+        for thread_ref, cur in self._cursors:
+            thread = thread_ref()
+            if thread is not None and thread.is_alive():
+                alive.append((thread_ref, cur))
+                continue
+            try:
+                cur.close()
+            except duckdb.Error:
+                pass
+        self._cursors = alive
+
+    def close(self) -> None:
+        """Schließt alle Cursor und die geteilte Datenbank."""
+        with self._lock:
+            for _, cur in self._cursors:
+                try:
+                    cur.close()
+                except duckdb.Error:
+                    pass
+            self._cursors.clear()
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        self._local = threading.local()
+
+
+# Prozessweite Instanz (von allen Sessions geteilt)
+_manager = ConnectionManager()
+
+
+def get_manager() -> ConnectionManager:
+    """Gibt den prozessweiten Connection Manager zurück."""
+    return _manager
+
+
+@contextmanager
+def get_db_connection() -> Iterator[duckdb.DuckDBPyConnection]:
+    """Context Manager für den Thread-Cursor der geteilten Datenbank."""
+    yield _manager.cursor()
+
+
+# ============================================================
+# PROFILING
+# ============================================================
+
+class QueryObserver(Protocol):
+    """Empfängt Profiling-Metriken der Queries (siehe query_metrics.py)."""
+
+    def active(self) -> bool:
+        """True, wenn im aktuellen Thread gerade gemessen wird."""
+
+    def record(self, query: str, metrics: dict[str, float]) -> None:
+        """Nimmt die Metriken einer ausgeführten Query entgegen."""
+
+
+_observer: QueryObserver | None = None
+
+
+def set_query_observer(observer: QueryObserver | None) -> None:
+    """Registriert den Beobachter, der Profiling-Metriken einsammelt."""
+    global _observer
+    _observer = observer
+
+
+def _profiling_metrics(conn: duckdb.DuckDBPyConnection) -> dict[str, float]:
+    """Liest die Metriken der letzten Query aus dem DuckDB-Profiler."""
+    if not hasattr(conn, "get_profiling_information"):
+        return {}
+    try:
+        info = json.loads(conn.get_profiling_information(format="json"))
+    except (duckdb.Error, ValueError):
+        return {}
+    info = {key.lower(): value for key, value in info.items()}
+    return {name: info[name] for name in PROFILING_METRICS if name in info}
+
+
+def _run(
+    query: str,
+    params: list[Any] | None,
+    fetch: Callable[[duckdb.DuckDBPyConnection], T],
+) -> T:
+    """Führt eine Query aus; misst sie, wenn ein Beobachter aktiv ist."""
+    with get_db_connection() as conn:
+        observer = _observer
+        if observer is None or not observer.active():
+            return fetch(conn.execute(query, params) if params else conn.execute(query))
+
+        # 'no_output': Profil nur sammeln, nicht auf stdout ausgeben
+        conn.execute("SET enable_profiling = 'no_output'")
+        try:
+            result = fetch(conn.execute(query, params) if params else conn.execute(query))
+            observer.record(query, _profiling_metrics(conn))
+        finally:
+            conn.execute("PRAGMA disable_profiling")
+        return result
+
+
+# ============================================================
+# QUERY HELPER
+# ============================================================
+
+def execute_query(query: str, params: list[Any] | None = None) -> pd.DataFrame:
+    """Führt eine Query sicher aus mit optionalen Parametern."""
+    return _run(query, params, lambda result: result.fetchdf())
+
+
+def execute_query_single(query: str, params: list[Any] | None = None) -> tuple | None:
+    """Führt eine Query aus und gibt eine einzelne Zeile zurück."""
+    return _run(query, params, lambda result: result.fetchone())
+
+
+def execute_statement(query: str, params: list[Any] | None = None) -> None:
+    """Führt ein Statement ohne Ergebnis aus (z.B. COPY ... TO)."""
+    _run(query, params, lambda result: None)
+
+
+def _to_arrow_table(result: duckdb.DuckDBPyConnection) -> pa.Table:
+    """Arrow-Tabelle aus einem Ergebnis (DuckDB >= 1.5: to_arrow_table)."""
+    if hasattr(result, "to_arrow_table"):
+        return result.to_arrow_table()
+    return result.fetch_arrow_table()
+
+
+def execute_query_arrow(query: str, params: list[Any] | None = None) -> pa.Table:
+    """Führt eine Query aus und gibt das Ergebnis als Arrow-Tabelle zurück (ohne Pandas)."""
+    return _run(query, params, _to_arrow_table)
+
+
+def execute_query_batches(
+    query: str,
+    params: list[Any] | None = None,
+    batch_size: int = 100_000,
+) -> pa.RecordBatchReader:
+    """
+    Streamt ein großes Ergebnis als Arrow Record Batches.
+
+    Der Reader hält den Cursor des aufrufenden Threads, bis er komplett
+    gelesen ist; im selben Thread also erst danach die nächste Query starten.
+    Gestreamte Queries werden nicht profiliert.
+    """
+    with get_db_connection() as conn:
+        result = conn.execute(query, params) if params else conn.execute(query)
+        if hasattr(result, "to_arrow_reader"):
+            return result.to_arrow_reader(batch_size)
+        return result.fetch_record_batch(batch_size)
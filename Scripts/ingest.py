@@ -0,0 +1,228 @@
+"""
+============================================================
+    INKREMENTELLER INGEST
+    Neue und geänderte Monate vorbereiten, bevor jemand sie öffnet
+============================================================
+
+Erscheint auf HuggingFace ein neuer Monat (oder wird einer ersetzt),
+bezahlte bisher der erste Besucher den Download und jede Aggregation.
+Dieser Job vergleicht den Stand des Datasets (`remote_checksums()`) mit
+einem lokalen Manifest und verarbeitet nur Monate, deren SHA-256 dort
+fehlt oder abweicht:
+
+1. Download in den Mirror (data_mirror.py), im geprüften Stand
+2. Warehouse, Rollup, Stichprobe, Verspätungs-Histogramm, Bahnhofs-Index
+
+Eine Bereinigung (data_cleaning.py) gehört nicht dazu: das Dashboard
+rechnet auf den Rohdaten des Mirrors und baut fehlende Artefakte daraus
+nach. Artefakte aus einer bereinigten Kopie zeigten andere Zahlen als ein
+Neubau. Bereinigte Monate für Analysen liefert batch_cleaning.py.
+
+Alle Artefakte sind Dateien pro Monat; ein neuer Monat kommt als weitere
+Datei hinzu, bereits verarbeitete Monate werden nicht angefasst. Das
+Manifest wird nach jedem Monat geschrieben, ein abgebrochener Lauf setzt
+beim nächsten Mal beim ersten fehlenden Monat an.
+
+Konfiguration über Umgebungsvariablen:
+    DB_INGEST_MANIFEST       Manifest des Jobs (Standard: Data/deutsche_bahn_data/ingest_manifest.json)
+    DB_INGEST_INTERVAL_MIN   Pause zwischen zwei Läufen mit --loop (Standard: 60)
+
+Verwendung:
+    python ingest.py                    # ein Lauf über alle Monate
+    python ingest.py 2024-10 2024-11    # nur diese Monate
+    python ingest.py --loop             # dauerhaft, z.B. als eigener Worker
+    python ingest.py --dry-run          # nur anzeigen, was zu tun wäre
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Sequence
+
+import approximate
+import data_mirror
+import delay_sketch
+import rollup
+import station_index
+import warehouse
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+INGEST_MANIFEST_PATH = os.environ.get(
+    "DB_INGEST_MANIFEST",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "ingest_manifest.json"),
+)
+
+INGEST_INTERVAL_SECONDS = float(os.environ.get("DB_INGEST_INTERVAL_MIN", "60")) * 60
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# MANIFEST
+# ============================================================
+
+def load_manifest(path: str = INGEST_MANIFEST_PATH) -> dict[str, dict[str, Any]]:
+    """Monat → Stand des letzten erfolgreichen Ingests (leer, wenn es fehlt)."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("months", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(months: dict[str, dict[str, Any]], path: str = INGEST_MANIFEST_PATH) -> None:
+    """Schreibt das Manifest atomar (erst Temp-Datei, dann rename)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json.tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"months": months}, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def pending_months(
+    checksums: dict[str, str | None],
+    manifest: dict[str, dict[str, Any]],
+    months: Sequence[str] = (),
+) -> list[str]:
+    """
+    Neue oder geänderte Monate, neueste zuerst.
+
+    Ohne SHA-256 auf HuggingFace gilt ein Monat als unverändert, sobald er
+    einmal ingestiert wurde.
+    """
+    candidates = [m for m in checksums if not months or m in months]
+    pending = []
+    for month in candidates:
+        entry = manifest.get(month)
+        if entry is None or (checksums[month] is not None and entry["sha256"] != checksums[month]):
+            pending.append(month)
+    return sorted(pending, reverse=True)
+
+
+# ============================================================
+# INGEST
+# ============================================================
+
+def prepare_month(data_path: str) -> dict[str, str]:
+    """Baut alle Dashboard-Artefakte eines Monats (aktuelle werden übersprungen)."""
+    artifacts = {}
+    if not warehouse.is_ingested(data_path):
+        warehouse.ingest_month(data_path)
+    artifacts["warehouse"] = warehouse.warehouse_path_for(data_path)
+
+    # Ab hier aus dem Warehouse statt aus dem Parquet lesen
+    source = warehouse.source_for(data_path)
+    artifacts["rollup"] = rollup.ensure_rollup(data_path, source=source)
+    artifacts["sample"] = approximate.ensure_sample(data_path, source=source)
+    artifacts["sketch"] = delay_sketch.ensure_sketch(data_path, source=source)
+    artifacts["stations"] = station_index.ensure_station_index(data_path, source=source)
+    return artifacts
+
+
+def ingest_month(
+    month: str,
+    sha256: str | None,
+    revision: str,
+) -> dict[str, Any]:
+    """Lädt und verarbeitet einen Monat; gibt den Manifest-Eintrag zurück."""
+    start = time.time()
+    mirror = data_mirror.get_mirror()
+    # Kein `keep` für die übrigen Monate des Laufs: ihre Artefakte sind fertig,
+    # sobald der nächste Monat dran ist, sonst hielte ein Backfill das Budget nicht ein
+    data_path = mirror.fetch(month, sha256=sha256, revision=revision)
+
+    entry: dict[str, Any] = {
+        "sha256": sha256 or mirror.checksum_for(data_path),
+        "revision": revision,
+        "file": os.path.basename(data_path),
+    }
+    entry["artifacts"] = {name: os.path.basename(path) for name, path in prepare_month(data_path).items()}
+    entry["ingested"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    entry["seconds"] = round(time.time() - start, 1)
+    return entry
+
+
+def run_once(months: Sequence[str] = (), dry_run: bool = False) -> list[str]:
+    """
+    Ein Ingest-Lauf: verarbeitet alle neuen oder geänderten Monate.
+
+    Ein fehlgeschlagener Monat bricht den Lauf nicht ab; er bleibt im
+    Manifest unverändert und wird beim nächsten Lauf erneut versucht.
+    Gibt die erfolgreich verarbeiteten Monate zurück.
+    """
+    revision = data_mirror.remote_revision()
+    checksums = data_mirror.remote_checksums(revision)
+    manifest = load_manifest()
+    pending = pending_months(checksums, manifest, months)
+
+    unknown = sorted(set(months) - set(checksums))
+    if unknown:
+        print(f"⚠️  Nicht auf HuggingFace: {', '.join(unknown)}")
+
+    if not pending:
+        print(f"✅ Alles aktuell (Stand {revision[:12]}, {len(checksums)} Monate)")
+        return []
+
+    print(f"📥 {len(pending)} neue/geänderte Monate (Stand {revision[:12]}): {', '.join(pending)}")
+    if dry_run:
+        return []
+
+    done = []
+    for month in pending:
+        try:
+            entry = ingest_month(month, checksums[month], revision)
+        except Exception:
+            logger.exception("Ingest fehlgeschlagen: %s", month)
+            print(f"❌ {month}: fehlgeschlagen, nächster Versuch im nächsten Lauf")
+            continue
+
+        # Nach jedem Monat speichern: ein Abbruch verliert keine fertigen Monate
+        manifest = load_manifest()
+        manifest[month] = entry
+        save_manifest(manifest)
+        done.append(month)
+        print(f"✅ {month}: {entry['file']} ({entry['seconds']:.1f} s)")
+
+    return done
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Verarbeitet neue und geänderte Monate vorab.")
+    parser.add_argument("months", nargs="*", help="Nur diese Monate (YYYY-MM), Standard: alle")
+    parser.add_argument("--loop", action="store_true", help="Dauerhaft laufen und regelmäßig prüfen")
+    parser.add_argument("--interval", type=float, default=INGEST_INTERVAL_SECONDS / 60, help="Minuten zwischen zwei Läufen")
+    parser.add_argument("--dry-run", action="store_true", help="Nur anzeigen, was verarbeitet würde")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if not args.loop:
+        run_once(args.months, dry_run=args.dry_run)
+        return
+
+    while True:
+        try:
+            run_once(args.months, dry_run=args.dry_run)
+        except Exception:
+            # z.B. HuggingFace nicht erreichbar: im nächsten Intervall erneut
+            logger.exception("Ingest-Lauf fehlgeschlagen")
+        time.sleep(args.interval * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+============================================================
+    MONATS-KATALOG
+    Verfügbare Monate lokal, Abgleich mit HuggingFace im Hintergrund
+============================================================
+
+Bisher fragte das Dashboard bei jedem Start zuerst HuggingFace nach dem
+Stand des Datasets, bevor irgendetwas gerendert wurde; war der Hub nicht
+erreichbar, blieb die Seite leer. Der Katalog hält den zuletzt gesehenen
+Stand (Revision und SHA-256 pro Monat) als JSON-Datei neben dem Mirror:
+
+- Die Seite liest nur diese Datei und rendert sofort aus dem Mirror und
+  den Caches auf der Platte.
+- `refresh_async()` gleicht höchstens alle `refresh_seconds` in einem
+  Hintergrund-Thread mit dem Hub ab; ein neuer Stand wirkt beim nächsten
+  Rerun.
+- Ist der Hub nicht erreichbar, bleibt der alte Stand gültig und
+  `last_error` erklärt, warum er nicht aktualisiert wurde.
+
+Mit DB_HUB_DIR (siehe data_mirror.py) spielt ein lokaler Ordner den Hub.
+
+Verwendung:
+    python month_catalog.py            # Katalog anzeigen
+    python month_catalog.py refresh    # jetzt mit dem Hub abgleichen
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any
+
+import data_mirror
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+CATALOG_PATH = os.environ.get(
+    "DB_CATALOG_PATH",
+    os.path.join(data_mirror.MIRROR_DIR, "catalog.json"),
+)
+
+# Wie oft nach einem neuen Stand des Datasets gefragt wird
+CATALOG_REFRESH_SECONDS = float(os.environ.get("DB_REVISION_CHECK_SECONDS", "300"))
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# KATALOG
+# ============================================================
+
+class MonthCatalog:
+    """Lokal gespeicherter Stand des Datasets mit Abgleich im Hintergrund."""
+
+    def __init__(self, path: str = CATALOG_PATH, refresh_seconds: float = CATALOG_REFRESH_SECONDS):
+        self.path = os.path.abspath(path)
+        self.refresh_seconds = refresh_seconds
+        self.last_error: str | None = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._last_attempt = 0.0
+        # (mtime_ns, Inhalt): die Datei wird nur nach einer Änderung neu gelesen
+        self._loaded: tuple[int, dict[str, Any]] | None = None
+
+    # ---------- Lesen ----------
+
+    def load(self) -> dict[str, Any] | None:
+        """{'revision', 'checksums', 'refreshed'} oder None, wenn es noch keinen Katalog gibt."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+        with self._lock:
+            if self._loaded is not None and self._loaded[0] == mtime:
+                return self._loaded[1]
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            self._loaded = (mtime, data)
+        return data
+
+    def months(self) -> list[str]:
+        """Alle Monate im gespeicherten Stand (aufsteigend)."""
+        data = self.load()
+        return sorted(data["checksums"]) if data else []
+
+    def checksum(self, month: str) -> str | None:
+        """SHA-256 eines Monats im gespeicherten Stand (None = unbekannt)."""
+        data = self.load()
+        return data["checksums"].get(month) if data else None
+
+    def revision(self) -> str | None:
+        data = self.load()
+        return data["revision"] if data else None
+
+    def age_seconds(self) -> float | None:
+        """Sekunden seit dem letzten erfolgreichen Abgleich."""
+        data = self.load()
+        return time.time() - data["refreshed"] if data else None
+
+    # ---------- Abgleich ----------
+
+    def _save(self, data: dict[str, Any]) -> None:
+        """Schreibt den Katalog atomar (erst Temp-Datei, dann rename)."""
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".json.tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self) -> dict[str, Any]:
+        """
+        Gleicht jetzt mit dem Hub ab und gibt den neuen Stand zurück.
+
+        Die SHA-256 werden nur bei einer neuen Revision geholt. Fehler
+        (Hub nicht erreichbar) werden weitergereicht.
+        """
+        with self._refresh_lock:
+            self._last_attempt = time.time()
+            try:
+                revision = data_mirror.remote_revision()
+                current = self.load()
+                if current is not None and current["revision"] == revision:
+                    checksums = current["checksums"]
+                else:
+                    checksums = data_mirror.remote_checksums(revision)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                raise
+
+            data = {"revision": revision, "checksums": checksums, "refreshed": time.time()}
+            self._save(data)
+            self.last_error = None
+            return data
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except Exception:
+            logger.warning("Katalog-Abgleich fehlgeschlagen: %s", self.last_error)
+
+    def refresh_async(self) -> bool:
+        """
+        Startet einen Abgleich im Hintergrund, wenn der letzte Versuch älter
+        als `refresh_seconds` ist. True, wenn ein Abgleich gestartet wurde.
+        """
+        age = self.age_seconds()
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            since_attempt = time.time() - self._last_attempt
+            if age is not None and min(age, since_attempt) < self.refresh_seconds:
+                return False
+            self._last_attempt = time.time()
+            self._thread = threading.Thread(target=self._refresh_quietly, name="catalog-refresh", daemon=True)
+            self._thread.start()
+            return True
+
+    def is_refreshing(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Zeigt oder aktualisiert den lokalen Monats-Katalog.")
+    parser.add_argument("command", nargs="?", choices=["status", "refresh"], default="status")
+    args = parser.parse_args()
+
+    catalog = MonthCatalog()
+    if args.command == "refresh":
+        catalog.refresh()
+
+    data = catalog.load()
+    if data is None:
+        print(f"📭 Noch kein Katalog unter {catalog.path}")
+        return
+
+    refreshed = time.strftime("%Y-%m-%d %H:%M", time.localtime(data["refreshed"]))
+    print(f"📁 Katalog: {catalog.path}")
+    print(f"🔖 Stand {data['revision'][:12]} (abgeglichen {refreshed}), {len(data['checksums'])} Monate")
+    for month in catalog.months():
+        print(f"   {month}  {(catalog.checksum(month) or '–')[:12]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+"""
+============================================================
+    PANEL ENGINE
+    Alle Dashboard-Kennzahlen in einem einzigen Scan
+============================================================
+
+Statt für KPIs, Rush Hour, Wochentage und Zugtypen jeweils einen eigenen
+Full Scan über die Monatsdatei zu fahren, berechnet `compute_panels()`
+alle Panels in einer Aggregation mit GROUPING SETS. Die `*_from_panels`
+Funktionen schneiden daraus im Speicher die einzelnen Tabellen heraus.
+
+Die Aggregation arbeitet auf additiven Summen (siehe MEASURE_COLUMNS) und
+läuft deshalb gleichermaßen auf Rohdaten und auf Monats-Rollups.
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from db_connection import execute_query_arrow
+
+# ============================================================
+# KONSTANTEN
+# ============================================================
+
+# Schwellenwerte (zentral definiert)
+PUENKTLICH_THRESHOLD_MIN: int = 5
+VERSPAETET_THRESHOLD_MIN: int = 15
+
+# Wochentag-Mapping (DuckDB DAYOFWEEK: 0=Sonntag)
+WOCHENTAGE: dict[int, str] = {
+    0: "Sonntag",
+    1: "Montag",
+    2: "Dienstag",
+    3: "Mittwoch",
+    4: "Donnerstag",
+    5: "Freitag",
+    6: "Samstag",
+}
+
+WOCHENTAGE_KURZ: dict[int, str] = {
+    0: "So",
+    1: "Mo",
+    2: "Di",
+    3: "Mi",
+    4: "Do",
+    5: "Fr",
+    6: "Sa",
+}
+
+# Zeitfenster für Rush Hour Analyse
+RUSH_HOUR_MORGEN: tuple[int, int] = (7, 9)
+RUSH_HOUR_ABEND: tuple[int, int] = (16, 19)
+
+# Namen der Grouping Sets (Spalte `panel` im Ergebnis)
+PANEL_GESAMT = "gesamt"
+PANEL_ZEITFENSTER = "zeitfenster"
+PANEL_WOCHENTAG = "wochentag"
+PANEL_ZUGTYP = "zugtyp"
+PANEL_ZUGTYP_WOCHENTAG = "zugtyp_wochentag"
+
+
+# ============================================================
+# MESSGRÖSSEN
+# ============================================================
+
+# Additive Kennzahlen pro Zeile bzw. Rollup-Zelle. Aus diesen Summen
+# lassen sich alle Panels ableiten (Mittelwerte und Quoten als Quotient).
+MEASURE_COLUMNS: tuple[str, ...] = (
+    "n_rows",
+    "fahrten",
+    "sum_delay",
+    "sum_sq_delay",
+    "n_puenktlich",
+    "n_verspaetet",
+    "n_canceled",
+    "min_time",
+    "max_time",
+)
+
+
+def parquet_source(data_paths: str | Sequence[str]) -> str:
+    """
+    SQL-Ausdruck, der eine oder mehrere Parquet-Dateien als Tabelle liest.
+
+    Mehrere Dateien werden als ein Dataset gelesen (Spalten nach Namen
+    zusammengeführt), DuckDB verteilt die Dateien dabei auf alle Threads.
+    """
+    if isinstance(data_paths, str):
+        data_paths = [data_paths]
+
+    quoted = ", ".join("'" + path.replace("'", "''") + "'" for path in data_paths)
+    if len(data_paths) == 1:
+        return f"read_parquet({quoted})"
+    return f"read_parquet([{quoted}], union_by_name = true)"
+
+
+def stop_event_measures(source: str) -> str:
+    """
+    Projiziert die Rohdaten (ein Halt pro Zeile) auf die Rollup-Spalten.
+
+    Das Ergebnis hat dieselbe Form wie eine Rollup-Tabelle mit je einer
+    Zelle pro Zeile, sodass Panels aus Rohdaten und Rollups mit derselben
+    Query berechnet werden.
+    """
+    has_delay = "delay_in_min IS NOT NULL"
+
+    return f"""(
+        SELECT
+            CAST(time AS DATE) as day,
+            HOUR(time) as hour,
+            train_type,
+            station_name,
+            1 as n_rows,
+            CAST({has_delay} AS INTEGER) as fahrten,
+            CAST(delay_in_min AS BIGINT) as sum_delay,
+            CAST(delay_in_min AS BIGINT) * delay_in_min as sum_sq_delay,
+            CAST(delay_in_min <= {PUENKTLICH_THRESHOLD_MIN} AS INTEGER) as n_puenktlich,
+            CAST(delay_in_min > {VERSPAETET_THRESHOLD_MIN} AS INTEGER) as n_verspaetet,
+            CAST(COALESCE(is_canceled, FALSE) AND {has_delay} AS INTEGER) as n_canceled,
+            CASE WHEN {has_delay} THEN time END as min_time,
+            CASE WHEN {has_delay} THEN time END as max_time
+        FROM {source}
+    )"""
+
+
+# ============================================================
+# FUSIONIERTE AGGREGATION
+# ============================================================
+
+def _zeitfenster_expression() -> str:
+    """CASE-Ausdruck, der jede Stunde einem Rush-Hour-Zeitfenster zuordnet."""
+    morgen_start, morgen_end = RUSH_HOUR_MORGEN
+    abend_start, abend_end = RUSH_HOUR_ABEND
+
+    return f"""CASE
+            WHEN hour BETWEEN {morgen_start} AND {morgen_end}
+                THEN 'Morgen Rush ({morgen_start}-{morgen_end})'
+            WHEN hour BETWEEN {abend_start} AND {abend_end}
+                THEN 'Abend Rush ({abend_start}-{abend_end})'
+            ELSE 'Normal'
+        END"""
+
+
+def _ratio(numerator: str, decimals: int, percent: bool = False) -> str:
+    """Gerundeter Quotient zweier Summen (NULL, wenn keine Fahrten)."""
+    factor = " * 100.0" if percent else ""
+    return f"ROUND(SUM({numerator}){factor} / NULLIF(SUM(fahrten), 0), {decimals})"
+
+
+def _panel_name_expression() -> str:
+    """CASE-Ausdruck, der jede Ergebniszeile ihrem Grouping Set zuordnet."""
+    return f"""CASE GROUPING(zeitfenster, tag_nummer, train_type)
+            WHEN 7 THEN '{PANEL_GESAMT}'
+            WHEN 3 THEN '{PANEL_ZEITFENSTER}'
+            WHEN 5 THEN '{PANEL_WOCHENTAG}'
+            WHEN 6 THEN '{PANEL_ZUGTYP}'
+            WHEN 4 THEN '{PANEL_ZUGTYP_WOCHENTAG}'
+        END"""
+
+
+def _grouping_sets_query(cells: str, aggregates: str) -> str:
+    """Gruppiert `cells` nach allen Panels und berechnet `aggregates` pro Gruppe."""
+    return f"""
+    SELECT
+        {_panel_name_expression()} as panel,
+        zeitfenster,
+        tag_nummer,
+        train_type,
+        {aggregates}
+    FROM (
+        SELECT
+            *,
+            {_zeitfenster_expression()} as zeitfenster,
+            DAYOFWEEK(day) as tag_nummer
+        FROM {cells}
+    )
+    GROUP BY GROUPING SETS (
+        (),
+        (zeitfenster),
+        (tag_nummer),
+        (train_type),
+        (train_type, tag_nummer)
+    )
+    """
+
+
+def build_panels_query(cells: str) -> str:
+    """
+    Baut die GROUPING SETS Query über (Zeitfenster, Wochentag, Zugtyp).
+
+    `cells` ist eine Relation mit den Spalten day, hour, train_type und
+    MEASURE_COLUMNS, also eine Rollup-Tabelle oder `stop_event_measures()`.
+    Kennzahlen mit Verspätungsbezug zählen nur Zeilen mit `delay_in_min`,
+    `n_rows` zählt alle Zeilen (für Datenvalidierung und Zugtyp-Liste).
+    """
+    return _grouping_sets_query(cells, f"""CAST(SUM(n_rows) AS BIGINT) as n_rows,
+        CAST(SUM(fahrten) AS BIGINT) as fahrten,
+        {_ratio("sum_delay", 2)} as avg_delay,
+        {_ratio("n_puenktlich", 1, percent=True)} as puenktlich_pct,
+        {_ratio("n_verspaetet", 2, percent=True)} as verspaetet_pct,
+        {_ratio("n_canceled", 2, percent=True)} as canceled_pct,
+        MIN(min_time) as start_datum,
+        MAX(max_time) as end_datum""")
+
+
+def compute_panels(cells: str) -> pa.Table:
+    """Berechnet alle Panels mit einem einzigen Scan über `cells` (als Arrow-Tabelle)."""
+    return execute_query_arrow(build_panels_query(cells))
+
+
+# ============================================================
+# SCHÄTZUNG AUS STICHPROBEN
+# ============================================================
+
+# Gewicht einer Stichprobenzeile (1 / Auswahlwahrscheinlichkeit)
+WEIGHT_COLUMN = "weight"
+
+# z-Wert für 95%-Konfidenzintervalle
+CONFIDENCE_Z: float = 1.96
+
+# Quoten der Panels: Ergebnisspalte → (Zähler, Nachkommastellen, Prozent)
+ESTIMATED_RATIOS: dict[str, tuple[str, int, bool]] = {
+    "avg_delay": ("sum_delay", 2, False),
+    "puenktlich_pct": ("n_puenktlich", 1, True),
+    "verspaetet_pct": ("n_verspaetet", 2, True),
+    "canceled_pct": ("n_canceled", 2, True),
+}
+
+# Suffix der Spalte mit der halben Breite des Konfidenzintervalls
+CI_SUFFIX = "_ci"
+
+
+def build_estimate_query(cells: str) -> str:
+    """
+    Schätzt die Panels aus einer gewichteten Stichprobe von Zellen.
+
+    `cells` hat die Spalten von `stop_event_measures()` plus WEIGHT_COLUMN.
+    Summen werden hochgerechnet (Horvitz-Thompson), Mittelwerte und Quoten
+    als Verhältnisschätzer. Zu jeder Kennzahl gibt `<spalte>_ci` die halbe
+    Breite des 95%-Konfidenzintervalls an (Varianz per Linearisierung,
+    Faktor w·(w-1) für Ziehen ohne Zurücklegen; bei w = 1 exakt 0).
+    """
+    w = f"CAST({WEIGHT_COLUMN} AS DOUBLE)"
+    v = f"{w} * ({w} - 1)"
+    sums = [
+        f"SUM({w} * n_rows) as n_rows",
+        f"SUM({w} * fahrten) as w_x",
+        f"SUM({v} * fahrten * fahrten) as v_xx",
+    ]
+    for numerator, _, _ in ESTIMATED_RATIOS.values():
+        sums += [
+            f"SUM({w} * {numerator}) as w_{numerator}",
+            f"SUM({v} * fahrten * {numerator}) as v_x_{numerator}",
+            f"SUM({v} * CAST({numerator} AS DOUBLE) * {numerator}) as v_{numerator}_{numerator}",
+        ]
+    sums += ["MIN(min_time) as start_datum", "MAX(max_time) as end_datum"]
+
+    columns = [
+        "CAST(ROUND(n_rows) AS BIGINT) as n_rows",
+        "CAST(ROUND(w_x) AS BIGINT) as fahrten",
+        f"CAST(ROUND({CONFIDENCE_Z} * SQRT(v_xx)) AS BIGINT) as fahrten{CI_SUFFIX}",
+    ]
+    for column, (numerator, decimals, percent) in ESTIMATED_RATIOS.items():
+        factor = " * 100.0" if percent else ""
+        ratio = f"(w_{numerator} / NULLIF(w_x, 0))"
+        variance = (
+            f"GREATEST(v_{numerator}_{numerator} - 2 * {ratio} * v_x_{numerator} "
+            f"+ {ratio} * {ratio} * v_xx, 0)"
+        )
+        columns += [
+            f"ROUND({ratio}{factor}, {decimals}) as {column}",
+            f"ROUND({CONFIDENCE_Z} * SQRT({variance}) / NULLIF(w_x, 0){factor}, {decimals}) "
+            f"as {column}{CI_SUFFIX}",
+        ]
+
+    return f"""
+    SELECT
+        panel, zeitfenster, tag_nummer, train_type,
+        {", ".join(columns)},
+        start_datum, end_datum
+    FROM ({_grouping_sets_query(cells, ", ".join(sums))})
+    """
+
+
+def compute_estimates(cells: str) -> pa.Table:
+    """Geschätzte Panels (mit Konfidenzintervallen) aus einer Stichprobe."""
+    return execute_query_arrow(build_estimate_query(cells))
+
+
+# ============================================================
+# PANELS AUSSCHNEIDEN
+# ============================================================
+
+def _panel(panels: pa.Table, name: str) -> pa.Table:
+    """Gibt die Zeilen eines Grouping Sets zurück."""
+    return panels.filter(pc.equal(panels["panel"], name))
+
+
+def _with_weekday_names(table: pa.Table, names: dict[int, str]) -> pa.Table:
+    """Hängt die Spalte `wochentag` (Name zur `tag_nummer`) an."""
+    days = table["tag_nummer"].to_pylist()
+    return table.append_column("wochentag", pa.array([names[day] for day in days], pa.string()))
+
+
+def _with_ci(table: pa.Table, columns: list[str]) -> list[str]:
+    """Spaltenliste inkl. der Konfidenzintervalle (nur bei geschätzten Panels)."""
+    result = []
+    for column in columns:
+        result.append(column)
+        if column + CI_SUFFIX in table.column_names:
+            result.append(column + CI_SUFFIX)
+    return result
+
+
+def row_count_from_panels(panels: pa.Table) -> int:
+    """Anzahl aller Zeilen der Datei (inkl. fehlender Verspätung)."""
+    gesamt = _panel(panels, PANEL_GESAMT)
+    return int(gesamt["n_rows"][0].as_py()) if gesamt.num_rows else 0
+
+
+def kpis_from_panels(panels: pa.Table) -> dict[str, int | float | str]:
+    """Haupt-KPIs aus dem Gesamt-Set."""
+    gesamt = _panel(panels, PANEL_GESAMT)
+
+    if not gesamt.num_rows or not gesamt["fahrten"][0].as_py():
+        return {
+            "total_fahrten": 0,
+            "avg_delay": 0.0,
+            "puenktlich_pct": 0.0,
+            "canceled_pct": 0.0,
+            "start_datum": "N/A",
+            "end_datum": "N/A",
+        }
+
+    row = gesamt.slice(0, 1).to_pylist()[0]
+    kpis = {
+        "total_fahrten": row["fahrten"],
+        "avg_delay": row["avg_delay"] or 0.0,
+        "puenktlich_pct": row["puenktlich_pct"] or 0.0,
+        "canceled_pct": row["canceled_pct"] or 0.0,
+        "start_datum": row["start_datum"],
+        "end_datum": row["end_datum"],
+    }
+    # Geschätzte Panels: Konfidenzintervalle als "<kpi>_ci"
+    for kpi, column in (
+        ("total_fahrten", "fahrten"),
+        ("avg_delay", "avg_delay"),
+        ("puenktlich_pct", "puenktlich_pct"),
+        ("canceled_pct", "canceled_pct"),
+    ):
+        if column + CI_SUFFIX in row:
+            kpis[kpi + CI_SUFFIX] = row[column + CI_SUFFIX] or 0.0
+    return kpis
+
+
+def rush_hour_from_panels(panels: pa.Table) -> pa.Table:
+    """Rush Hour vs. normale Zeiten, sortiert nach Verspätung."""
+    table = _panel(panels, PANEL_ZEITFENSTER)
+    table = table.filter(pc.greater(table["fahrten"], 0))
+    table = table.select(_with_ci(table, ["zeitfenster", "fahrten", "avg_delay", "verspaetet_pct", "canceled_pct"]))
+    return table.sort_by([("avg_delay", "descending")])
+
+
+def weekday_from_panels(panels: pa.Table) -> pa.Table:
+    """Verspätungen nach Wochentag (Sonntag zuerst)."""
+    table = _panel(panels, PANEL_WOCHENTAG)
+    table = table.filter(pc.and_(pc.greater(table["fahrten"], 0), pc.is_valid(table["tag_nummer"])))
+    table = _with_weekday_names(table, WOCHENTAGE)
+    table = table.select(_with_ci(table, ["wochentag", "tag_nummer", "fahrten", "avg_delay", "canceled_pct"]))
+    return table.sort_by("tag_nummer")
+
+
+def train_types_from_panels(panels: pa.Table) -> list[str]:
+    """Alle Zugtypen, die in den Daten vorkommen."""
+    table = _panel(panels, PANEL_ZUGTYP)
+    return sorted(pc.drop_null(table["train_type"]).to_pylist())
+
+
+def _filter_train_types(table: pa.Table, train_types: tuple[str, ...]) -> pa.Table:
+    """Nur die ausgewählten Zugtypen mit mindestens einer Fahrt."""
+    selected = pc.is_in(table["train_type"], value_set=pa.array(list(train_types), pa.string()))
+    return table.filter(pc.and_(selected, pc.greater(table["fahrten"], 0)))
+
+
+def train_type_stats_from_panels(panels: pa.Table, selected_types: tuple[str, ...]) -> pa.Table:
+    """Performance der ausgewählten Zugtypen."""
+    if not selected_types:
+        return pa.table({})
+
+    table = _filter_train_types(_panel(panels, PANEL_ZUGTYP), selected_types)
+    table = table.select(["train_type", "fahrten", "avg_delay", "puenktlich_pct", "canceled_pct"])
+    return table.sort_by([("avg_delay", "descending")])
+
+
+def train_weekday_from_panels(panels: pa.Table, train_types: tuple[str, ...]) -> pa.Table:
+    """Durchschnittliche Verspätung pro Zugtyp pro Wochentag."""
+    if not train_types:
+        return pa.table({})
+
+    table = _filter_train_types(_panel(panels, PANEL_ZUGTYP_WOCHENTAG), train_types)
+    table = table.filter(pc.is_valid(table["tag_nummer"]))
+    table = _with_weekday_names(table, WOCHENTAGE_KURZ)
+    table = table.select(["train_type", "wochentag", "tag_nummer", "fahrten", "avg_delay"])
+    return table.sort_by([("train_type", "ascending"), ("tag_nummer", "ascending")])
@@ -0,0 +1,157 @@
+"""
+============================================================
+    PREFETCH BENACHBARTER MONATE
+    Lädt und berechnet den Vor- und Folgemonat im Hintergrund
+============================================================
+
+Nach einem Monat wird fast immer der Monat davor oder danach gewählt.
+Der MonthPrefetcher lädt diese Monate in Hintergrund-Threads herunter
+und berechnet ihre Panels vor, während der Nutzer die aktuelle Seite
+liest. Die Anzahl gleichzeitiger Jobs ist begrenzt; Jobs für Monate,
+die nach einem Wechsel nicht mehr benachbart sind, werden abgebrochen.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Sequence
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+# Gleichzeitige Prefetch-Jobs (Downloads + Rollup-Builds)
+PREFETCH_WORKERS = int(os.environ.get("DB_PREFETCH_WORKERS", "1"))
+
+# Wie viele Monate vor und nach der Auswahl vorgeladen werden
+PREFETCH_NEIGHBOURS = int(os.environ.get("DB_PREFETCH_NEIGHBOURS", "1"))
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchCancelled(Exception):
+    """Der Job wurde abgebrochen, weil der Monat nicht mehr gebraucht wird."""
+
+
+def neighbour_months(
+    selected: Sequence[str],
+    available: Sequence[str],
+    count: int = PREFETCH_NEIGHBOURS,
+) -> list[str]:
+    """Monate direkt vor und nach der Auswahl (nächste zuerst)."""
+    if not selected:
+        return []
+
+    months = sorted(available)
+    first = months.index(min(selected)) if min(selected) in months else None
+    last = months.index(max(selected)) if max(selected) in months else None
+    if first is None or last is None:
+        return []
+
+    neighbours = []
+    for offset in range(1, count + 1):
+        if last + offset < len(months):
+            neighbours.append(months[last + offset])
+        if first - offset >= 0:
+            neighbours.append(months[first - offset])
+    return [m for m in neighbours if m not in selected]
+
+
+# ============================================================
+# PREFETCHER
+# ============================================================
+
+class MonthPrefetcher:
+    """
+    Plant Prefetch-Jobs für Nachbarmonate.
+
+    `fetch(month, keep)` liefert den lokalen Pfad eines Monats (lädt ihn
+    bei Bedarf), `warm(path)` berechnet die Panels vor. `is_ready(month)`
+    meldet, ob ein früher vorgeladener Monat noch lokal liegt.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str, tuple[str, ...]], str],
+        warm: Callable[[str], object],
+        is_ready: Callable[[str], bool] = lambda month: True,
+        max_workers: int = PREFETCH_WORKERS,
+    ):
+        self._fetch = fetch
+        self._warm = warm
+        self._is_ready = is_ready
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        self._jobs: dict[str, tuple[Future, threading.Event]] = {}
+        self._done: set[str] = set()
+
+    def schedule(self, selected: Sequence[str], available: Sequence[str]) -> list[str]:
+        """
+        Plant Jobs für die Nachbarn der aktuellen Auswahl.
+
+        Laufende oder wartende Jobs für andere Monate werden abgebrochen.
+        Gibt die Monate zurück, für die (noch) ein Job existiert.
+        """
+        wanted = neighbour_months(selected, available)
+        keep = tuple(selected)
+
+        with self._lock:
+            for month, (future, cancel) in list(self._jobs.items()):
+                if future.done():
+                    del self._jobs[month]
+                elif month not in wanted:
+                    cancel.set()
+                    future.cancel()
+                    del self._jobs[month]
+
+            for month in wanted:
+                if month in self._jobs:
+                    continue
+                if month in self._done and self._is_ready(month):
+                    continue
+                self._done.discard(month)
+                cancel = threading.Event()
+                future = self._executor.submit(self._run, month, keep, cancel)
+                self._jobs[month] = (future, cancel)
+
+            return sorted(self._jobs)
+
+    def _run(self, month: str, keep: tuple[str, ...], cancel: threading.Event) -> None:
+        """Lädt einen Monat und berechnet seine Panels (bricht zwischen den Schritten ab)."""
+        try:
+            if cancel.is_set():
+                raise PrefetchCancelled(month)
+            path = self._fetch(month, keep)
+
+            if cancel.is_set():
+                raise PrefetchCancelled(month)
+            self._warm(path)
+
+            with self._lock:
+                self._done.add(month)
+            logger.info("Prefetch fertig: %s", month)
+        except PrefetchCancelled:
+            logger.info("Prefetch abgebrochen: %s", month)
+        except Exception:
+            logger.exception("Prefetch fehlgeschlagen: %s", month)
+
+    def status(self) -> dict[str, str]:
+        """Status pro Monat ('fertig', 'läuft', 'wartet') für die Debug-Anzeige."""
+        with self._lock:
+            status = {month: "fertig" for month in self._done}
+            for month, (future, _) in self._jobs.items():
+                if not future.done():
+                    status[month] = "läuft" if future.running() else "wartet"
+            return status
+
+    def shutdown(self) -> None:
+        """Bricht alle Jobs ab und beendet die Worker-Threads."""
+        with self._lock:
+            for future, cancel in self._jobs.values():
+                cancel.set()
+                future.cancel()
+            self._jobs.clear()
+        self._executor.shutdown(wait=False)
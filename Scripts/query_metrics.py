@@ -0,0 +1,204 @@
+"""
+============================================================
+    QUERY-METRIKEN
+    Laufzeit, Cache-Treffer und DuckDB-Profil pro Query-Funktion
+============================================================
+
+`instrumented()` legt sich um die gecachten Query-Funktionen des
+Dashboards. Jeder Aufruf landet als Eintrag im prozessweiten Query-Log:
+Wall Time, Cache Hit/Disk/Miss und – bei einem Miss – die vom DuckDB-Profiler
+gemeldeten gescannten Zeilen, gelesenen Bytes und der Peak-Speicher aller
+Queries, die dabei gelaufen sind. Verschachtelte Aufrufe (z.B. get_kpis →
+get_panels) zählen die Kosten der inneren Funktion mit.
+
+Für jede gemessene SELECT-Query kann `explain_analyze()` das komplette
+EXPLAIN ANALYZE Profil nachträglich erfassen.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable
+
+import db_connection
+from db_connection import execute_query_arrow
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+# Wie viele Aufrufe das Query-Log behält (älteste fliegen raus)
+QUERY_LOG_SIZE = int(os.environ.get("DB_QUERY_LOG_SIZE", "50"))
+
+CACHE_HIT = "Hit"
+CACHE_MISS = "Miss"
+CACHE_DISK_HIT = "Disk"
+
+# Nur lesende Queries dürfen für EXPLAIN ANALYZE erneut laufen (kein COPY)
+EXPLAINABLE_PREFIXES: tuple[str, ...] = ("SELECT", "WITH", "FROM")
+
+
+# ============================================================
+# QUERY-LOG
+# ============================================================
+
+class QueryLog:
+    """Begrenztes, thread-sicheres Log der letzten Aufrufe."""
+
+    def __init__(self, maxlen: int = QUERY_LOG_SIZE):
+        self._records: deque[dict[str, Any]] = deque(maxlen=maxlen)
+        self._last_sql: dict[tuple[str, str], list[str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, record: dict[str, Any]) -> None:
+        """Speichert einen Eintrag; Hits erben die SQL des letzten Misses."""
+        key = (record["funktion"], record["parameter"])
+        with self._lock:
+            if record["sql"]:
+                self._last_sql[key] = record["sql"]
+            else:
+                record["sql"] = self._last_sql.get(key, [])
+            self._records.append(record)
+
+    def records(self) -> list[dict[str, Any]]:
+        """Alle Einträge, neueste zuerst."""
+        with self._lock:
+            return list(reversed(self._records))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+            self._last_sql.clear()
+
+
+_log = QueryLog()
+
+# Offene Messungen des aktuellen Threads (äußerste zuerst)
+_local = threading.local()
+
+
+def get_query_log() -> QueryLog:
+    """Gibt das prozessweite Query-Log zurück."""
+    return _log
+
+
+def _open_records() -> list[dict[str, Any]]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _ProfilingObserver:
+    """Verteilt DuckDB-Metriken auf alle offenen Messungen des Threads."""
+
+    def active(self) -> bool:
+        return bool(_open_records())
+
+    def record(self, query: str, metrics: dict[str, float]) -> None:
+        for record in _open_records():
+            record["queries"] += 1
+            record["rows_scanned"] += int(metrics.get("cumulative_rows_scanned", 0))
+            record["bytes_read"] += int(metrics.get("total_bytes_read", 0))
+            record["peak_memory_mb"] = max(
+                record["peak_memory_mb"],
+                round(metrics.get("system_peak_buffer_memory", 0) / 1024 ** 2, 1),
+            )
+            record["sql"].append(query)
+
+
+db_connection.set_query_observer(_ProfilingObserver())
+
+
+# ============================================================
+# INSTRUMENTIERUNG
+# ============================================================
+
+def _describe(value: Any) -> str:
+    """Kurze Darstellung eines Arguments (Dateipfade nur mit Dateinamen)."""
+    if isinstance(value, (tuple, list)):
+        return "(" + ", ".join(_describe(item) for item in value) + ")"
+    if isinstance(value, str) and os.sep in value:
+        return os.path.basename(value)
+    return repr(value)
+
+
+def mark_disk_hit() -> None:
+    """Markiert den laufenden Aufruf als Treffer im Disk-Cache (siehe result_cache)."""
+    stack = _open_records()
+    if stack:
+        stack[-1]["cache"] = CACHE_DISK_HIT
+
+
+def instrumented(cache: Callable[[Callable], Callable]) -> Callable[[Callable], Callable]:
+    """
+    Decorator-Fabrik: cacht eine Funktion mit `cache` und misst jeden Aufruf.
+
+        @query_metrics.instrumented(shared_cache(max_entries=CACHE_MAX_ENTRIES))
+        def get_kpis(data_paths): ...
+
+    Ein Miss liegt vor, wenn der Funktionskörper hinter dem Cache läuft.
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def body(*args: Any, **kwargs: Any) -> Any:
+            _open_records()[-1]["cache"] = CACHE_MISS
+            return func(*args, **kwargs)
+
+        cached = cache(body)
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            record: dict[str, Any] = {
+                "zeit": time.strftime("%H:%M:%S"),
+                "funktion": func.__name__,
+                "parameter": ", ".join(
+                    [_describe(arg) for arg in args]
+                    + [f"{name}={_describe(value)}" for name, value in kwargs.items()]
+                ),
+                "cache": CACHE_HIT,
+                "wall_ms": 0.0,
+                "queries": 0,
+                "rows_scanned": 0,
+                "bytes_read": 0,
+                "peak_memory_mb": 0.0,
+                "thread": threading.current_thread().name,
+                "sql": [],
+            }
+            stack = _open_records()
+            stack.append(record)
+            start = time.perf_counter()
+            try:
+                return cached(*args, **kwargs)
+            finally:
+                record["wall_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                stack.pop()
+                _log.add(record)
+
+        # Cache leeren wie bei der undekorierten Funktion: get_kpis.clear()
+        if hasattr(cached, "clear"):
+            wrapper.clear = cached.clear
+        return wrapper
+
+    return decorator
+
+
+# ============================================================
+# EXPLAIN ANALYZE
+# ============================================================
+
+def is_explainable(query: str) -> bool:
+    """True für lesende Queries, die gefahrlos erneut laufen dürfen."""
+    return query.lstrip().upper().startswith(EXPLAINABLE_PREFIXES)
+
+
+def explain_analyze(query: str) -> str:
+    """Führt die Query mit EXPLAIN ANALYZE aus und gibt das Profil als Text zurück."""
+    if not is_explainable(query):
+        raise ValueError("EXPLAIN ANALYZE nur für SELECT-Queries")
+    plan = execute_query_arrow(f"EXPLAIN ANALYZE {query}")
+    return "\n".join(plan.column(plan.num_columns - 1).to_pylist())
@@ -0,0 +1,166 @@
+"""
+============================================================
+    RE-CLUSTERING DER MONATSDATEIEN
+    Dashboard-optimierte Parquet-Kopie pro Monat
+============================================================
+
+Die Monatsdateien von HuggingFace sind weder nach unseren Filtern sortiert
+noch in passende Row Groups geschnitten. Dieser Schritt schreibt pro Monat
+eine Kopie, die
+
+- nach (train_type, time) sortiert ist,
+- in Row Groups von ROW_GROUP_SIZE Zeilen geschnitten ist,
+- mit ZSTD und Dictionary-Encoding komprimiert ist,
+- Min/Max-Statistiken für jede Spalte jeder Row Group enthält.
+
+Ein Filter wie `train_type IN ('ICE', 'IC')` oder ein Zeitbereich
+überspringt damit ganze Row Groups anhand der Statistiken, statt jede
+Zeile zu dekodieren. Wie bei den Rollups steckt der Fingerabdruck der
+Quelle im Dateinamen; eine geänderte Quelle wird neu geschrieben.
+
+Reiner CLI-Schritt: ingest.py baut die Kopie nicht. Im Betrieb liest
+warehouse.source_for() zuerst das Warehouse, dessen Tabelle nach demselben
+Schlüssel sortiert ist und Row Groups ebenso überspringt. Die Kopie hilft
+Setups ohne Warehouse und Ad-hoc-Analysen auf Parquet (source_for liest
+sie dann vor der Original-Datei).
+
+PARQUET_VERSION V2 braucht DuckDB >= 1.2 (siehe requirements.txt).
+
+Verwendung:
+    python recluster.py ../Data/deutsche_bahn_data/monthly_processed_data/data-2024-10.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import threading
+import time
+
+from db_connection import execute_query_single, execute_statement
+from panel_engine import parquet_source
+from rollup import source_fingerprint, source_month_stem, source_stem
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+OPTIMIZED_DIR = os.environ.get(
+    "DB_OPTIMIZED_DIR",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "optimized"),
+)
+
+OPTIMIZED_SUFFIX = ".optimized.parquet"
+
+# Sortierschlüssel: Zugtyp zuerst (train_type-Filter), dann Zeit (Zeitbereiche)
+CLUSTER_ORDER: tuple[str, ...] = ("train_type", "time")
+
+# ~100k Zeilen pro Row Group: fein genug, dass kleine Zugtypen (ICE, IC)
+# nur wenige Gruppen belegen, groß genug für effiziente Scans
+ROW_GROUP_SIZE = int(os.environ.get("DB_ROW_GROUP_SIZE", "100000"))
+
+# Parquet-Writer: ZSTD, Dictionary nur für Spalten mit bis zu 10k Werten pro
+# Row Group (Bahnhöfe, Zugnamen; nicht für IDs),
+# V2-Datenseiten (Delta-Encoding für Zeitstempel und Integer)
+PARQUET_OPTIONS: dict[str, str] = {
+    "COMPRESSION": "zstd",
+    "DICTIONARY_SIZE_LIMIT": "10000",
+    "PARQUET_VERSION": "V2",
+}
+
+
+# ============================================================
+# PFADE
+# ============================================================
+
+def optimized_path_for(data_path: str, optimized_dir: str = OPTIMIZED_DIR) -> str:
+    """Pfad der optimierten Kopie, die zum aktuellen Stand der Quelldatei gehört."""
+    name = f"{source_stem(data_path)}.{source_fingerprint(data_path)}{OPTIMIZED_SUFFIX}"
+    return os.path.join(optimized_dir, name)
+
+
+def is_optimized(data_path: str, optimized_dir: str = OPTIMIZED_DIR) -> bool:
+    """True, wenn eine aktuelle optimierte Kopie existiert."""
+    return os.path.exists(optimized_path_for(data_path, optimized_dir))
+
+
+# ============================================================
+# REWRITE
+# ============================================================
+
+def rewrite_month(
+    data_path: str,
+    optimized_dir: str = OPTIMIZED_DIR,
+    row_group_size: int = ROW_GROUP_SIZE,
+) -> str:
+    """Schreibt die sortierte, neu geschnittene Kopie einer Monatsdatei."""
+    os.makedirs(optimized_dir, exist_ok=True)
+    target = optimized_path_for(data_path, optimized_dir)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    options = ", ".join(
+        ["FORMAT parquet", f"ROW_GROUP_SIZE {row_group_size}"]
+        + [f"{key} {value}" for key, value in PARQUET_OPTIONS.items()]
+    )
+    execute_statement(
+        f"COPY (SELECT * FROM {parquet_source(data_path)} ORDER BY {', '.join(CLUSTER_ORDER)}) "
+        f"TO '{tmp_path}' ({options})"
+    )
+    os.replace(tmp_path, target)
+
+    for old in glob.glob(os.path.join(optimized_dir, f"{source_month_stem(data_path)}.*{OPTIMIZED_SUFFIX}")):
+        if old != target:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    return target
+
+
+def row_groups_for(path: str, train_type: str) -> tuple[int, int]:
+    """(Row Groups, die train_type enthalten können; Row Groups gesamt) laut Statistik."""
+    row = execute_query_single(
+        "SELECT "
+        "COUNT(DISTINCT row_group_id) FILTER (WHERE stats_min_value <= ? AND stats_max_value >= ?), "
+        "COUNT(DISTINCT row_group_id) "
+        "FROM parquet_metadata(?) WHERE path_in_schema = 'train_type'",
+        [train_type, train_type, path],
+    )
+    return row[0], row[1]
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Schreibt dashboard-optimierte Kopien der Monatsdateien.")
+    parser.add_argument("files", nargs="+", help="Monatsdateien (data-YYYY-MM.parquet)")
+    parser.add_argument("--out", default=OPTIMIZED_DIR, help="Zielordner für die optimierten Kopien")
+    parser.add_argument("--row-group-size", type=int, default=ROW_GROUP_SIZE, help="Zeilen pro Row Group")
+    parser.add_argument("--force", action="store_true", help="Auch aktuelle Kopien neu schreiben")
+    args = parser.parse_args()
+
+    for data_path in args.files:
+        if is_optimized(data_path, args.out) and not args.force:
+            print(f"⏭️  {os.path.basename(data_path)} ist aktuell")
+            continue
+
+        start = time.time()
+        target = rewrite_month(data_path, args.out, args.row_group_size)
+        source_mb = os.path.getsize(data_path) / (1024 * 1024)
+        target_mb = os.path.getsize(target) / (1024 * 1024)
+        ice_groups, total_groups = row_groups_for(target, "ICE")
+        print(
+            f"✅ {os.path.basename(data_path)} → {target} "
+            f"({source_mb:.1f} MB → {target_mb:.1f} MB, {time.time() - start:.1f} s)"
+        )
+        print(f"   ICE-Filter liest {ice_groups} von {total_groups} Row Groups")
+
+
+if __name__ == "__main__":
+    main()
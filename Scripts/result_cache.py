@@ -0,0 +1,318 @@
+"""
+============================================================
+    ERGEBNIS-CACHE AUF DER PLATTE
+    Geteilt von allen Workern, überlebt Neustarts
+============================================================
+
+`st.cache_data` hält Ergebnisse im Speicher eines einzelnen Prozesses.
+Nach jedem Redeploy oder in einem weiteren Worker wären get_kpis & Co.
+wieder kalt. Dieser Cache legt die Ergebnisse zusätzlich als Dateien ab:
+
+- Arrow-Tabellen als Arrow IPC (`.arrow`, beim Lesen memory-mapped),
+  alle anderen Werte (KPI-Dicts, Listen) als Pickle (`.pkl`).
+- Schlüssel: Funktion (Modul, Name, Quelltext), Stand des Codes (Hash
+  aller Scripts/*.py) und Parameter; Dateipfade gehen über den SHA-256
+  ihres Inhalts ein. Ein anderer Mirror-Ordner oder Worker findet so
+  dieselben Einträge, eine geänderte Datei oder ein Deploy mit anderem
+  Code nie einen alten.
+- Größenbudget mit LRU-Eviction über die mtime (bei jedem Treffer
+  aktualisiert). Schreiben über Temp-Datei + rename, daher ohne Locks
+  zwischen Prozessen nutzbar.
+
+Konfiguration über Umgebungsvariablen:
+    DB_RESULT_CACHE_DIR     Ordner des Caches (Standard: Data/deutsche_bahn_data/results)
+    DB_RESULT_CACHE_MAX_MB  Speicherbudget in MB (Standard: 1024)
+
+Verwendung:
+    python result_cache.py status
+    python result_cache.py clear
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import glob
+import hashlib
+import inspect
+import os
+import pickle
+import tempfile
+import threading
+import time
+from typing import Any, Callable
+
+import pyarrow as pa
+
+import data_mirror
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+RESULT_CACHE_DIR = os.environ.get(
+    "DB_RESULT_CACHE_DIR",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "results"),
+)
+RESULT_CACHE_MAX_BYTES = int(float(os.environ.get("DB_RESULT_CACHE_MAX_MB", "1024")) * 1024 ** 2)
+
+
+def code_version(script_dir: str = SCRIPT_DIR) -> str:
+    """Hash über alle Scripts/*.py (Name und Inhalt)."""
+    digest = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(script_dir, "*.py"))):
+        digest.update(os.path.basename(path).encode() + b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+# Stand der Berechnung hinter den gecachten Funktionen (panel_engine, rollup,
+# approximate, ...): jede Änderung am Code ergibt nach dem Deploy neue Schlüssel
+RESULT_CACHE_VERSION = code_version()
+
+ARROW_SUFFIX = ".arrow"
+PICKLE_SUFFIX = ".pkl"
+
+
+# ============================================================
+# SCHLÜSSEL
+# ============================================================
+
+# (Pfad, Größe, mtime) → SHA-256, damit jede Datei pro Prozess nur einmal gehasht wird
+_content_hashes: dict[tuple[str, int, int], str] = {}
+_hash_lock = threading.Lock()
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 des Dateiinhalts (aus dem Mirror-Manifest, sonst berechnet)."""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        cached = _content_hashes.get(memo_key)
+    if cached is not None:
+        return cached
+
+    digest = data_mirror.get_mirror().checksum_for(path) or data_mirror.file_sha256(path)
+    with _hash_lock:
+        _content_hashes[memo_key] = digest
+    return digest
+
+
+def _key_part(value: Any) -> str:
+    """Stabile Darstellung eines Arguments (Dateien über ihren Inhalt)."""
+    if isinstance(value, (tuple, list)):
+        return "(" + ",".join(_key_part(item) for item in value) + ")"
+    if isinstance(value, str) and os.path.isfile(value):
+        return f"file:{content_hash(value)}"
+    return repr(value)
+
+
+def _function_id(func: Callable) -> str:
+    """Modul, Name und Quelltext-Hash einer Funktion."""
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        source = ""
+    source_hash = hashlib.sha1(source.encode()).hexdigest()[:12]
+    return f"{func.__module__}.{func.__qualname__}:{source_hash}"
+
+
+def cache_key(func: Callable, args: tuple, kwargs: dict[str, Any]) -> str:
+    """Dateiname (ohne Endung) für einen Aufruf."""
+    parts = [RESULT_CACHE_VERSION, _function_id(func)]
+    parts += [_key_part(arg) for arg in args]
+    parts += [f"{name}={_key_part(value)}" for name, value in sorted(kwargs.items())]
+    digest = hashlib.sha256("\x1f".join(parts).encode()).hexdigest()[:32]
+    return f"{func.__name__}-{digest}"
+
+
+# ============================================================
+# CACHE
+# ============================================================
+
+class ResultCache:
+    """Größenbegrenzter Ergebnis-Cache in einem Ordner, LRU über die mtime."""
+
+    def __init__(self, cache_dir: str = RESULT_CACHE_DIR, max_bytes: int = RESULT_CACHE_MAX_BYTES):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_files(self) -> list[os.DirEntry]:
+        """Alle fertigen Einträge (ohne Temp-Dateien)."""
+        with os.scandir(self.cache_dir) as entries:
+            return [
+                entry for entry in entries
+                if entry.is_file() and entry.name.endswith((ARROW_SUFFIX, PICKLE_SUFFIX))
+            ]
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        """(gefunden, Wert); ein Treffer zählt als Zugriff für die LRU-Reihenfolge."""
+        for suffix in (ARROW_SUFFIX, PICKLE_SUFFIX):
+            path = os.path.join(self.cache_dir, key + suffix)
+            try:
+                if suffix == ARROW_SUFFIX:
+                    with pa.memory_map(path) as source:
+                        value = pa.ipc.open_file(source).read_all()
+                else:
+                    with open(path, "rb") as f:
+                        value = pickle.load(f)
+                os.utime(path)
+                return True, value
+            except FileNotFoundError:
+                continue
+            except (OSError, pa.ArrowInvalid, pickle.UnpicklingError, EOFError):
+                # Kaputter Eintrag (z.B. Platte voll beim Schreiben): neu berechnen
+                self._remove(path)
+        return False, None
+
+    def put(self, key: str, value: Any) -> None:
+        """Speichert einen Wert atomar und hält danach das Budget ein."""
+        is_table = isinstance(value, pa.Table)
+        target = os.path.join(self.cache_dir, key + (ARROW_SUFFIX if is_table else PICKLE_SUFFIX))
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if is_table:
+                    with pa.ipc.new_file(f, value.schema) as writer:
+                        writer.write_table(value)
+                else:
+                    pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, target)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict(protected={target})
+
+    def evict(self, protected: set[str] = frozenset()) -> list[str]:
+        """Entfernt die am längsten nicht genutzten Einträge, bis das Budget passt."""
+        entries = []
+        for entry in self._entry_files():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        evicted = []
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path in protected:
+                continue
+            self._remove(path)
+            total -= size
+            evicted.append(os.path.basename(path))
+        return evicted
+
+    def _remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def total_bytes(self) -> int:
+        total = 0
+        for entry in self._entry_files():
+            try:
+                total += entry.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def entries(self) -> list[tuple[str, int, float]]:
+        """(Name, Größe, letzter Zugriff) aller Einträge, neueste zuerst."""
+        result = []
+        for entry in self._entry_files():
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            result.append((entry.name, stat.st_size, stat.st_mtime))
+        return sorted(result, key=lambda item: -item[2])
+
+    def clear(self) -> int:
+        """Löscht alle Einträge und gibt ihre Anzahl zurück."""
+        files = self._entry_files()
+        for entry in files:
+            self._remove(entry.path)
+        return len(files)
+
+
+# Prozessweite Instanz
+_cache: ResultCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Gibt den prozessweiten Ergebnis-Cache zurück (wird beim ersten Aufruf angelegt)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
+
+
+def disk_cached(func: Callable | None = None, *, on_hit: Callable[[], None] | None = None) -> Callable:
+    """
+    Decorator: liest Ergebnisse aus dem Disk-Cache und schreibt neue hinein.
+
+    Gedacht unter einem Speicher-Cache (st.cache_data); `on_hit` wird bei
+    einem Treffer auf der Platte aufgerufen (z.B. für das Query-Log).
+    Fehler beim Schreiben (Platte voll, keine Rechte) brechen den Aufruf
+    nicht ab, das Ergebnis wird dann nur nicht geteilt.
+    """
+    def decorator(inner: Callable) -> Callable:
+        @functools.wraps(inner)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            cache = get_result_cache()
+            key = cache_key(inner, args, kwargs)
+            found, value = cache.get(key)
+            if found:
+                if on_hit is not None:
+                    on_hit()
+                return value
+
+            value = inner(*args, **kwargs)
+            try:
+                cache.put(key, value)
+            except (OSError, pickle.PicklingError, pa.ArrowException):
+                pass
+            return value
+
+        return wrapper
+
+    return decorator(func) if func is not None else decorator
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Verwaltet den Ergebnis-Cache auf der Platte.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Zeigt Inhalt und Belegung des Caches")
+    sub.add_parser("clear", help="Löscht alle Einträge")
+    args = parser.parse_args()
+
+    cache = get_result_cache()
+
+    if args.command == "clear":
+        print(f"🗑️  {cache.clear()} Einträge gelöscht")
+        return
+
+    entries = cache.entries()
+    print(f"📁 Ergebnis-Cache: {cache.cache_dir}")
+    print(f"💾 Belegt: {cache.total_bytes() / 1024 ** 2:.1f} / {cache.max_bytes / 1024 ** 2:.0f} MB ({len(entries)} Einträge)")
+    for name, size, last_used in entries:
+        used = time.strftime("%Y-%m-%d %H:%M", time.localtime(last_used))
+        print(f"   {name:<50} {size / 1024:>8.1f} KB  zuletzt genutzt {used}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+============================================================
+    RIDE-DEDUPLIZIERUNG ÜBER MONATE
+    Neueste Zeile pro train_line_ride_id, out-of-core
+============================================================
+
+Problem 5 in data_cleaning.py entfernt Duplikate nur innerhalb eines
+Monats und braucht dafür den ganzen Monat im Speicher. Dieselbe Ride ID
+kann aber an der Monatsgrenze in zwei Dateien stehen. Diese Deduplizierung
+läuft über beliebig viele Monate gemeinsam und hält nie alle Zeilen im
+Speicher:
+
+1. Partitionieren: Ride ID, time, Monat und Zeilennummer aller Dateien
+   werden nach hash(train_line_ride_id) auf Partitionen verteilt und auf
+   die Platte geschrieben (dieselbe ID landet immer in derselben Partition).
+2. Gewinner: pro Partition (passt ins Speicherbudget) die Zeile mit dem
+   spätesten time pro Ride ID (arg_max).
+3. Schreiben: pro Monat werden seine Gewinner zu einer Keep-Maske (1 Byte
+   pro Zeile), dann wird der Monat Batch für Batch gefiltert geschrieben,
+   in der ursprünglichen Reihenfolge und mit unverändertem Schema.
+
+Gleiche Semantik wie keep_latest(): fehlende IDs bilden eine Gruppe,
+fehlende Zeiten zählen als älteste, bei Gleichstand gewinnt die erste
+Zeile (früherer Monat in der übergebenen Reihenfolge, dann Zeilennummer).
+
+Verwendung:
+    python ride_dedup.py "../Data/deutsche_bahn_data/monthly_processed_data/data-2024-*-CLEANED.parquet" --out ../Data/deutsche_bahn_data/dedup
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import math
+import os
+import shutil
+import tempfile
+import time
+from typing import Sequence
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+# Speicherlimit für DuckDB (Partitionen und Joins lagern darüber auf die Platte aus)
+DEDUP_MEMORY_MB = int(os.environ.get("DB_DEDUP_MEMORY_MB", os.environ.get("DB_CLEANING_MEMORY_MB", "1024")))
+
+# Geschätzter Speicher pro Zeile einer Partition (ID, time, Monat, Zeile, Hash-Tabelle)
+KEY_BYTES_PER_ROW = 96
+
+# Zeilen pro Batch beim Lesen der Gewinner und beim Schreiben der Monate
+DEDUP_BATCH_ROWS = 100_000
+
+RIDE_COLUMN = "train_line_ride_id"
+TIME_COLUMN = "time"
+
+
+# ============================================================
+# SQL
+# ============================================================
+
+def _sql_string(value: str) -> str:
+    """SQL-String-Literal (einfache Anführungszeichen verdoppelt)."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _month_source(data_path: str) -> str:
+    return f"read_parquet({_sql_string(data_path)}, file_row_number = true)"
+
+
+def partition_count(total_rows: int, memory_mb: int = DEDUP_MEMORY_MB) -> int:
+    """Anzahl Partitionen, so dass eine Partition in die Hälfte des Budgets passt."""
+    budget = memory_mb * 1024 * 1024 / 2
+    return max(1, math.ceil(total_rows * KEY_BYTES_PER_ROW / budget))
+
+
+def build_partition_query(data_paths: Sequence[str], partitions: int) -> str:
+    """Schlüssel aller Monate mit ihrer Hash-Partition."""
+    parts = [
+        f"SELECT {index} AS month_index, file_row_number, {RIDE_COLUMN}, {TIME_COLUMN} "
+        f"FROM {_month_source(path)}"
+        for index, path in enumerate(data_paths)
+    ]
+    return f"""
+    SELECT hash({RIDE_COLUMN}) % {partitions} AS part, *
+    FROM ({" UNION ALL ".join(parts)})
+    """
+
+
+def build_winners_query(partition_glob: str) -> str:
+    """
+    Gewinner einer Partition: (month_index, file_row_number) pro Ride ID.
+
+    Der Schlüssel enthält kein NULL, damit der Vergleich nicht von der
+    NULL-Sortierung abhängt; kleinere Monate und Zeilennummern gewinnen
+    bei Gleichstand.
+    """
+    return f"""
+    SELECT winner.month_index, winner.file_row_number
+    FROM (
+        SELECT arg_max(
+            {{'month_index': month_index, 'file_row_number': file_row_number}},
+            {{
+                'has_time': {TIME_COLUMN} IS NOT NULL,
+                'time': COALESCE(epoch_ns({TIME_COLUMN}), 0),
+                'first_month': -month_index,
+                'first_row': -file_row_number
+            }}
+        ) AS winner
+        FROM read_parquet({_sql_string(partition_glob)})
+        GROUP BY {RIDE_COLUMN}
+    )
+    """
+
+
+def keep_mask(
+    con: duckdb.DuckDBPyConnection,
+    winner_paths: Sequence[str],
+    month_index: int,
+    num_rows: int,
+) -> np.ndarray:
+    """Keep-Maske eines Monats aus den Gewinnern aller Partitionen."""
+    keep = np.zeros(num_rows, dtype=bool)
+    if not winner_paths:
+        return keep
+
+    sources = ", ".join(_sql_string(path) for path in winner_paths)
+    result = con.execute(
+        f"SELECT file_row_number FROM read_parquet([{sources}]) WHERE month_index = {month_index}"
+    )
+    if hasattr(result, "to_arrow_reader"):
+        reader = result.to_arrow_reader(DEDUP_BATCH_ROWS)
+    else:
+        reader = result.fetch_record_batch(DEDUP_BATCH_ROWS)
+    for batch in reader:
+        keep[batch.column(0).to_numpy()] = True
+    return keep
+
+
+def write_kept_rows(data_path: str, keep: np.ndarray, output_path: str) -> int:
+    """Schreibt die Zeilen mit keep=True Batch für Batch; gibt ihre Anzahl zurück."""
+    parquet_file = pq.ParquetFile(data_path)
+    offset = 0
+    with pq.ParquetWriter(output_path, parquet_file.schema_arrow, compression="snappy") as writer:
+        for batch in parquet_file.iter_batches(batch_size=DEDUP_BATCH_ROWS):
+            mask = keep[offset:offset + batch.num_rows]
+            offset += batch.num_rows
+            writer.write_batch(batch.filter(pa.array(mask)))
+    return int(keep.sum())
+
+
+# ============================================================
+# DEDUPLIZIERUNG
+# ============================================================
+
+def dedup_months(
+    data_paths: Sequence[str],
+    out_dir: str,
+    memory_mb: int = DEDUP_MEMORY_MB,
+    partitions: int | None = None,
+) -> dict[str, dict[str, int]]:
+    """
+    Behält über alle Monate nur die neueste Zeile pro Ride ID.
+
+    Schreibt pro Monat eine Datei gleichen Namens nach `out_dir` (atomar,
+    `out_dir` darf der Quellordner sein) und gibt pro Ausgabedatei die
+    Zeilen vorher/nachher zurück.
+    """
+    data_paths = list(data_paths)
+    names = [os.path.basename(path) for path in data_paths]
+    if len(set(names)) != len(names):
+        raise ValueError("Dateinamen müssen eindeutig sein (ein Ordner für alle Ausgaben)")
+
+    os.makedirs(out_dir, exist_ok=True)
+    work_dir = tempfile.mkdtemp(prefix="ride-dedup-", dir=out_dir)
+    keys_dir = os.path.join(work_dir, "keys")
+    winners_dir = os.path.join(work_dir, "winners")
+    os.makedirs(winners_dir)
+
+    con = duckdb.connect(config={
+        "threads": os.environ.get("DB_THREADS", str(os.cpu_count() or 1)),
+        "memory_limit": f"{memory_mb}MB",
+        "temp_directory": os.path.join(work_dir, "spill"),
+        # Reihenfolge kommt aus dem ORDER BY, sonst muss DuckDB sie nirgends halten
+        "preserve_insertion_order": False,
+    })
+    results = {}
+    try:
+        row_counts = [
+            con.execute(f"SELECT COUNT(*) FROM {_month_source(path)}").fetchone()[0]
+            for path in data_paths
+        ]
+        if partitions is None:
+            partitions = partition_count(sum(row_counts), memory_mb)
+
+        # 1. Schlüssel nach Hash der Ride ID auf die Platte verteilen
+        con.execute(
+            f"COPY ({build_partition_query(data_paths, partitions)}) TO {_sql_string(keys_dir)} "
+            f"(FORMAT parquet, PARTITION_BY (part))"
+        )
+
+        # 2. Gewinner pro Partition (leere Partitionen gibt es nicht als Ordner)
+        winner_paths = []
+        for part_dir in sorted(glob.glob(os.path.join(keys_dir, "part=*"))):
+            target = os.path.join(winners_dir, os.path.basename(part_dir) + ".parquet")
+            con.execute(
+                f"COPY ({build_winners_query(os.path.join(part_dir, '*.parquet'))}) "
+                f"TO {_sql_string(target)} (FORMAT parquet)"
+            )
+            winner_paths.append(target)
+        shutil.rmtree(keys_dir, ignore_errors=True)
+
+        # 3. Jeden Monat einmal lesen und nur seine Gewinner schreiben
+        for index, (data_path, rows_before) in enumerate(zip(data_paths, row_counts)):
+            target = os.path.join(out_dir, names[index])
+            tmp_path = os.path.join(work_dir, names[index])
+            keep = keep_mask(con, winner_paths, index, rows_before)
+            rows_after = write_kept_rows(data_path, keep, tmp_path)
+            del keep
+            os.replace(tmp_path, target)
+            results[target] = {"rows_before": rows_before, "rows_after": rows_after}
+    finally:
+        con.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return results
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Entfernt Ride-ID-Duplikate über mehrere Monate.")
+    parser.add_argument("files", nargs="+", help="Monatsdateien in zeitlicher Reihenfolge (Glob erlaubt)")
+    parser.add_argument("--out", required=True, help="Zielordner (darf der Quellordner sein)")
+    parser.add_argument("--memory-mb", type=int, default=DEDUP_MEMORY_MB, help="Speicherlimit für DuckDB")
+    parser.add_argument("--partitions", type=int, default=None, help="Anzahl Hash-Partitionen (Standard: aus dem Budget)")
+    args = parser.parse_args()
+
+    data_paths = []
+    for pattern in args.files:
+        data_paths += sorted(glob.glob(pattern)) or [pattern]
+
+    start = time.time()
+    results = dedup_months(data_paths, args.out, args.memory_mb, args.partitions)
+
+    total_before = total_after = 0
+    for target, counts in results.items():
+        removed = counts["rows_before"] - counts["rows_after"]
+        total_before += counts["rows_before"]
+        total_after += counts["rows_after"]
+        print(f"✅ {target}: {counts['rows_before']:,} → {counts['rows_after']:,} Zeilen ({removed:,} Duplikate)")
+    print(
+        f"📊 {len(results)} Monate: {total_before:,} → {total_after:,} Zeilen "
+        f"({total_before - total_after:,} entfernt, {time.time() - start:.1f} s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
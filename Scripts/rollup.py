@@ -0,0 +1,187 @@
+"""
+============================================================
+    MONATS-ROLLUPS
+    Tag × Stunde × Zugtyp × Bahnhof als kompakte Parquet-Datei
+============================================================
+
+Verdichtet eine Monatsdatei (`data-YYYY-MM.parquet`, ~2M Halte) zu einer
+Rollup-Tabelle mit einer Zeile pro Tag, Stunde, Zugtyp und Bahnhof. Jede
+Zeile enthält additive Summen (Anzahl, Summe und Quadratsumme der
+Verspätung, pünktliche, >15 min verspätete und ausgefallene Halte), aus
+denen das Dashboard alle Panels in Millisekunden berechnet.
+
+Der Dateiname enthält einen Fingerabdruck der Quelldatei (Mirror-Dateien:
+Anfang des SHA-256, sonst Größe + mtime). Ändert sich die Quelle, passt
+kein Rollup mehr und es wird neu gebaut.
+
+Verwendung:
+    python rollup.py ../Data/deutsche_bahn_data/monthly_processed_data/data-2024-10.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import os
+import threading
+
+import data_mirror
+from db_connection import execute_statement
+from panel_engine import MEASURE_COLUMNS, parquet_source, stop_event_measures
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Zielordner für Rollups (per Umgebungsvariable überschreibbar)
+ROLLUP_DIR = os.environ.get(
+    "DB_ROLLUP_DIR",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "rollups"),
+)
+
+ROLLUP_SUFFIX = ".rollup.parquet"
+
+# Dimensionen einer Rollup-Zelle (in dieser Reihenfolge sortiert)
+ROLLUP_DIMENSIONS: tuple[str, ...] = ("day", "hour", "train_type", "station_name")
+
+# Aggregatfunktion pro Messgröße (alles andere wird summiert)
+ROLLUP_AGGREGATES: dict[str, str] = {"min_time": "MIN", "max_time": "MAX"}
+
+# Verhindert, dass zwei Threads dasselbe Rollup gleichzeitig bauen
+_build_lock = threading.Lock()
+
+
+# ============================================================
+# PFADE & FINGERABDRUCK
+# ============================================================
+
+def source_fingerprint(data_path: str) -> str:
+    """
+    Kurzer Fingerabdruck der Quelldatei.
+
+    Mirror-Dateien tragen den Anfang ihres SHA-256 im Namen: der
+    Fingerabdruck hängt dann nur am Inhalt und bleibt gleich, wenn der
+    Monat nach einer Eviction neu geladen wird. Andere Dateien: Größe +
+    mtime (ändert sich bei jedem Rewrite).
+    """
+    sha256 = data_mirror.filename_sha256(data_path)
+    if sha256 is not None:
+        return sha256
+    stat = os.stat(data_path)
+    raw = f"{stat.st_size}-{stat.st_mtime_ns}".encode()
+    return hashlib.sha1(raw).hexdigest()[:12]
+
+
+def source_stem(data_path: str) -> str:
+    """'…/data-2024-10.parquet' → 'data-2024-10'."""
+    return os.path.splitext(os.path.basename(data_path))[0]
+
+
+def source_month_stem(data_path: str) -> str:
+    """
+    Stem ohne SHA-256 einer Mirror-Datei ('data-2024-10.<sha>.parquet' →
+    'data-2024-10'). Alle Stände eines Monats teilen ihn; damit werden
+    beim Aufräumen auch Artefakte eines ersetzten Monats gefunden.
+    """
+    stem = source_stem(data_path)
+    sha256 = data_mirror.filename_sha256(data_path)
+    return stem[: -len(sha256) - 1] if sha256 else stem
+
+
+def rollup_path_for(data_path: str, rollup_dir: str = ROLLUP_DIR) -> str:
+    """Pfad des Rollups, das zum aktuellen Stand der Quelldatei gehört."""
+    name = f"{source_stem(data_path)}.{source_fingerprint(data_path)}{ROLLUP_SUFFIX}"
+    return os.path.join(rollup_dir, name)
+
+
+# ============================================================
+# BUILD
+# ============================================================
+
+def build_rollup_query(data_path: str, source: str | None = None) -> str:
+    """
+    Aggregiert die Rohdaten zu Tag × Stunde × Zugtyp × Bahnhof.
+
+    `source` ist ein FROM-Ausdruck für die Rohdaten (z.B. eine Warehouse-
+    Tabelle); ohne wird die Parquet-Datei gelesen.
+    """
+    dimensions = ", ".join(ROLLUP_DIMENSIONS)
+    sums = ",\n        ".join(
+        f"{ROLLUP_AGGREGATES.get(col, 'SUM')}({col}) as {col}"
+        for col in MEASURE_COLUMNS
+    )
+
+    return f"""
+    SELECT
+        {dimensions},
+        {sums}
+    FROM {stop_event_measures(source or parquet_source(data_path))}
+    GROUP BY {dimensions}
+    ORDER BY {dimensions}
+    """
+
+
+def build_rollup(data_path: str, rollup_dir: str = ROLLUP_DIR, source: str | None = None) -> str:
+    """Baut das Rollup für eine Monatsdatei und gibt dessen Pfad zurück."""
+    os.makedirs(rollup_dir, exist_ok=True)
+    target = rollup_path_for(data_path, rollup_dir)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    execute_statement(
+        f"COPY ({build_rollup_query(data_path, source)}) TO '{tmp_path}' "
+        f"(FORMAT parquet, COMPRESSION zstd)"
+    )
+
+    # Atomar ersetzen, damit andere Prozesse nie eine halbe Datei lesen
+    os.replace(tmp_path, target)
+
+    # Veraltete Rollups desselben Monats aufräumen (auch frühere Stände der Quelle)
+    for old in glob.glob(os.path.join(rollup_dir, f"{source_month_stem(data_path)}.*{ROLLUP_SUFFIX}")):
+        if old != target:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    return target
+
+
+def ensure_rollup(data_path: str, rollup_dir: str = ROLLUP_DIR, source: str | None = None) -> str:
+    """Gibt ein aktuelles Rollup zurück und baut es bei Bedarf (neu)."""
+    target = rollup_path_for(data_path, rollup_dir)
+    if os.path.exists(target):
+        return target
+
+    with _build_lock:
+        if os.path.exists(target):
+            return target
+        return build_rollup(data_path, rollup_dir, source)
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Baut Monats-Rollups für das Dashboard.")
+    parser.add_argument("files", nargs="+", help="Monatsdateien (data-YYYY-MM.parquet)")
+    parser.add_argument("--out", default=ROLLUP_DIR, help="Zielordner für die Rollups")
+    parser.add_argument("--force", action="store_true", help="Auch aktuelle Rollups neu bauen")
+    args = parser.parse_args()
+
+    for data_path in args.files:
+        if args.force:
+            target = build_rollup(data_path, args.out)
+        else:
+            target = ensure_rollup(data_path, args.out)
+
+        source_mb = os.path.getsize(data_path) / (1024 * 1024)
+        rollup_mb = os.path.getsize(target) / (1024 * 1024)
+        print(f"✅ {os.path.basename(data_path)} → {target} ({source_mb:.1f} MB → {rollup_mb:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+============================================================
+    BAHNHOFS-INDEX
+    Vorberechnete Kennzahlen pro Bahnhof und Monat
+============================================================
+
+Tausende Bahnhöfe live über Millionen Halte zu gruppieren ist für eine
+interaktive Rangliste zu langsam. Pro Monat wird deshalb ein Index
+gespeichert: eine Zeile pro Bahnhof und Verspätung (ganze Minuten, NULL
+für Halte ohne Wert) mit der Anzahl Halte und Ausfälle.
+
+Daraus ergeben sich für beliebige Monatskombinationen durch Aufsummieren
+Anzahl, Ø Verspätung, Pünktlichkeit, Ausfallquote und das exakte p90
+(wie bei delay_sketch.py). Die gemergte Tabelle hat eine Zeile pro
+Bahnhof; Sortieren, Filtern und Blättern laufen danach in Arrow.
+
+Verwendung:
+    python station_index.py ../Data/deutsche_bahn_data/monthly_processed_data/data-2024-10.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import threading
+from typing import Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from db_connection import execute_query_arrow, execute_statement
+from panel_engine import PUENKTLICH_THRESHOLD_MIN, parquet_source
+from rollup import source_fingerprint, source_month_stem, source_stem
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STATION_INDEX_DIR = os.environ.get(
+    "DB_STATION_INDEX_DIR",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "stations"),
+)
+
+STATION_INDEX_SUFFIX = ".stations.parquet"
+
+# Perzentil für die "typische schlechte" Verspätung eines Bahnhofs
+STATION_PERCENTILE: int = 90
+
+# Spalten der Rangliste, nach denen sortiert werden kann
+LEADERBOARD_COLUMNS: tuple[str, ...] = (
+    "fahrten",
+    "avg_delay",
+    "puenktlich_pct",
+    "canceled_pct",
+    f"p{STATION_PERCENTILE}_delay",
+)
+
+# Verhindert, dass zwei Threads denselben Index gleichzeitig bauen
+_build_lock = threading.Lock()
+
+
+# ============================================================
+# PFADE & BUILD
+# ============================================================
+
+def station_index_path_for(data_path: str, index_dir: str = STATION_INDEX_DIR) -> str:
+    """Pfad des Bahnhofs-Index, der zum aktuellen Stand der Quelldatei gehört."""
+    name = f"{source_stem(data_path)}.{source_fingerprint(data_path)}{STATION_INDEX_SUFFIX}"
+    return os.path.join(index_dir, name)
+
+
+def build_station_index_query(data_path: str, source: str | None = None) -> str:
+    """Zählt Halte und Ausfälle pro Bahnhof und Verspätung."""
+    return f"""
+    SELECT
+        station_name,
+        CAST(delay_in_min AS INTEGER) as delay,
+        COUNT(*) as n_rows,
+        COUNT(*) FILTER (WHERE is_canceled AND delay_in_min IS NOT NULL) as n_canceled
+    FROM {source or parquet_source(data_path)}
+    WHERE station_name IS NOT NULL
+    GROUP BY ALL
+    ORDER BY ALL
+    """
+
+
+def build_station_index(data_path: str, index_dir: str = STATION_INDEX_DIR, source: str | None = None) -> str:
+    """Baut den Bahnhofs-Index für eine Monatsdatei und gibt dessen Pfad zurück."""
+    os.makedirs(index_dir, exist_ok=True)
+    target = station_index_path_for(data_path, index_dir)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    execute_statement(
+        f"COPY ({build_station_index_query(data_path, source)}) TO '{tmp_path}' "
+        f"(FORMAT parquet, COMPRESSION zstd)"
+    )
+    os.replace(tmp_path, target)
+
+    for old in glob.glob(os.path.join(index_dir, f"{source_month_stem(data_path)}.*{STATION_INDEX_SUFFIX}")):
+        if old != target:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    return target
+
+
+def ensure_station_index(data_path: str, index_dir: str = STATION_INDEX_DIR, source: str | None = None) -> str:
+    """Gibt einen aktuellen Bahnhofs-Index zurück und baut ihn bei Bedarf (neu)."""
+    target = station_index_path_for(data_path, index_dir)
+    if os.path.exists(target):
+        return target
+
+    with _build_lock:
+        if os.path.exists(target):
+            return target
+        return build_station_index(data_path, index_dir, source)
+
+
+# ============================================================
+# RANGLISTE
+# ============================================================
+
+def build_station_stats_query(index_paths: Sequence[str]) -> str:
+    """Merged die Monats-Indizes zu einer Zeile pro Bahnhof."""
+    p = STATION_PERCENTILE / 100
+    return f"""
+    WITH merged AS (
+        SELECT station_name, delay, SUM(n_rows) as n_rows, SUM(n_canceled) as n_canceled
+        FROM {parquet_source(list(index_paths))}
+        GROUP BY station_name, delay
+    ),
+    cumulative AS (
+        SELECT
+            *,
+            SUM(n_rows) OVER (PARTITION BY station_name ORDER BY delay) as cum_n,
+            SUM(n_rows) OVER (PARTITION BY station_name) as total_n
+        FROM merged
+        WHERE delay IS NOT NULL
+    ),
+    percentile AS (
+        SELECT station_name, MIN(delay) FILTER (WHERE cum_n >= {p!r} * total_n) as p{STATION_PERCENTILE}_delay
+        FROM cumulative
+        GROUP BY station_name
+    )
+    SELECT
+        station_name,
+        CAST(SUM(n_rows) FILTER (WHERE delay IS NOT NULL) AS BIGINT) as fahrten,
+        ROUND(SUM(delay * n_rows) / SUM(n_rows) FILTER (WHERE delay IS NOT NULL), 2) as avg_delay,
+        ROUND(SUM(n_rows) FILTER (WHERE delay <= {PUENKTLICH_THRESHOLD_MIN}) * 100.0
+            / SUM(n_rows) FILTER (WHERE delay IS NOT NULL), 1) as puenktlich_pct,
+        ROUND(SUM(n_canceled) * 100.0 / SUM(n_rows) FILTER (WHERE delay IS NOT NULL), 2) as canceled_pct,
+        ANY_VALUE(p{STATION_PERCENTILE}_delay) as p{STATION_PERCENTILE}_delay
+    FROM merged
+    JOIN percentile USING (station_name)
+    GROUP BY station_name
+    """
+
+
+def compute_station_stats(index_paths: Sequence[str]) -> pa.Table:
+    """Kennzahlen aller Bahnhöfe mit mindestens einem Verspätungswert (als Arrow-Tabelle)."""
+    return execute_query_arrow(build_station_stats_query(index_paths))
+
+
+def leaderboard_page(
+    stations: pa.Table,
+    sort_by: str,
+    descending: bool,
+    min_fahrten: int,
+    page: int,
+    page_size: int,
+) -> tuple[pa.Table, int]:
+    """
+    Eine Seite der Rangliste (1-basiert) und die Anzahl passender Bahnhöfe.
+
+    Bahnhöfe unter `min_fahrten` werden ausgeblendet, der Rang bezieht sich
+    auf die gefilterte und sortierte Liste.
+    """
+    table = stations.filter(pc.greater_equal(stations["fahrten"], min_fahrten))
+    order = "descending" if descending else "ascending"
+    table = table.sort_by([(sort_by, order), ("station_name", "ascending")])
+
+    offset = (page - 1) * page_size
+    page_table = table.slice(offset, page_size)
+    ranks = pa.array(range(offset + 1, offset + 1 + page_table.num_rows), pa.int64())
+    return page_table.add_column(0, "rang", ranks), table.num_rows
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Baut Bahnhofs-Indizes für das Dashboard.")
+    parser.add_argument("files", nargs="+", help="Monatsdateien (data-YYYY-MM.parquet)")
+    parser.add_argument("--out", default=STATION_INDEX_DIR, help="Zielordner für die Indizes")
+    parser.add_argument("--force", action="store_true", help="Auch aktuelle Indizes neu bauen")
+    args = parser.parse_args()
+
+    for data_path in args.files:
+        if args.force:
+            target = build_station_index(data_path, args.out)
+        else:
+            target = ensure_station_index(data_path, args.out)
+
+        index_kb = os.path.getsize(target) / 1024
+        print(f"✅ {os.path.basename(data_path)} → {target} ({index_kb:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,13 @@ import pandas as pd
 con = duckdb.connect()
 # Dateipfad
 import os
+import warehouse
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(SCRIPT_DIR, '..', 'Data', 'deutsche_bahn_data', 'monthly_processed_data', 'data-2024-10.parquet')
+# Aus dem DuckDB-Warehouse lesen, falls der Monat ingestiert ist (sonst Parquet)
+SOURCE = warehouse.source_for(DATA_PATH, con)
 
-result = con.execute(f"SELECT COUNT(*) FROM '{DATA_PATH}'").fetchone()
+result = con.execute(f"SELECT COUNT(*) FROM {SOURCE}").fetchone()
 print(f"Dataset Preview {result[0]:,} rows.")
 
 #Erste Transformation:
@@ -18,7 +21,7 @@ result = con.execute(f"""
         HOUR(time) as Stunde,
         Station_name,
         delay_in_min
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     LIMIT 10
  """).fetchdf()
 print(result)
@@ -38,7 +41,7 @@ result =   con.execute(f"""
             ELSE 'Unbekannt'
         END as Wochentag_Name,
         delay_in_min
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     LIMIT 10
  """).fetchdf()
 print(result)
@@ -55,7 +58,7 @@ result =   con.execute(f"""
             WHEN delay_in_min > 30 THEN 'Starke Verspätung'
             ELSE 'Extreme Verspätung'
         END as Verspätungskategorie
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     WHERE delay_in_min IS NOT NULL
     LIMIT 20
 """).fetchdf()
@@ -97,7 +100,7 @@ query = f"""
             WHEN delay_in_min > 15 THEN TRUE
             ELSE FALSE
         END as is_problematic_delay
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     LIMIT 20
 """
 result = con.execute(query).fetchdf()
@@ -112,7 +115,7 @@ result =   con.execute(f"""
         DATEDIFF('minute', arrival_planned_time, arrival_change_time) as berechnete_Differenz_in_min,
         -- Vergleich mit delay_in_min
         delay_in_min as gespeicherte_Verspätung_in_min
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     WHERE arrival_planned_time IS NOT NULL
       AND arrival_change_time IS NOT NULL
     LIMIT 10
@@ -125,7 +128,7 @@ result = con.execute(f"""
         train_type,
         CASE
             WHEN train_type IN ('ICE') THEN TRUE ELSE FALSE END as is_ice,
-            FROM '{DATA_PATH}'
+            FROM {SOURCE}
         END as verkehrskategorie,
 
 
@@ -139,7 +142,7 @@ result = con.execute(f"""
         train_name,
         (train_type = 'ICE') as is_ice,
         delay_in_min
-    FROM '{DATA_PATH}'
+    FROM {SOURCE}
     LIMIT 50
 """).fetchdf()
 print(result)
@@ -0,0 +1,212 @@
+"""
+============================================================
+    DUCKDB WAREHOUSE
+    Monatsdaten als sortierte Tabellen in .duckdb Dateien
+============================================================
+
+Lädt jede Monatsdatei einmal in eine persistente DuckDB-Datei
+(`<monat>.<fingerabdruck>.duckdb` mit der Tabelle `stop_events`). Die
+Zeilen sind nach Zugtyp und Zeit sortiert, so dass die Zonemaps der
+Row Groups bei Filtern wie `train_type IN (...)` oder Zeitbereichen
+den Großteil der Daten überspringen. Das Parquet-Decoding entfällt bei
+jeder weiteren Query.
+
+Pro Monat gibt es eine eigene Datei: Ein Ingest schreibt sie neben der
+alten und ersetzt sie atomar, ohne andere Monate anzufassen oder einen
+laufenden Leser zu blockieren. Leser hängen die Dateien READ_ONLY an
+die geteilte Datenbank an (ATTACH). Ist ein Monat (noch) nicht
+ingestiert oder die Quelle neuer, wird die optimierte Parquet-Kopie
+(siehe recluster.py) oder die Original-Datei gelesen.
+
+Verwendung:
+    python warehouse.py ../Data/deutsche_bahn_data/monthly_processed_data/data-2024-10.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import os
+import re
+import threading
+import time
+from typing import Sequence
+
+import duckdb
+
+from db_connection import execute_query_single, execute_statement
+from panel_engine import parquet_source
+from recluster import is_optimized, optimized_path_for
+from rollup import source_fingerprint, source_month_stem, source_stem
+
+# ============================================================
+# KONFIGURATION
+# ============================================================
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+WAREHOUSE_DIR = os.environ.get(
+    "DB_WAREHOUSE_DIR",
+    os.path.join(SCRIPT_DIR, "..", "Data", "deutsche_bahn_data", "warehouse"),
+)
+
+WAREHOUSE_SUFFIX = ".duckdb"
+WAREHOUSE_TABLE = "stop_events"
+META_TABLE = "ingest_meta"
+
+# Sortierung beim Ingest: Zugtyp zuerst, damit train_type-Filter ganze
+# Row Groups überspringen; innerhalb eines Zugtyps nach Zeit
+WAREHOUSE_SORT: tuple[str, ...] = ("train_type", "time")
+
+# Verhindert doppelte ATTACHs derselben Datei aus mehreren Threads
+_attach_lock = threading.Lock()
+
+
+# ============================================================
+# PFADE
+# ============================================================
+
+def warehouse_path_for(data_path: str, warehouse_dir: str = WAREHOUSE_DIR) -> str:
+    """Pfad der Warehouse-Datei, die zum aktuellen Stand der Quelldatei gehört."""
+    name = f"{source_stem(data_path)}.{source_fingerprint(data_path)}{WAREHOUSE_SUFFIX}"
+    return os.path.join(warehouse_dir, name)
+
+
+def is_ingested(data_path: str, warehouse_dir: str = WAREHOUSE_DIR) -> bool:
+    """True, wenn für den aktuellen Stand der Quelle eine Warehouse-Datei existiert."""
+    return os.path.exists(warehouse_path_for(data_path, warehouse_dir))
+
+
+# ============================================================
+# INGEST
+# ============================================================
+
+def ingest_month(data_path: str, warehouse_dir: str = WAREHOUSE_DIR) -> str:
+    """Lädt eine Monatsdatei sortiert in eine eigene .duckdb Datei."""
+    os.makedirs(warehouse_dir, exist_ok=True)
+    target = warehouse_path_for(data_path, warehouse_dir)
+    tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    # Eigene Read-Write-Verbindung: die geteilte Datenbank bleibt unberührt
+    con = duckdb.connect(tmp_path)
+    try:
+        con.execute(
+            f"CREATE TABLE {WAREHOUSE_TABLE} AS "
+            f"SELECT * FROM {parquet_source(data_path)} "
+            f"ORDER BY {', '.join(WAREHOUSE_SORT)}"
+        )
+        con.execute(
+            f"CREATE TABLE {META_TABLE} AS SELECT "
+            f"? as source_file, ? as source_fingerprint, ? as ingested, "
+            f"(SELECT COUNT(*) FROM {WAREHOUSE_TABLE}) as n_rows",
+            [os.path.basename(data_path), source_fingerprint(data_path), time.strftime("%Y-%m-%d %H:%M:%S")],
+        )
+        con.execute("CHECKPOINT")
+    finally:
+        con.close()
+
+    os.replace(tmp_path, target)
+
+    # Ältere Stände desselben Monats aufräumen (Leser mit offenem Handle lesen weiter)
+    for old in glob.glob(os.path.join(warehouse_dir, f"{source_month_stem(data_path)}.*{WAREHOUSE_SUFFIX}")):
+        if old != target:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+    return target
+
+
+# ============================================================
+# LESEN
+# ============================================================
+
+def _alias(warehouse_path: str) -> str:
+    """DuckDB-Name für eine angehängte Warehouse-Datei."""
+    stem = os.path.basename(warehouse_path)[: -len(WAREHOUSE_SUFFIX)]
+    return "wh_" + re.sub(r"\W", "_", stem)
+
+
+def _attach(warehouse_path: str, con: duckdb.DuckDBPyConnection | None = None) -> str:
+    """Hängt eine Warehouse-Datei READ_ONLY an und gibt ihren Tabellennamen zurück."""
+    alias = _alias(warehouse_path)
+    check = f"SELECT COUNT(*) FROM duckdb_databases() WHERE database_name = '{alias}'"
+    statement = f"ATTACH '{warehouse_path}' AS {alias} (READ_ONLY)"
+
+    with _attach_lock:
+        if con is not None:
+            if not con.execute(check).fetchone()[0]:
+                con.execute(statement)
+        elif not execute_query_single(check)[0]:
+            execute_statement(statement)
+
+    return f"{alias}.{WAREHOUSE_TABLE}"
+
+
+def source_for(
+    data_paths: str | Sequence[str],
+    con: duckdb.DuckDBPyConnection | None = None,
+    warehouse_dir: str = WAREHOUSE_DIR,
+) -> str:
+    """
+    FROM-Ausdruck für eine oder mehrere Monatsdateien.
+
+    Reihenfolge pro Monat: Warehouse, optimierte Parquet-Kopie, Original.
+    Ohne `con` wird auf der geteilten Datenbank (db_connection) attached.
+    """
+    if isinstance(data_paths, str):
+        data_paths = [data_paths]
+
+    parts = []
+    for data_path in data_paths:
+        if is_ingested(data_path, warehouse_dir):
+            parts.append(_attach(warehouse_path_for(data_path, warehouse_dir), con))
+        elif is_optimized(data_path):
+            parts.append(parquet_source(optimized_path_for(data_path)))
+        else:
+            parts.append(parquet_source(data_path))
+
+    if len(parts) == 1:
+        return parts[0]
+    union = " UNION ALL BY NAME ".join(f"SELECT * FROM {part}" for part in parts)
+    return f"({union})"
+
+
+def describe_source(data_path: str, warehouse_dir: str = WAREHOUSE_DIR) -> str:
+    """Woher source_for() einen Monat liest (für die Debug-Anzeige)."""
+    if is_ingested(data_path, warehouse_dir):
+        return f"Warehouse: {warehouse_path_for(data_path, warehouse_dir)}"
+    if is_optimized(data_path):
+        return f"Optimiertes Parquet: {optimized_path_for(data_path)}"
+    return f"Parquet: {data_path}"
+
+
+# ============================================================
+# AUSFÜHRUNG
+# ============================================================
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Lädt Monatsdateien in das DuckDB-Warehouse.")
+    parser.add_argument("files", nargs="+", help="Monatsdateien (data-YYYY-MM.parquet)")
+    parser.add_argument("--out", default=WAREHOUSE_DIR, help="Zielordner für die .duckdb Dateien")
+    parser.add_argument("--force", action="store_true", help="Auch aktuelle Monate neu laden")
+    args = parser.parse_args()
+
+    for data_path in args.files:
+        if is_ingested(data_path, args.out) and not args.force:
+            print(f"⏭️  {os.path.basename(data_path)} ist aktuell")
+            continue
+
+        start = time.time()
+        target = ingest_month(data_path, args.out)
+        source_mb = os.path.getsize(data_path) / (1024 * 1024)
+        target_mb = os.path.getsize(target) / (1024 * 1024)
+        print(
+            f"✅ {os.path.basename(data_path)} → {target} "
+            f"({source_mb:.1f} MB → {target_mb:.1f} MB, {time.time() - start:.1f} s)"
+        )
+
+
+if __name__ == "__main__":
+    main()